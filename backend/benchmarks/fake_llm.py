@@ -0,0 +1,117 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import time
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+# Stand-in for the LM Studio server: an OpenAI-compatible /v1/chat/completions endpoint streaming
+# canned tokens at a fixed rate, so that the backend can be benchmarked without a GPU
+FAKE_LLM_TOKENS_PER_S = float(os.getenv("FAKE_LLM_TOKENS_PER_S", "40"))
+FAKE_LLM_TTFT_MS = float(os.getenv("FAKE_LLM_TTFT_MS", "150"))
+FAKE_LLM_TOKENS = int(os.getenv("FAKE_LLM_TOKENS", "60"))
+FAKE_LLM_MAX_PARALLEL = int(os.getenv("FAKE_LLM_MAX_PARALLEL", "0"))  # 0 = unlimited, LM Studio serves 1
+
+# The answer names an author so that the attribution post-processing takes its usual path
+WORDS = ("Obama could have written this tweet : the tone , the vocabulary and the topic match his "
+         "other tweets about policy , the economy and the future of the country .").split()
+
+
+def completion_tokens(n: int) -> list:
+    """
+    Return the n tokens of a canned answer.
+    """
+    return [word if i == 0 else " " + word for i, word in zip(range(n), itertools.cycle(WORDS))]
+
+
+def create_app(tokens_per_s: float = FAKE_LLM_TOKENS_PER_S, ttft_ms: float = FAKE_LLM_TTFT_MS,
+               tokens: int = FAKE_LLM_TOKENS, max_parallel: int = FAKE_LLM_MAX_PARALLEL) -> FastAPI:
+    """
+    Create the fake OpenAI-compatible server.
+
+    Args:
+        tokens_per_s (float): Decoding speed of each stream.
+        ttft_ms (float): Delay before the first token (prompt processing).
+        tokens (int): Tokens per answer (capped by the max_tokens of the request).
+        max_parallel (int): Streams generated at once, the others wait (0 = unlimited).
+
+    Returns:
+        FastAPI: The application.
+    """
+    app = FastAPI()
+    slots = asyncio.Semaphore(max_parallel) if max_parallel > 0 else None
+    stats = {"requests": 0, "active": 0, "tokens": 0}
+
+    def chunk(model: str, delta: dict, finish_reason=None) -> str:
+        body = {
+            "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(body)}\n\n"
+
+    async def generate(n: int):
+        if slots:
+            await slots.acquire()
+        stats["active"] += 1
+        try:
+            await asyncio.sleep(ttft_ms / 1000)
+            for i, token in enumerate(completion_tokens(n)):
+                if i:
+                    await asyncio.sleep(1 / tokens_per_s)
+                stats["tokens"] += 1
+                yield token
+        finally:
+            stats["active"] -= 1
+            if slots:
+                slots.release()
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "fake-model", "object": "model", "owned_by": "benchmark"}]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "fake-model")
+        n = min(tokens, body.get("max_tokens") or tokens)
+        stats["requests"] += 1
+
+        if not body.get("stream"):
+            text = "".join([token async for token in generate(n)])
+            return {
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": n, "total_tokens": n},
+            }
+
+        async def events():
+            yield chunk(model, {"role": "assistant", "content": ""})
+            async for token in generate(n):
+                yield chunk(model, {"content": token})
+            yield chunk(model, {}, "stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+if __name__ == "__main__":
+    # Example: `python -m benchmarks.fake_llm --port 1234 --tokens-per-s 40 --ttft-ms 150`
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible streaming server standing in for LM Studio.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1234)
+    parser.add_argument("--tokens-per-s", type=float, default=FAKE_LLM_TOKENS_PER_S, help="Decoding speed of each stream")
+    parser.add_argument("--ttft-ms", type=float, default=FAKE_LLM_TTFT_MS, help="Delay before the first token")
+    parser.add_argument("--tokens", type=int, default=FAKE_LLM_TOKENS, help="Tokens per answer")
+    parser.add_argument("--max-parallel", type=int, default=FAKE_LLM_MAX_PARALLEL, help="Streams generated at once (0 = unlimited)")
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(args.tokens_per_s, args.ttft_ms, args.tokens, args.max_parallel), host=args.host, port=args.port, log_level="warning")
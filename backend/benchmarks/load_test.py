@@ -0,0 +1,317 @@
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import httpx
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DATASET = os.getenv("BENCH_DATASET", os.path.join(os.path.dirname(BACKEND_DIR), "utils", "dataset.csv"))
+
+STREAMING_SCENARIOS = ["analyze", "generate"]
+ANALYTICS_SCENARIOS = [
+    "topics", "years", "overview", "likes_by_year", "topic_trend", "top_tweets", "sentiment_by_topic", "sentiment_per_year",
+]
+SCENARIOS = STREAMING_SCENARIOS + ANALYTICS_SCENARIOS
+
+
+class Workload:
+    """
+    Request parameters drawn from the dataset: tweets for /analyze, the authors, topics and years
+    of the generation and analytics routes.
+    """
+
+    def __init__(self, path: str = BENCH_DATASET, seed: int = 0):
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = [row for row in csv.DictReader(f) if row.get("Text") and row.get("Date")]
+        self.random = random.Random(seed)
+        self.tweets = [row["Text"] for row in rows]
+        self.authors = sorted({row["Author"] for row in rows if row.get("Author")})
+        self.topics = sorted({row["topic"] for row in rows if row.get("topic")})
+        self.years = sorted({row["Date"][:4] for row in rows})
+
+    def request(self, scenario: str):
+        """
+        Return the (method, path, params, json body) of a request of a scenario.
+        """
+        pick = self.random.choice
+        author = pick(self.authors)
+        if scenario == "analyze":
+            return "POST", "/analyze", None, {"tweet": pick(self.tweets), "stream_protocol": 2}
+        if scenario == "generate":
+            return "POST", "/generate_tweet", None, {"author": author, "topic": pick(self.topics), "stream_protocol": 2}
+        if scenario == "topics":
+            return "GET", "/analytics/topics", {"author": author}, None
+        if scenario == "years":
+            return "GET", "/analytics/years", {"author": pick(self.authors + ["All"])}, None
+        if scenario == "overview":
+            return "GET", "/analytics/overview", {"author": author}, None
+        if scenario == "likes_by_year":
+            return "GET", "/analytics/likes-by-year", {"topic": pick(self.topics), "author": author}, None
+        if scenario == "topic_trend":
+            return "GET", "/topic-trend-by-year", {"year": pick(self.years), "author": pick(self.authors + ["All"])}, None
+        if scenario == "top_tweets":
+            return "GET", "/top-tweets", {"metric": pick(["likes", "retweets"]), "limit": 5, "author": author}, None
+        if scenario == "sentiment_by_topic":
+            return "GET", "/analytics/sentiment-by-topic", None, None
+        if scenario == "sentiment_per_year":
+            return "GET", "/sentiment-per-year", {"author": author}, None
+        raise ValueError(f"Unknown scenario '{scenario}', expected one of {SCENARIOS}")
+
+
+async def send(client: httpx.AsyncClient, method: str, path: str, params, body) -> dict:
+    """
+    Send a request and time it. Streaming answers (NDJSON, protocol 2) are read line by line to
+    measure the time to the first LLM token (first "delta" frame).
+
+    Returns:
+        dict: status ("ok", "rejected" for 429/503, or "error"), latency_ms and ttft_ms (or None).
+    """
+    start = time.perf_counter()
+    ttft = None
+    failed = False
+    try:
+        async with client.stream(method, path, params=params, json=body) as response:
+            if response.headers.get("content-type", "").startswith("application/x-ndjson"):
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    frame = json.loads(line)
+                    if frame.get("type") == "delta" and ttft is None:
+                        ttft = (time.perf_counter() - start) * 1000
+                    elif frame.get("type") == "final":
+                        failed = bool(frame.get("error")) or frame.get("predicted_author") == "ERROR"
+            else:
+                await response.aread()
+            status_code = response.status_code
+    except httpx.HTTPError:
+        return {"status": "error", "latency_ms": (time.perf_counter() - start) * 1000, "ttft_ms": None}
+
+    latency = (time.perf_counter() - start) * 1000
+    if status_code in (429, 503):
+        status = "rejected"
+    elif status_code >= 400 or failed:
+        status = "error"
+    else:
+        status = "ok"
+    return {"status": status, "latency_ms": latency, "ttft_ms": ttft}
+
+
+def summarize(values: list) -> dict:
+    if not values:
+        return None
+    return {
+        "p50": round(float(np.percentile(values, 50)), 3),
+        "p95": round(float(np.percentile(values, 95)), 3),
+        "p99": round(float(np.percentile(values, 99)), 3),
+        "mean": round(float(np.mean(values)), 3),
+        "max": round(float(np.max(values)), 3),
+    }
+
+
+async def run_scenario(url: str, workload: Workload, scenario: str, concurrency: int, requests: int,
+                       duration_s: float, warmup: int) -> dict:
+    """
+    Run a closed-loop load test: `concurrency` clients send requests back to back until
+    `requests` were sent or `duration_s` elapsed, after `warmup` unmeasured requests.
+
+    Returns:
+        dict: Request counts, throughput (successful requests/s) and the latency and TTFT percentiles (ms).
+    """
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=httpx.Timeout(600.0)) as client:
+        for _ in range(warmup):
+            await send(client, *workload.request(scenario))
+
+        results = []
+        sent = 0
+        start = time.perf_counter()
+        deadline = start + duration_s if duration_s else None
+
+        async def worker():
+            nonlocal sent
+            while sent < requests and (deadline is None or time.perf_counter() < deadline):
+                sent += 1
+                results.append(await send(client, *workload.request(scenario)))
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    ok = [r for r in results if r["status"] == "ok"]
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "ok": len(ok),
+        "rejected": sum(r["status"] == "rejected" for r in results),
+        "errors": sum(r["status"] == "error" for r in results),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(ok) / elapsed, 3) if elapsed > 0 else None,
+        "latency_ms": summarize([r["latency_ms"] for r in ok]),
+        "ttft_ms": summarize([r["ttft_ms"] for r in ok if r["ttft_ms"] is not None]),
+    }
+
+
+async def wait_ready(url: str, timeout_s: float, processes: list):
+    """
+    Wait until the backend reports its models as ready (GET /health/ready).
+    """
+    deadline = time.monotonic() + timeout_s
+    async with httpx.AsyncClient(base_url=url, timeout=5.0) as client:
+        while time.monotonic() < deadline:
+            if any(process.poll() is not None for process in processes):
+                raise SystemExit("[BENCHMARK] A benchmark process exited during startup")
+            try:
+                if (await client.get("/health/ready")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(1)
+    raise SystemExit(f"[BENCHMARK] The backend was not ready after {timeout_s}s")
+
+
+def start_servers(args, scenarios: list) -> list:
+    """
+    Start the fake LLM server and the backend on the in-memory connector.
+    """
+    llm = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_llm", "--port", str(args.llm_port),
+        "--tokens-per-s", str(args.tokens_per_s), "--ttft-ms", str(args.llm_ttft_ms),
+        "--tokens", str(args.tokens), "--max-parallel", str(args.llm_max_parallel),
+    ], cwd=BACKEND_DIR)
+
+    env = dict(os.environ, LLM_BASE_URL=f"http://127.0.0.1:{args.llm_port}/v1", BENCH_DB_LATENCY_MS=str(args.db_latency_ms))
+    if not any(scenario in STREAMING_SCENARIOS for scenario in scenarios):
+        # Analytics only: no model to load
+        env.setdefault("BACKEND_ROLE", "analytics")
+    backend = subprocess.Popen([sys.executable, "-m", "benchmarks.serve", "--port", str(args.port)], cwd=BACKEND_DIR, env=env)
+    return [llm, backend]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(report: dict, baseline: dict, max_regression: float) -> bool:
+    """
+    Print the change of p50/p95/p99 latency and throughput against a baseline report.
+
+    Returns:
+        bool: False if the p95 latency or the throughput of a scenario regressed by more than max_regression.
+    """
+    passed = True
+    print(f"\nAgainst {baseline.get('commit')}:")
+    print(f"{'scenario':<20}{'p50':>9}{'p95':>9}{'p99':>9}{'rps':>9}")
+    for name, result in report["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before or not before.get("latency_ms") or not result.get("latency_ms"):
+            continue
+
+        def change(new, old):
+            return (new - old) / old if old else 0.0
+
+        latency = {p: change(result["latency_ms"][p], before["latency_ms"][p]) for p in ("p50", "p95", "p99")}
+        throughput = change(result["throughput_rps"] or 0, before["throughput_rps"] or 0)
+        print(f"{name:<20}{latency['p50']:>+9.1%}{latency['p95']:>+9.1%}{latency['p99']:>+9.1%}{throughput:>+9.1%}")
+        if latency["p95"] > max_regression or throughput < -max_regression:
+            passed = False
+    return passed
+
+
+def print_report(report: dict):
+    print(f"{'scenario':<20}{'ok':>6}{'rej':>5}{'err':>5}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ttft p50':>10}{'ttft p95':>10}")
+    for name, result in report["scenarios"].items():
+        latency = result["latency_ms"] or {}
+        ttft = result["ttft_ms"] or {}
+        print(
+            f"{name:<20}{result['ok']:>6}{result['rejected']:>5}{result['errors']:>5}{result['throughput_rps'] or 0:>9.1f}"
+            f"{latency.get('p50', 0):>10.1f}{latency.get('p95', 0):>10.1f}{latency.get('p99', 0):>10.1f}"
+            f"{ttft.get('p50', 0):>10.1f}{ttft.get('p95', 0):>10.1f}"
+        )
+
+
+async def run(args) -> dict:
+    scenarios = args.scenarios
+    processes = []
+    url = args.url
+    try:
+        if not url:
+            processes = start_servers(args, scenarios)
+            url = f"http://127.0.0.1:{args.port}"
+        await wait_ready(url, args.startup_timeout, processes)
+
+        workload = Workload(args.dataset, args.seed)
+        report = {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "settings": {
+                "url": args.url or "local", "concurrency": args.concurrency, "requests": args.requests,
+                "duration_s": args.duration, "warmup": args.warmup, "db_latency_ms": args.db_latency_ms,
+                "llm_tokens_per_s": args.tokens_per_s, "llm_ttft_ms": args.llm_ttft_ms, "llm_tokens": args.tokens,
+                "llm_max_parallel": args.llm_max_parallel,
+            },
+            "scenarios": {},
+        }
+        for scenario in scenarios:
+            print(f"[BENCHMARK] {scenario}: {args.concurrency} concurrent clients")
+            report["scenarios"][scenario] = await run_scenario(
+                url, workload, scenario, args.concurrency, args.requests, args.duration, args.warmup
+            )
+        return report
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+def _scenario_list(value: str) -> list:
+    names = SCENARIOS if value == "all" else ANALYTICS_SCENARIOS if value == "analytics" else value.split(",")
+    for name in names:
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario '{name}', expected one of {SCENARIOS}")
+    return names
+
+
+if __name__ == "__main__":
+    # Every route, 8 concurrent clients:  `python -m benchmarks.load_test --concurrency 8 --json bench.json`
+    # Compare with a previous commit:     `python -m benchmarks.load_test --scenarios analytics --baseline bench.json`
+    parser = argparse.ArgumentParser(description="Load test the backend against a fake LLM and an in-memory dataset connector.")
+    parser.add_argument("--scenarios", type=_scenario_list, default=SCENARIOS, help=f"'all', 'analytics' or a comma separated list of {SCENARIOS}")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per scenario")
+    parser.add_argument("--duration", type=float, default=0, help="Optional time limit per scenario (seconds)")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests per scenario")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dataset", default=BENCH_DATASET, help="Dataset CSV the requests are drawn from")
+    parser.add_argument("--url", help="Benchmark an already running backend instead of starting one")
+    parser.add_argument("--port", type=int, default=8700, help="Port of the benchmarked backend")
+    parser.add_argument("--llm-port", type=int, default=8701, help="Port of the fake LLM server")
+    parser.add_argument("--tokens-per-s", type=float, default=40, help="Decoding speed of the fake LLM per stream")
+    parser.add_argument("--llm-ttft-ms", type=float, default=150, help="Delay of the fake LLM before the first token")
+    parser.add_argument("--tokens", type=int, default=60, help="Tokens per fake LLM answer")
+    parser.add_argument("--llm-max-parallel", type=int, default=1, help="Streams the fake LLM generates at once (LM Studio: 1, 0 = unlimited)")
+    parser.add_argument("--db-latency-ms", type=float, default=2, help="Simulated round trip of each in-memory connector call")
+    parser.add_argument("--startup-timeout", type=float, default=900, help="Seconds to wait for the models and the indexes")
+    parser.add_argument("--json", help="Path where the report is written as JSON")
+    parser.add_argument("--baseline", help="Previous JSON report to compare with")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Relative p95/throughput regression that fails the comparison")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if not compare(report, baseline, args.max_regression):
+            sys.exit(1)
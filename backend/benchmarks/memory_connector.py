@@ -0,0 +1,140 @@
+import asyncio
+import csv
+import os
+import random
+import threading
+import time
+
+from dataset import parse_rows
+from services.analytics_engine import ColumnarAnalytics
+from services.topic_evaluation import DATASET_PATH
+
+# In-process stand-in for Neo4jConnector/AsyncNeo4jConnector, seeded from the dataset CSV. Every
+# call waits BENCH_DB_LATENCY_MS to stand for the round trip to the database.
+BENCH_DATASET = os.getenv("BENCH_DATASET", DATASET_PATH)
+BENCH_DB_LATENCY_MS = float(os.getenv("BENCH_DB_LATENCY_MS", "2"))
+
+# Analytics methods, answered by the columnar engine over the dataset (same results as the Cypher queries)
+ANALYTICS_METHODS = {
+    "A_get_topics_by_author", "A_get_years_by_author", "A1_get_likes_by_year_for_topic_and_author",
+    "A2_get_topic_trend_by_month_year", "A3_get_top_tweets", "A4_get_average_sentiment_by_topic",
+    "A5_get_average_sentiment_per_year",
+}
+
+
+class InMemoryTweets:
+    """
+    The tweets of a dataset CSV with the query methods of Neo4jConnector.
+    """
+
+    def __init__(self, path: str = BENCH_DATASET):
+        start = time.perf_counter()
+        with open(path, newline="", encoding="utf-8") as f:
+            self.rows = parse_rows(csv.DictReader(f))
+        self.by_topic = {}
+        for row in self.rows:
+            self.by_topic.setdefault(row["topic"], []).append(row)
+        self.engine = ColumnarAnalytics()
+        self.engine.load(self)
+        print(f"[BENCHMARK] Loaded {len(self.rows)} tweets from {path} in {time.perf_counter() - start:.2f}s")
+
+    def get_data_version(self):
+        return 0
+
+    def A_get_analytics_columns(self):
+        return [
+            {
+                "author": row["author"], "topic": row["topic"], "year": row["year"], "month": row["month"],
+                "likes": row["likes"], "retweets": row["retweets"], "sentiment": row["sentiment"],
+                "sentiment_confidence": row["sentiment_confidence"], "text": row["text"], "date": row["date"][:10],
+            }
+            for row in self.rows
+        ]
+
+    def LLM_get_tweets_by_topic(self, topic: str):
+        return [
+            {"text": row["text"], "date": row["date"], "sentiment": row["sentiment"], "author": row["author"]}
+            for row in self.by_topic.get(topic, [])
+        ]
+
+    def LLM_get_tweets_by_author_topic(self, author: str, topic: str):
+        if author not in ["Obama", "Musk"]:
+            return []
+        return [tweet for tweet in self.LLM_get_tweets_by_topic(topic) if tweet["author"] == author]
+
+    def LLM_sample_tweets_by_author_topic(self, author: str, topic: str, n: int):
+        texts = [tweet["text"] for tweet in self.LLM_get_tweets_by_author_topic(author, topic)]
+        return random.sample(texts, min(n, len(texts)))
+
+    def LLM_get_entity_mentions_by_topic(self, topic: str):
+        return [
+            {"text": row["text"], "author": row["author"], "entities": [[e["name"], e["type"]] for e in row["entities"]]}
+            for row in self.by_topic.get(topic, []) if row["entities"]
+        ]
+
+    def LLM_search_similar_tweets(self, *args):
+        raise NotImplementedError("The in-memory connector has no vector index, benchmark with RETRIEVAL_BACKEND=faiss")
+
+    def __getattr__(self, name):
+        if name in ANALYTICS_METHODS:
+            return getattr(self.engine, name)
+        raise AttributeError(name)
+
+
+_tweets = None
+_tweets_lock = threading.Lock()
+
+
+def get_tweets() -> InMemoryTweets:
+    """
+    Return the dataset shared by the sync and async connectors (loaded on first use).
+    """
+    global _tweets
+    with _tweets_lock:
+        if _tweets is None:
+            _tweets = InMemoryTweets()
+        return _tweets
+
+
+class InMemoryConnector:
+    """
+    Drop-in replacement of Neo4jConnector (same constructor and methods) for the benchmarks.
+    """
+
+    def __init__(self, *args, latency_ms: float = BENCH_DB_LATENCY_MS, **kwargs):
+        self.tweets = get_tweets()
+        self.latency_s = latency_ms / 1000
+        self.driver = None
+
+    def close(self):
+        pass
+
+    def __getattr__(self, name):
+        method = getattr(self.tweets, name)
+
+        def call(*args):
+            time.sleep(self.latency_s)
+            return method(*args)
+
+        return call
+
+
+class AsyncInMemoryConnector(InMemoryConnector):
+    """
+    Drop-in replacement of AsyncNeo4jConnector for the benchmarks.
+    """
+
+    async def close(self):
+        pass
+
+    def __getattr__(self, name):
+        method = getattr(self.tweets, name)
+
+        async def call(*args):
+            await asyncio.sleep(self.latency_s)
+            return method(*args)
+
+        return call
+
+    async def gather(self, *calls):
+        return await asyncio.gather(*calls)
@@ -0,0 +1,160 @@
+import argparse
+import asyncio
+import collections
+import json
+import os
+import random
+import time
+import numpy as np
+
+from services.retrieval import EntityGraphRetriever, ENTITY_MAX_CANDIDATES
+from services.topic_extraction import candidate_labels, filter_entities, query_entities
+from services.vector_index import TopicIndexStore, INDEX_DIR
+
+BENCH_INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "indexes")
+
+
+def sample_queries(rows: list, n: int, seed: int = 0) -> list:
+    """
+    Draw query tweets from the dataset rows, with their author, topic and filtered entities.
+    """
+    rows = [row for row in rows if row["topic"] in candidate_labels and row["author"]]
+    sample = random.Random(seed).sample(rows, min(n, len(rows)))
+    return [
+        {"text": row["text"], "author": row["author"], "topic": row["topic"],
+         "entities": filter_entities([(e["name"], e["type"]) for e in row["entities"]])}
+        for row in sample
+    ]
+
+
+def vote(hits: list):
+    """
+    Predict the author of a query from its context tweets: the most frequent author, ties broken
+    by the closest tweet.
+    """
+    if not hits:
+        return None
+    votes = collections.Counter(hit["author"] for hit in hits)
+    return max(votes, key=lambda author: (votes[author], -next(i for i, hit in enumerate(hits) if hit["author"] == author)))
+
+
+def evaluate(retriever, queries: list, embeddings: np.ndarray, k: int) -> tuple:
+    """
+    Retrieve the context of every query (leaving the query tweet itself out) and measure the
+    latency and the retrieval-level attribution accuracy: the author predicted by a majority vote
+    of the context tweets, and the share of context tweets written by the query's author.
+
+    Returns:
+        tuple: The report dictionary and the context of each query.
+    """
+    latencies, contexts = [], []
+    for query, embedding in zip(queries, embeddings):
+        start = time.perf_counter()
+        hits = retriever.search(query["topic"], embedding, k + 1, query["entities"])
+        latencies.append((time.perf_counter() - start) * 1000)
+        contexts.append([hit for hit in hits if hit["text"] != query["text"]][:k])
+
+    n = len(queries)
+    report = {
+        "mean_ms": round(float(np.mean(latencies)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "vote_accuracy": round(sum(vote(c) == q["author"] for q, c in zip(queries, contexts)) / n, 4),
+        f"author_precision@{k}": round(
+            sum(sum(hit["author"] == q["author"] for hit in c) / k for q, c in zip(queries, contexts)) / n, 4
+        ),
+    }
+    return report, contexts
+
+
+async def llm_accuracy(queries: list, contexts: list) -> float:
+    """
+    Attribution accuracy of the LLM (the /analyze prompt) given the retrieved contexts.
+    """
+    from services.tweet_analysis_generation import build_attribution_prompt, attribution_result, stream_llm_response, close_llm_client
+
+    correct = 0
+    try:
+        for query, context in zip(queries, contexts):
+            explanation = "".join([chunk async for chunk in stream_llm_response(build_attribution_prompt(query["text"], context))])
+            correct += attribution_result(explanation, query["topic"], 1.0)["predicted_author"] == query["author"]
+    finally:
+        await close_llm_client()
+    return round(correct / len(queries), 4)
+
+
+def run(args) -> dict:
+    if args.neo4j:
+        from neo4j_connector import Neo4jConnector
+
+        connector = Neo4jConnector()
+        index_dir = args.index_dir or INDEX_DIR
+    else:
+        from benchmarks.memory_connector import InMemoryConnector
+
+        connector = InMemoryConnector(latency_ms=0)
+        index_dir = args.index_dir or BENCH_INDEX_DIR
+
+    try:
+        store = TopicIndexStore(index_dir=index_dir)
+        store.load_or_build(connector, candidate_labels)
+        hybrid = EntityGraphRetriever(store, args.max_candidates)
+        hybrid.load(connector, candidate_labels)
+    finally:
+        connector.close()
+
+    from benchmarks.memory_connector import get_tweets
+
+    queries = sample_queries(get_tweets().rows, args.queries, args.seed)
+    if args.spacy:
+        # Entities of the live pipeline instead of the ones stored with the dataset
+        for query, entities in zip(queries, query_entities([q["text"] for q in queries])):
+            query["entities"] = entities
+    embeddings = store.embed([q["text"] for q in queries])
+
+    report = {"queries": len(queries), "k": args.k, "max_candidates": args.max_candidates}
+    topic_sizes = {topic: index.index.ntotal for topic, index in store.indexes.items()}
+    retrievers = {"topic": store, "hybrid": hybrid}
+    contexts = {}
+    for name, retriever in retrievers.items():
+        report[name], contexts[name] = evaluate(retriever, queries, embeddings, args.k)
+
+    # Tweets compared with each query embedding: the whole topic, or the entity candidates
+    report["topic"]["avg_candidates"] = round(float(np.mean([topic_sizes.get(q["topic"], 0) for q in queries])), 1)
+    report["hybrid"].update(hybrid.stats())
+    report["hybrid"][f"overlap@{args.k}"] = round(sum(
+        len({(h["text"], h["author"]) for h in a} & {(h["text"], h["author"]) for h in b})
+        for a, b in zip(contexts["topic"], contexts["hybrid"])
+    ) / (len(queries) * args.k), 4)
+
+    if args.llm:
+        for name in retrievers:
+            report[name]["llm_accuracy"] = asyncio.run(llm_accuracy(queries[:args.llm], contexts[name][:args.llm]))
+    return report
+
+
+if __name__ == "__main__":
+    # Compare the topic-level and the entity-graph hybrid retrieval on dataset tweets:
+    #   `python -m benchmarks.retrieval_benchmark --queries 500`
+    #   `python -m benchmarks.retrieval_benchmark --queries 200 --llm 100   # also asks LM Studio`
+    parser = argparse.ArgumentParser(description="Latency and attribution accuracy of the retrieval backends.")
+    parser.add_argument("--queries", type=int, default=500, help="Number of dataset tweets used as queries")
+    parser.add_argument("--k", type=int, default=10, help="Context tweets per query")
+    parser.add_argument("--max-candidates", type=int, default=ENTITY_MAX_CANDIDATES, help="Entity candidates re-ranked per query")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--neo4j", action="store_true", help="Build the indexes from Neo4j instead of the dataset CSV")
+    parser.add_argument("--index-dir", help="Directory of the FAISS indexes (default: benchmarks/indexes, or VECTOR_INDEX_DIR with --neo4j)")
+    parser.add_argument("--spacy", action="store_true", help="Extract the query entities with the spaCy pipeline")
+    parser.add_argument("--llm", type=int, default=0, help="Also measure the LLM attribution accuracy on the first N queries")
+    parser.add_argument("--json", help="Optional path where the report is written as JSON")
+    args = parser.parse_args()
+
+    report = run(args)
+    metrics = [key for key in report["topic"] if key in report["hybrid"]]
+    print(f"{'metric':<24}{'topic':>12}{'hybrid':>12}")
+    for key in metrics:
+        print(f"{key:<24}{report['topic'][key]:>12}{report['hybrid'][key]:>12}")
+    for key in ["entity_queries", "fallbacks", "completed", f"overlap@{args.k}"]:
+        print(f"{'hybrid ' + key:<24}{'':>12}{report['hybrid'][key]:>12}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
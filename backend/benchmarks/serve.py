@@ -0,0 +1,35 @@
+import argparse
+import os
+import uvicorn
+
+import neo4j_connector
+from benchmarks.memory_connector import InMemoryConnector, AsyncInMemoryConnector
+
+
+def load_app():
+    """
+    Import the backend with the in-memory connectors in place of the Neo4j ones. The benchmark
+    defaults (no schema migration, no /analyze response cache, FAISS retrieval, indexes built in
+    a separate directory) only apply when the variables are not set.
+    """
+    os.environ.setdefault("NEO4J_AUTO_MIGRATE", "0")
+    os.environ.setdefault("RESPONSE_CACHE_ENABLED", "0")
+    os.environ.setdefault("RETRIEVAL_BACKEND", "faiss")
+    os.environ.setdefault("VECTOR_INDEX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "indexes"))
+
+    neo4j_connector.Neo4jConnector = InMemoryConnector
+    neo4j_connector.AsyncNeo4jConnector = AsyncInMemoryConnector
+    import main
+
+    return main.app
+
+
+if __name__ == "__main__":
+    # Started by `python -m benchmarks.load_test`, or on its own against a fake LLM:
+    # `LLM_BASE_URL=http://127.0.0.1:1234/v1 python -m benchmarks.serve --port 8000`
+    parser = argparse.ArgumentParser(description="Run the backend on the in-memory dataset connector.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    uvicorn.run(load_app(), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,100 @@
+import ast
+from datetime import datetime
+
+from neo4j_schema import tweet_id
+
+
+def _to_int(value):
+    return int(float(value)) if value not in (None, "") else None
+
+
+def _to_float(value):
+    return float(value) if value not in (None, "") else None
+
+
+def parse_entities(value: str) -> list:
+    """
+    Parse the `entities` column of the dataset ("[['NBA', 'ORG'], ['Dwyane Wade', 'PERSON']]").
+
+    Args:
+        value (str): The raw column value.
+
+    Returns:
+        list: A list of {"name", "type"} dictionaries, without empty names or types.
+    """
+    if not value:
+        return []
+    try:
+        entities = ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return []
+
+    parsed = []
+    for entity in entities:
+        if len(entity) != 2:
+            continue
+        name, label = str(entity[0]).strip(), str(entity[1]).strip()
+        if name and label:
+            parsed.append({"name": name, "type": label})
+    return parsed
+
+
+def parse_row(row: dict) -> dict:
+    """
+    Convert a row of `utils/dataset.csv` into the properties written on a Tweet node.
+
+    Args:
+        row (dict): A CSV row with the dataset columns (Date, Text, Retweets, Likes, entities,
+            topic, confidence, sentiment, sentiment_confidence, Author).
+
+    Returns:
+        dict: The tweet properties, including its id, year/month and parsed entities.
+
+    Raises:
+        ValueError: If the Date is not a "YYYY-MM-DD HH:MM:SS" timestamp or the Text is missing.
+    """
+    date = row.get("Date") or ""
+    try:
+        parsed_date = datetime.strptime(date, "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        raise ValueError(f"invalid Date {date!r}") from None
+    if not row.get("Text"):
+        raise ValueError("missing Text")
+    return {
+        "id": tweet_id(date, row["Text"]),
+        "date": date,
+        "text": row["Text"],
+        "retweets": _to_int(row.get("Retweets")),
+        "likes": _to_int(row.get("Likes")),
+        "topic": row.get("topic") or None,
+        "confidence": _to_float(row.get("confidence")),
+        "sentiment": row.get("sentiment") or None,
+        "sentiment_confidence": _to_float(row.get("sentiment_confidence")),
+        "author": row.get("Author") or None,
+        "year": parsed_date.year,
+        "month": parsed_date.month,
+        "datetime": date.replace(" ", "T"),
+        "entities": parse_entities(row.get("entities")),
+    }
+
+
+def parse_rows(rows, skipped: list = None, start: int = 0) -> list:
+    """
+    Parse CSV rows with `parse_row`, leaving out the malformed ones instead of failing the whole load.
+
+    Args:
+        rows: An iterable of CSV rows (dictionaries).
+        skipped (list): Optional list receiving a (row number, error) tuple for each skipped row.
+        start (int): Number of the first row (data rows of a CSV are numbered from 0).
+
+    Returns:
+        list: The parsed rows.
+    """
+    parsed = []
+    for number, row in enumerate(rows, start):
+        try:
+            parsed.append(parse_row(row))
+        except (ValueError, TypeError) as e:
+            if skipped is not None:
+                skipped.append((number, str(e)))
+    return parsed
@@ -0,0 +1,220 @@
+import argparse
+import ast
+import json
+import os
+import shutil
+import time
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_CHUNK_SIZE = 20000
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_SPACY_PROCESSES = max(1, (os.cpu_count() or 2) // 2)
+
+# Columns of `utils/dataset.csv`, in order
+DATASET_COLUMNS = ["Date", "Text", "Retweets", "Likes", "entities", "topic", "confidence", "sentiment", "sentiment_confidence", "Author"]
+# Same cap as the preprocessing notebook for the per-topic confidence threshold
+MAX_CONFIDENCE_THRESHOLD = 0.6
+
+def part_path(work_dir: str, stage: str, part: int) -> str:
+    return os.path.join(work_dir, stage, f"part-{part:05d}.parquet")
+
+
+def write_part(df: pd.DataFrame, path: str):
+    """
+    Write a checkpoint atomically: a crash never leaves a partial part behind.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def normalize_chunk(chunk: pd.DataFrame, args) -> pd.DataFrame:
+    """
+    Map a chunk of the raw input CSV to the Date, Text, Retweets, Likes and Author columns.
+    """
+    def column(name):
+        return chunk[name] if name and name in chunk.columns else pd.Series([None] * len(chunk), index=chunk.index)
+
+    dates = pd.to_datetime(column(args.date_column), errors="coerce")
+    df = pd.DataFrame({
+        "Date": dates.dt.strftime("%Y-%m-%d %H:%M:%S"),
+        "Text": column(args.text_column),
+        "Retweets": pd.to_numeric(column(args.retweets_column), errors="coerce").astype("Int64"),
+        "Likes": pd.to_numeric(column(args.likes_column), errors="coerce").astype("Int64"),
+        "Author": args.author if args.author else column(args.author_column),
+    })
+    # Rows without a text or a parsable date can't be ingested
+    valid = df["Text"].notna() & (df["Text"].astype(str).str.strip() != "") & df["Date"].notna()
+    if not valid.all():
+        print(f"[ENRICH] Skipping {int((~valid).sum())} rows without text or date")
+    return df[valid].reset_index(drop=True)
+
+
+def run_entities(args, work_dir: str) -> int:
+    """
+    Stage 1: stream the input CSV in chunks and extract the (filtered) entities with `nlp.pipe`
+    over a pool of spaCy processes.
+
+    Returns:
+        int: The number of parts of the input.
+    """
+    from services.topic_extraction import extract_entities_batch, filter_entities
+
+    part = 0
+    reader = pd.read_csv(args.input, sep=args.sep, chunksize=args.chunk_size, dtype=str, keep_default_na=False, na_values=[""],
+                         engine="python" if len(args.sep) > 1 else "c", on_bad_lines="skip", encoding="utf-8")
+    for chunk in reader:
+        path = part_path(work_dir, "entities", part)
+        if not os.path.exists(path):
+            start = time.perf_counter()
+            df = normalize_chunk(chunk, args)
+            entities = extract_entities_batch(df["Text"].tolist(), args.batch_size, args.spacy_processes)
+            df["entities"] = [str([[name, label] for name, label in filter_entities(ents)]) for ents in entities]
+            write_part(df, path)
+            print(f"[ENRICH] entities part {part}: {len(df)} tweets ({len(df) / max(time.perf_counter() - start, 1e-9):.1f} tweets/sec)")
+        part += 1
+    return part
+
+
+def run_topics(args, work_dir: str, parts: int):
+    """
+    Stage 2: zero-shot topic classification of every part, in batches.
+    """
+    from services.topic_extraction import build_topic_input, get_topic_classifier
+
+    for part in range(parts):
+        path = part_path(work_dir, "topics", part)
+        if os.path.exists(path):
+            continue
+        start = time.perf_counter()
+        df = pd.read_parquet(part_path(work_dir, "entities", part))
+        inputs = [build_topic_input(text, ast.literal_eval(ents)) for text, ents in zip(df["Text"], df["entities"])]
+        topics = get_topic_classifier().classify(inputs, args.batch_size) if inputs else []
+        df["topic"] = [topic for topic, _ in topics]
+        df["confidence"] = [float(confidence) for _, confidence in topics]
+        write_part(df, path)
+        print(f"[ENRICH] topics part {part}: {len(df)} tweets ({len(df) / max(time.perf_counter() - start, 1e-9):.1f} tweets/sec)")
+
+
+def confidence_thresholds(work_dir: str, parts: int) -> dict:
+    """
+    Per-topic confidence threshold of the notebook: the median confidence of the topic, capped
+    at MAX_CONFIDENCE_THRESHOLD. Tweets below the threshold of their topic are dropped.
+    """
+    frames = [pd.read_parquet(part_path(work_dir, "topics", part), columns=["topic", "confidence"]) for part in range(parts)]
+    confidences = pd.concat(frames) if frames else pd.DataFrame(columns=["topic", "confidence"])
+    medians = confidences.groupby("topic")["confidence"].median()
+    return medians.clip(upper=MAX_CONFIDENCE_THRESHOLD).to_dict()
+
+
+def run_sentiment(args, work_dir: str, parts: int, thresholds: dict):
+    """
+    Stage 3: drop the low-confidence topics (unless disabled), then classify the sentiment in batches.
+    """
+    from services.sentiment import classify_sentiments
+
+    for part in range(parts):
+        path = part_path(work_dir, "sentiment", part)
+        if os.path.exists(path):
+            continue
+        start = time.perf_counter()
+        df = pd.read_parquet(part_path(work_dir, "topics", part))
+        if thresholds is not None:
+            df = df[df["confidence"] >= df["topic"].map(thresholds).fillna(1.0)].reset_index(drop=True)
+        entities = [[tuple(e) for e in ast.literal_eval(ents)] for ents in df["entities"]]
+        sentiments = classify_sentiments(df["Text"].tolist(), entities, args.batch_size)
+        df["sentiment"] = [sentiment for sentiment, _ in sentiments]
+        df["sentiment_confidence"] = [confidence for _, confidence in sentiments]
+        write_part(df, path)
+        print(f"[ENRICH] sentiment part {part}: {len(df)} tweets ({len(df) / max(time.perf_counter() - start, 1e-9):.1f} tweets/sec)")
+
+
+def write_output(output: str, work_dir: str, parts: int) -> int:
+    """
+    Concatenate the final parts into a CSV with the `utils/dataset.csv` columns.
+    """
+    tmp_path = output + ".tmp"
+    total = 0
+    for part in range(parts):
+        df = pd.read_parquet(part_path(work_dir, "sentiment", part))[DATASET_COLUMNS]
+        df.to_csv(tmp_path, mode="w" if part == 0 else "a", header=part == 0, index=False)
+        total += len(df)
+    if parts == 0:
+        pd.DataFrame(columns=DATASET_COLUMNS).to_csv(tmp_path, index=False)
+    os.replace(tmp_path, output)
+    return total
+
+
+def check_manifest(work_dir: str, settings: dict, restart: bool):
+    """
+    Make sure the checkpoints of the working directory were produced with the same settings
+    (the parts would not line up otherwise), or clear it when restarting.
+    """
+    manifest_path = os.path.join(work_dir, "manifest.json")
+    if restart and os.path.exists(work_dir):
+        shutil.rmtree(work_dir)
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            previous = json.load(f)
+        if previous != settings:
+            raise SystemExit(f"[ENRICH] {work_dir} holds checkpoints of a run with other settings ({previous}), use --restart")
+        print(f"[ENRICH] Resuming from the checkpoints in {work_dir}")
+        return
+    os.makedirs(work_dir, exist_ok=True)
+    with open(manifest_path, "w") as f:
+        json.dump(settings, f, indent=2)
+
+
+def enrich(args) -> int:
+    """
+    Run the enrichment stages, skipping the parts already checkpointed, and write the output CSV.
+
+    Returns:
+        int: The number of tweets written.
+    """
+    from services.topic_extraction import TOPIC_CLASSIFIER_BACKEND
+
+    work_dir = args.work_dir or args.output + ".work"
+    settings = {
+        "input": os.path.abspath(args.input),
+        "chunk_size": args.chunk_size,
+        "columns": [args.sep, args.date_column, args.text_column, args.retweets_column, args.likes_column, args.author_column, args.author],
+        "topic_classifier": TOPIC_CLASSIFIER_BACKEND,
+        "confidence_filter": not args.keep_low_confidence,
+    }
+    check_manifest(work_dir, settings, args.restart)
+
+    start = time.perf_counter()
+    parts = run_entities(args, work_dir)
+    run_topics(args, work_dir, parts)
+    thresholds = None if args.keep_low_confidence else confidence_thresholds(work_dir, parts)
+    run_sentiment(args, work_dir, parts, thresholds)
+    total = write_output(args.output, work_dir, parts)
+    print(f"[ENRICH] Wrote {total} tweets to {args.output} in {time.perf_counter() - start:.1f}s")
+    return total
+
+
+if __name__ == "__main__":
+    # Example (raw export of the notebook): `python enrich.py ds_obama.csv obama_final.csv --sep ";" --text-column Tweet-text --author Obama`
+    # Then load it: `python ingest.py obama_final.csv --incremental`
+    parser = argparse.ArgumentParser(description="Enrich raw tweets (entities, topic, sentiment) into the utils/dataset.csv schema.")
+    parser.add_argument("input", help="Raw tweets CSV")
+    parser.add_argument("output", help="Enriched CSV to write")
+    parser.add_argument("--work-dir", help="Checkpoint directory (default: <output>.work)")
+    parser.add_argument("--restart", action="store_true", help="Discard the existing checkpoints")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Tweets per part/checkpoint")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Batch size of spaCy and the transformer models")
+    parser.add_argument("--spacy-processes", type=int, default=DEFAULT_SPACY_PROCESSES, help="Number of spaCy worker processes")
+    parser.add_argument("--keep-low-confidence", action="store_true", help="Don't drop the tweets below the median confidence of their topic")
+    parser.add_argument("--sep", default=",", help="Input CSV separator")
+    parser.add_argument("--date-column", default="Date")
+    parser.add_argument("--text-column", default="Text")
+    parser.add_argument("--retweets-column", default="Retweets")
+    parser.add_argument("--likes-column", default="Likes")
+    parser.add_argument("--author-column", default="Author")
+    parser.add_argument("--author", help="Author of every tweet of the input (instead of --author-column)")
+    enrich(parser.parse_args())
@@ -0,0 +1,328 @@
+from neo4j import GraphDatabase
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import argparse
+import os
+import time
+import pandas as pd
+from dotenv import load_dotenv
+
+from dataset import parse_rows
+from neo4j_connector import driver_config, NEO4J_DATABASE
+from neo4j_schema import apply_migrations
+from neo4j_cubes import rebuild_cubes, update_cubes
+
+load_dotenv()
+
+DEFAULT_CHUNK_SIZE = 50000
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_WORKERS = 4
+
+WRITE_TWEETS = """
+UNWIND $rows AS row
+MERGE (t:Tweet {id: row.id})
+SET t.date = row.date,
+    t.text = row.text,
+    t.retweets = row.retweets,
+    t.likes = row.likes,
+    t.topic = row.topic,
+    t.confidence = row.confidence,
+    t.sentiment = row.sentiment,
+    t.sentiment_confidence = row.sentiment_confidence,
+    t.author = row.author,
+    t.year = row.year,
+    t.month = row.month,
+    t.datetime = datetime(row.datetime)
+"""
+
+WRITE_ENTITIES = """
+UNWIND $entities AS entity
+MERGE (:Entity {name: entity.name, type: entity.type})
+"""
+
+WRITE_MENTIONS = """
+UNWIND $mentions AS mention
+MATCH (t:Tweet {id: mention.id})
+MATCH (e:Entity {name: mention.name, type: mention.type})
+MERGE (t)-[:MENTIONS]->(e)
+"""
+
+BUMP_DATA_VERSION = """
+MERGE (v:DataVersion {name: "tweets"})
+SET v.version = coalesce(v.version, 0) + 1, v.updated_at = datetime()
+"""
+
+EXISTING_IDS = """
+UNWIND $ids AS id
+MATCH (t:Tweet {id: id})
+RETURN t.id AS id
+"""
+
+
+def update_vector_indexes(rows: list, driver=None):
+    """
+    Embed new tweets and add them to the retrieval backend: the saved per-topic vector indexes,
+    or the embedding property of their Tweet nodes when RETRIEVAL_BACKEND is "neo4j".
+    """
+    from services.retrieval import RETRIEVAL_BACKEND, backfill_embeddings
+
+    if RETRIEVAL_BACKEND == "neo4j":
+        # The new tweets are the ones without an embedding
+        backfill_embeddings(driver)
+        return
+
+    from services.vector_index import TopicIndexStore
+
+    by_topic = {}
+    for row in rows:
+        by_topic.setdefault(row["topic"], []).append(row)
+
+    store = TopicIndexStore()
+    missing = store.load(list(by_topic))
+    for topic, topic_rows in by_topic.items():
+        if topic in missing:
+            # No saved index yet: the backend builds the full index from Neo4j on its next start
+            continue
+        store.add(topic, topic_rows)
+        print(f"[INGEST] Added {len(topic_rows)} tweets to the '{topic}' index")
+
+
+def rebuild_vector_indexes(driver=None):
+    """
+    Bring the retrieval backend in line with the graph after a full load, which can rewrite any
+    tweet: rebuild every saved per-topic vector index from Neo4j, or embed the Tweet nodes
+    without an embedding property when RETRIEVAL_BACKEND is "neo4j".
+    """
+    from services.retrieval import RETRIEVAL_BACKEND, backfill_embeddings
+
+    if RETRIEVAL_BACKEND == "neo4j":
+        backfill_embeddings(driver)
+        return
+
+    from neo4j_connector import Neo4jConnector
+    from services.topic_extraction import candidate_labels
+    from services.vector_index import TopicIndexStore
+
+    connector = Neo4jConnector()
+    try:
+        TopicIndexStore().build(connector, candidate_labels)
+    finally:
+        connector.close()
+
+
+def read_chunks(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE, skipped: list = None):
+    """
+    Stream a dataset CSV in chunks of parsed rows, without loading the whole file in memory.
+    Malformed rows (e.g. an invalid Date) are left out and reported.
+
+    Args:
+        path (str): The dataset CSV.
+        chunk_size (int): Rows read from the CSV at a time.
+        skipped (list): Optional list receiving a (row number, error) tuple for each skipped row.
+    """
+    skipped = skipped if skipped is not None else []
+    start = 0
+    for chunk in pd.read_csv(path, chunksize=chunk_size, dtype=str, keep_default_na=False):
+        reported = len(skipped)
+        rows = parse_rows(chunk.to_dict("records"), skipped, start)
+        for number, error in skipped[reported:]:
+            print(f"[INGEST] Skipped row {number}: {error}")
+        start += len(chunk)
+        yield rows
+
+
+class BulkIngestor:
+    """
+    Load tweets into Neo4j through batched `UNWIND` transactions written by parallel workers.
+    """
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE, workers: int = DEFAULT_WORKERS):
+        """
+        Args:
+            batch_size (int): Number of tweets per write transaction.
+            workers (int): Number of concurrent writer threads.
+        """
+        self.batch_size = batch_size
+        self.workers = workers
+        self.driver = GraphDatabase.driver(
+            os.getenv("NEO4J_URI"),
+            **driver_config(max_pool_size=workers + 2)
+        )
+        self.known_entities = set()
+
+    def close(self):
+        self.driver.close()
+
+    def _write(self, query: str, **params):
+        with self.driver.session(database=NEO4J_DATABASE) as session:
+            session.execute_write(lambda tx: tx.run(query, **params).consume())
+
+    def write_entities(self, rows: list):
+        """
+        Create the Entity nodes not written yet. Entities are shared between tweets, so they are
+        written by a single writer before the tweet batches to avoid duplicate MERGEs.
+        """
+        new_entities = []
+        for row in rows:
+            for entity in row["entities"]:
+                key = (entity["name"], entity["type"])
+                if key not in self.known_entities:
+                    self.known_entities.add(key)
+                    new_entities.append(entity)
+
+        for start in range(0, len(new_entities), self.batch_size):
+            self._write(WRITE_ENTITIES, entities=new_entities[start:start + self.batch_size])
+
+    def write_batch(self, rows: list):
+        """
+        Write a batch of tweets and their MENTIONS relationships.
+        """
+        tweets = [{k: v for k, v in row.items() if k != "entities"} for row in rows]
+        mentions = [
+            {"id": row["id"], "name": entity["name"], "type": entity["type"]}
+            for row in rows
+            for entity in row["entities"]
+        ]
+        self._write(WRITE_TWEETS, rows=tweets)
+        if mentions:
+            self._write(WRITE_MENTIONS, mentions=mentions)
+
+    def ingest_rows(self, chunks) -> int:
+        """
+        Write chunks of parsed rows, keeping at most two batches per worker in flight.
+
+        Args:
+            chunks: An iterable of lists of parsed rows (see dataset.parse_row).
+
+        Returns:
+            int: The number of rows written.
+        """
+        total = 0
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = set()
+            for rows in chunks:
+                self.write_entities(rows)
+                for batch_start in range(0, len(rows), self.batch_size):
+                    if len(pending) >= 2 * self.workers:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            future.result()
+                    pending.add(executor.submit(self.write_batch, rows[batch_start:batch_start + self.batch_size]))
+
+                total += len(rows)
+                elapsed = time.perf_counter() - start
+                print(f"[INGEST] {total} rows read ({total / elapsed:.0f} rows/sec)")
+
+            for future in pending:
+                future.result()
+
+        elapsed = time.perf_counter() - start
+        print(f"[INGEST] Done: {total} rows in {elapsed:.1f}s ({total / max(elapsed, 1e-9):.0f} rows/sec)")
+        return total
+
+    def publish(self):
+        """
+        Bump the data version, which lets the running backends know that their analytics must be refreshed.
+        """
+        self._write(BUMP_DATA_VERSION)
+
+    def ingest_csv(self, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE, update_indexes: bool = True) -> int:
+        """
+        Bulk load a dataset CSV (same schema as `utils/dataset.csv`) into Neo4j, then rebuild the
+        aggregate cubes and the retrieval backend from the graph.
+        """
+        apply_migrations(self.driver, NEO4J_DATABASE)
+        skipped = []
+        total = self.ingest_rows(read_chunks(path, chunk_size, skipped))
+        if skipped:
+            print(f"[INGEST] {len(skipped)} malformed rows skipped")
+        # Tweets already in the graph were rewritten: recompute the cubes rather than adding to them
+        with self.driver.session(database=NEO4J_DATABASE) as session:
+            rebuild_cubes(session)
+        if update_indexes:
+            rebuild_vector_indexes(self.driver)
+        self.publish()
+        return total
+
+    def existing_ids(self, ids: list) -> set:
+        """
+        Return the subset of the given tweet ids that are already stored in Neo4j.
+        """
+        with self.driver.session(database=NEO4J_DATABASE) as session:
+            return set(session.execute_read(lambda tx: [r["id"] for r in tx.run(EXISTING_IDS, ids=ids)]))
+
+    def new_rows(self, chunks, seen: set):
+        """
+        Filter chunks of parsed rows down to the tweets not stored yet (by content hash) and
+        enrich the ones without topic/sentiment columns.
+        """
+        from services.enrichment import enrich_rows
+
+        for rows in chunks:
+            rows = [row for row in rows if row["id"] not in seen]
+            existing = self.existing_ids([row["id"] for row in rows])
+            rows = [row for row in rows if row["id"] not in existing]
+            seen.update(row["id"] for row in rows)
+
+            enrich_rows([row for row in rows if row["topic"] is None or row["sentiment"] is None])
+            if rows:
+                yield rows
+
+    def ingest_incremental(self, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE, update_indexes: bool = True) -> list:
+        """
+        Append the new tweets of a CSV: rows already in the graph are skipped, the others are
+        enriched if needed (entities, topic, sentiment), written to Neo4j, added to the aggregate
+        cubes and embedded into the retrieval backend. The cost is proportional to the
+        number of new rows.
+
+        The CSV needs at least the Date, Text and Author columns; the enrichment columns of
+        `utils/dataset.csv` are used when present.
+
+        Returns:
+            list: The parsed rows that were added.
+        """
+        apply_migrations(self.driver, NEO4J_DATABASE)
+
+        added = []
+
+        def collect(chunks):
+            for rows in chunks:
+                added.extend(rows)
+                yield rows
+
+        skipped = []
+        self.ingest_rows(collect(self.new_rows(read_chunks(path, chunk_size, skipped), set())))
+        if skipped:
+            print(f"[INGEST] {len(skipped)} malformed rows skipped")
+        if added:
+            with self.driver.session(database=NEO4J_DATABASE) as session:
+                cells = update_cubes(session, added, self.batch_size)
+            print(f"[INGEST] Updated {cells} aggregate cells")
+            # The backends reload the indexes when the version changes: write them first
+            if update_indexes:
+                update_vector_indexes(added, self.driver)
+            self.publish()
+        return added
+
+
+if __name__ == "__main__":
+    # Example: `python ingest.py ../utils/dataset.csv --batch-size 5000 --workers 4`
+    # Daily refresh with only the new tweets: `python ingest.py new_tweets.csv --incremental`
+    parser = argparse.ArgumentParser(description="Bulk load a tweet dataset CSV into Neo4j.")
+    parser.add_argument("csv", help="Path to the dataset CSV (utils/dataset.csv schema)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows read from the CSV at a time")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Rows per write transaction")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Number of parallel writers")
+    parser.add_argument("--incremental", action="store_true", help="Only add the tweets not stored yet, enriching and indexing them")
+    parser.add_argument("--skip-indexes", action="store_true", help="Don't update the vector indexes (or the Neo4j embeddings)")
+    args = parser.parse_args()
+
+    ingestor = BulkIngestor(batch_size=args.batch_size, workers=args.workers)
+    try:
+        if args.incremental:
+            added = ingestor.ingest_incremental(args.csv, chunk_size=args.chunk_size, update_indexes=not args.skip_indexes)
+            print(f"[INGEST] {len(added)} new tweets added")
+        else:
+            ingestor.ingest_csv(args.csv, chunk_size=args.chunk_size, update_indexes=not args.skip_indexes)
+    finally:
+        ingestor.close()
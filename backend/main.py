@@ -1,17 +1,205 @@
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, StreamingResponse
-from schemas import TweetRequest, TweetGenerationRequest 
-import pandas as pd
-from neo4j_connector import Neo4jConnector
+from fastapi.concurrency import run_in_threadpool
+from schemas import TweetRequest, TweetGenerationRequest, BatchTweetRequest
+from neo4j_connector import Neo4jConnector, AsyncNeo4jConnector, NEO4J_DATABASE
+from neo4j_schema import apply_migrations
+import asyncio
 import json
-import faiss
-
-from services.topic_extraction import classify_topic
-from services.tweet_analysis_generation import stream_llm_response, stream_llm_generation, encoder 
+import logging
+import os
+import time
+
+from services.model_registry import registry
+from services.topic_extraction import topic_batcher, candidate_labels, query_entities
+from services.tweet_analysis_generation import stream_llm_response, stream_llm_generation, close_llm_client, LLMError, LLM_MODEL
+from services.tweet_analysis_generation import build_attribution_prompt, attribution_result, attribution_error
+from services.retrieval import load_retriever, RETRIEVAL_BACKEND
+from services.streaming import make_stream, coalesce, replay
+from services.admission import AdmissionController, SingleFlight, Overloaded
+from services.response_cache import ResponseCache, GenerationPool, cache_key, RESPONSE_CACHE_ENABLED, GENERATION_CACHE_MODE
+from services.analytics_engine import ColumnarAnalytics, AsyncColumnarAnalytics, ANALYTICS_ENGINE
+from services.batch_analysis import analyze_batch, iterate_list, iterate_ndjson, parse_upload, BATCH_MAX_ITEMS, BATCH_LLM_CONCURRENCY, BATCH_ORDERS
+from services.context_selection import ContextSelector
+from services.query_cache import QueryCache, CachedConnector, AsyncCachedConnector, DATA_VERSION_POLL_S, ANALYTICS_HTTP_MAX_AGE
+from services.metrics import metrics, setup_logging, RequestProfiler
+from services.inference_client import get_client, remote_inference, require_authkey
+
+# "all" (default): every route; "analytics": only the analytics routes, no model is loaded;
+# "llm": every route, with the models warmed up at startup like "all"
+BACKEND_ROLE = os.getenv("BACKEND_ROLE", "all")
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "1") == "1"
+LLM_MODELS = ["nlp", "topic_classifier", "encoder", "topic_indexes"]
+
+# Bump when the /analyze prompt template changes so that cached answers are not reused
+ANALYZE_PROMPT_VERSION = "analyze-v1"
+
+# Leveled logging through a background thread (LOG_LEVEL), latency histograms exported by GET /metrics
+setup_logging()
+logger = logging.getLogger(__name__)
+profiler = RequestProfiler()
 
 app = FastAPI()
-connector = Neo4jConnector()
+connector = Neo4jConnector()  # Used by the sync routes (run in the threadpool)
+async_connector = AsyncNeo4jConnector()  # Used by the async routes
+
+# Results of the read queries, dropped when an ingestion bumps the data version
+query_cache = QueryCache()
+cached_connector = CachedConnector(connector, query_cache)
+async_cached_connector = AsyncCachedConnector(async_connector, query_cache)
+
+# Backend of the analytics routes: Neo4j queries, or the in-memory columnar engine (ANALYTICS_ENGINE=columnar)
+analytics_engine = ColumnarAnalytics() if ANALYTICS_ENGINE == "columnar" else None
+analytics = analytics_engine or cached_connector
+async_analytics = AsyncColumnarAnalytics(analytics_engine) if analytics_engine else async_cached_connector
+
+# GET endpoints whose responses only depend on the data: served with an ETag and Cache-Control
+ANALYTICS_PATHS = {
+    "/analytics/topics", "/analytics/years", "/analytics/overview", "/analytics/likes-by-year",
+    "/topic-trend-by-year", "/top-tweets", "/analytics/sentiment-by-topic", "/sentiment-per-year",
+}
+
+
+def load_index_store():
+    # Retriever of the context tweets: per-topic FAISS indexes, the Neo4j vector index or the
+    # entity-graph hybrid (RETRIEVAL_BACKEND)
+    return load_retriever(connector, candidate_labels)
+
+registry.register("topic_indexes", load_index_store)
+
+
+def retrieval_stats():
+    # Counters of the hybrid retriever, once it is loaded
+    if not registry.is_ready("topic_indexes"):
+        return {}
+    retriever = registry.get("topic_indexes")
+    return retriever.stats() if hasattr(retriever, "stats") else {}
+
+# Example tweets of /generate_tweet, sampled without loading every tweet of the author (CONTEXT_SELECTION_MODE)
+context_selector = ContextSelector(async_connector)
+
+# Cache of final /analyze results and pool of /generate_tweet results
+response_cache = ResponseCache()
+generation_pool = GenerationPool()
+
+# Bounded admission to the local LLM and coalescing of identical /analyze requests
+llm_admission = AdmissionController()
+single_flight = SingleFlight()
+
+
+def llm_disabled_response():
+    """
+    Return a 503 response when the LLM routes are disabled by the backend role, None otherwise.
+    """
+    if BACKEND_ROLE == "analytics":
+        return JSONResponse(status_code=503, content={
+            "error": "LLM endpoints are disabled on this worker (BACKEND_ROLE=analytics).",
+            "streaming": False
+        })
+    return None
+
+async def watch_data_version():
+    """
+    Invalidate the query and response caches, reload the columnar analytics and the vector indexes
+    rewritten by the ingestion when it bumps the data version.
+    """
+    last_version, seen = None, False
+    while True:
+        try:
+            version = await async_connector.get_data_version()
+            # Reload the columns before the version changes the analytics ETag: requests arriving
+            # during the reload must not get the old data under the new ETag
+            if analytics_engine:
+                await run_in_threadpool(analytics_engine.refresh_if_stale, connector, version)
+            query_cache.set_version(version)
+            context_selector.set_version(version)
+            if response_cache.set_version(version):
+                generation_pool.clear()
+            # The indexes loaded at startup are current: only reload after a change seen by this process
+            if seen and version != last_version and registry.is_ready("topic_indexes"):
+                retriever = registry.get("topic_indexes")
+                await run_in_threadpool(retriever.reload, connector, candidate_labels)
+            last_version, seen = version, True
+        except Exception as e:
+            logger.warning("Data version check failed: %s", e)
+        await asyncio.sleep(DATA_VERSION_POLL_S)
+
+@app.on_event("startup")
+async def startup():
+    # Refuse to start without the shared secret of the inference worker connections
+    if remote_inference():
+        require_authkey()
+
+    # Bring the graph schema (constraints, indexes, temporal properties) up to date
+    if os.getenv("NEO4J_AUTO_MIGRATE", "1") == "1":
+        await run_in_threadpool(apply_migrations, connector.driver, NEO4J_DATABASE)
+
+    if analytics_engine:
+        await run_in_threadpool(analytics_engine.load, connector)
+    asyncio.create_task(watch_data_version())
+
+    # Load the models in the background: requests arriving before are served as soon as the models they need are ready
+    if BACKEND_ROLE != "analytics" and MODEL_WARMUP:
+        registry.warmup(LLM_MODELS)
+
+@app.on_event("shutdown")
+async def shutdown():
+    await close_llm_client()
+    await async_connector.close()
+    connector.close()
+
+@app.middleware("http")
+async def analytics_http_cache(request: Request, call_next):
+    """
+    Conditional GET on the analytics endpoints: the ETag is derived from the data version and the
+    request URL, so an unchanged response is answered with 304 without querying the database.
+    """
+    if request.method != "GET" or request.url.path not in ANALYTICS_PATHS:
+        return await call_next(request)
+
+    etag = query_cache.etag(request.url.path, request.url.query)
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={ANALYTICS_HTTP_MAX_AGE}"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    response = await call_next(request)
+    if response.status_code == 200:
+        response.headers.update(headers)
+    return response
+
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    """
+    Record the latency of every request by route, and profile the sampled requests (PROFILE_SAMPLE_RATE,
+    or the X-Profile: 1 header with PROFILE_ON_REQUEST=1). The streamed responses are measured until
+    their last chunk.
+    """
+    start = time.perf_counter()
+    profile = profiler.start(request.headers)
+    try:
+        response = await call_next(request)
+    except Exception:
+        if profile:
+            profiler.stop(profile, request.url.path)
+        raise
+    route = request.scope.get("route")
+    labels = {"route": route.path if route else "unmatched", "method": request.method, "status": response.status_code}
+
+    body = response.body_iterator
+
+    async def measured_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            metrics.observe("http_request_seconds", time.perf_counter() - start, **labels)
+            if profile:
+                profiler.stop(profile, labels["route"])
+
+    response.body_iterator = measured_body()
+    return response
 
 # Allow requests from frontend
 app.add_middleware(
@@ -23,134 +211,228 @@ app.add_middleware(
 )
 
 
-@app.post("/analyze")
-async def LLM_analyze_tweet(data: TweetRequest):
-    topic, confidence = classify_topic(data.tweet)
-    print(f"[DEBUG] Topic extracted: {topic} ({confidence:.2%})")
-    
-    df = connector.LLM_get_tweets_by_topic(topic)
-    df = pd.DataFrame(df)
+def overloaded_response(error: Overloaded):
+    """
+    Fast load-shedding response when the LLM admission queue is full.
+    """
+    return JSONResponse(
+        status_code=error.status_code,
+        content={"error": str(error), "streaming": False},
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
+async def analysis_events(tweet: str, key: str, index_store, query_embedding, coalesce_ms: float, coalesce_chars: int):
+    """
+    Run the attribution pipeline for a tweet and yield its events, shared by every request
+    coalesced on the same single-flight key:
+        {"type": "reject", "status_code", "content"}  the request cannot be served (nothing follows)
+        {"type": "ready"}                              streaming can start
+        {"type": "queued", "position"}                 waiting for an LLM slot
+        {"type": "delta", "text"}                      new LLM text
+        {"type": "final", "result"}                    final result
+    """
+    # Concurrent requests are classified together by the micro-batcher (off the event loop)
+    with metrics.stage("topic"):
+        topic, confidence = await topic_batcher.submit(tweet)
+    logger.debug("Topic extracted: %s (%.2f%%)", topic, confidence * 100)
     
-    if df.empty:
-        return JSONResponse(status_code=404, content={
-            "predicted_author": "ERROR",
-            "explanation": "No tweets found for this topic. Please try a different tweet.",
-            "confidence": 0.0,
-            "topic": topic,
-            "topic_confidence": round(confidence * 100, 2),
-            "streaming": False
-        })
-        
-    # Context embedding and search
-    corpus_embeddings = encoder.encode(df["text"].tolist(), convert_to_numpy=True)
-    dimension = corpus_embeddings.shape[1]
-    index = faiss.IndexFlatL2(dimension)
-    index.add(corpus_embeddings)
-
-    query_embedding = encoder.encode([data.tweet])
-    distances, indices = index.search(query_embedding, 10)
+    # Context search on the precomputed topic index (or the Neo4j vector index, off the event loop)
+    if query_embedding is None:
+        with metrics.stage("embedding"):
+            query_embedding = await run_in_threadpool(index_store.embed, [tweet])
+    # Entities of the query for the hybrid retrieval (cached by the topic classification)
+    entities = None
+    if RETRIEVAL_BACKEND == "hybrid":
+        entities = (await run_in_threadpool(query_entities, [tweet]))[0]
+    with metrics.stage("retrieval"):
+        context_tweets = await run_in_threadpool(index_store.search, topic, query_embedding, 10, entities)
     
-    # Prepare context tweets with authors
-    context_tweets_with_authors = []
-    for idx in indices[0]:
-        t_text = df.iloc[idx]["text"]
-        t_author = df.iloc[idx]["author"]
-        context_tweets_with_authors.append(f'- "{t_text}" (Author: {t_author})')
+    if not context_tweets:
+        yield {"type": "reject", "status_code": 404, "content": attribution_error(
+            "No tweets found for this topic. Please try a different tweet.", topic, confidence
+        )}
+        return
     
-    context_str = "\n".join(context_tweets_with_authors)
-    print(f"[DEBUG] Context tweets for LLM: {context_str}")
-    
-    prompt = f"""I will provide you with a list of tweets.
-
-Tweets:
-{context_str}
+    with metrics.stage("prompt_build"):
+        prompt = build_attribution_prompt(tweet, context_tweets)
 
-Now, consider this new tweet:
+    # Wait for a slot on the local LLM
+    try:
+        ticket = llm_admission.enter()
+    except Overloaded as e:
+        yield {"type": "reject", "status_code": e.status_code, "content": {"error": str(e), "streaming": False}, "headers": {"Retry-After": str(e.retry_after)}}
+        return
 
-"{data.tweet}"
-Question: Could this tweet have been written by Obama, Musk or neither?
-Answer and give a brief explanation."""
+    yield {"type": "ready"}
+    try:
+        try:
+            async for position in ticket.wait():
+                yield {"type": "queued", "position": position}
+        except asyncio.TimeoutError:
+            yield {"type": "final", "result": attribution_error("ERROR: The LLM queue timed out, please retry later.", topic, confidence)}
+            return
 
-    async def generate_llm_response():
         full_explanation = ""
-        
-        initial_data = {
-            "explanation": full_explanation, # Initial empty explanation
-            "streaming": True # Indicates that streaming will start
-        }
-        yield json.dumps(initial_data) + "\n"
-
         # Stream LLM response
-        async for text_chunk in stream_llm_response(prompt):
-            if "ERROR" in text_chunk: 
-                final_error_data = {
-                    "predicted_author": "ERROR",
-                    "explanation": text_chunk,
-                    "confidence": 0.0,
-                    "topic": topic,
-                    "topic_confidence": round(confidence * 100, 2),
-                    "streaming": False # End streaming
-                }
-                yield json.dumps(final_error_data) + "\n"
-                print(f"[FINAL RESULT] ERROR: {text_chunk} (Topic: {topic}, Topic Confidence: {round(confidence * 100, 2)}%)")
-                return 
-
-            full_explanation += text_chunk
-            # Send a partial update with the current explanation
-            partial_data = {
-                "explanation": full_explanation,
-                "streaming": True # Keep streaming status
-            }
-            yield json.dumps(partial_data) + "\n"
-
-        # Final result processing
-        response_lower = full_explanation.lower()
-        if "obama" in response_lower:
-            final_predicted_author = "Obama"
-        elif "musk" in response_lower or "elon" in response_lower:
-            final_predicted_author = "Musk"
-        else:
-            final_predicted_author = "neither" # Default if no author found
-
-        final_data = {
-            "predicted_author": final_predicted_author,
-            "explanation": full_explanation,
-            "confidence": 100.0, 
-            "topic": topic,
-            "topic_confidence": round(confidence * 100, 2),
-            "streaming": False # States that streaming is done
-        }
-        yield json.dumps(final_data) + "\n" # Sending final result
-
-        # Log the final result
-        print(f"[FINAL RESULT] Predicted Author: {final_predicted_author}, LLM Confidence: {100.0}%, Topic: {topic}, Topic Confidence: {round(confidence * 100, 2)}%")
+        try:
+            async for text_chunk in coalesce(stream_llm_response(prompt), coalesce_ms, coalesce_chars):
+                full_explanation += text_chunk
+                yield {"type": "delta", "text": text_chunk}
+        except LLMError as e:
+            yield {"type": "final", "result": attribution_error(str(e), topic, confidence)}
+            logger.warning("Attribution failed: %s (Topic: %s, Topic Confidence: %.2f%%)", e, topic, confidence * 100)
+            return
+    finally:
+        ticket.release()
+
+    # Final result processing
+    final_data = attribution_result(full_explanation, topic, confidence)
+    yield {"type": "final", "result": final_data}
+    if RESPONSE_CACHE_ENABLED:
+        response_cache.put(key, final_data, query_embedding)
+
+    # Log the final result
+    logger.info("Predicted Author: %s, Topic: %s, Topic Confidence: %.2f%%", final_data["predicted_author"], topic, confidence * 100)
+
+
+async def analysis_frames(events, stream_protocol: int):
+    """
+    Encode the events of an analysis as NDJSON frames of the requested streaming protocol.
+    """
+    stream = make_stream(stream_protocol, "explanation")
+    # Initial empty explanation, indicates that streaming will start
+    yield stream.start()
+    async for event in events:
+        if event["type"] == "queued":
+            yield stream.queued(event["position"])
+        elif event["type"] == "delta":
+            # Partial update (the whole explanation so far, or only the new text with protocol 2)
+            yield stream.delta(event["text"])
+        elif event["type"] == "final":
+            yield stream.final(event["result"])
+        elif event["type"] == "error":
+            yield stream.final({"predicted_author": "ERROR", "explanation": event["message"], "confidence": 0.0, "streaming": False})
 
 
-    return StreamingResponse(generate_llm_response(), media_type="application/x-ndjson")
+@app.post("/analyze")
+async def LLM_analyze_tweet(data: TweetRequest):
+    disabled = llm_disabled_response()
+    if disabled:
+        return disabled
+
+    # The first call loads the retriever (blocking), so it runs in the threadpool so that running streams keep being served
+    index_store = await run_in_threadpool(registry.get, "topic_indexes")
+    query_embedding = None
+
+    # Cached answer for the same (or, if enabled, a near-identical) tweet
+    key = cache_key(data.tweet, ANALYZE_PROMPT_VERSION, LLM_MODEL)
+    if RESPONSE_CACHE_ENABLED:
+        if response_cache.similarity_threshold > 0:
+            query_embedding = await run_in_threadpool(index_store.embed, [data.tweet])
+        cached = response_cache.get(key, query_embedding)
+        if cached is not None:
+            return StreamingResponse(replay(data.stream_protocol, "explanation", {**cached, "cached": True}), media_type="application/x-ndjson")
+
+    # Identical concurrent requests share one computation; new ones are shed when the LLM queue is full
+    flight_key = f"{key}:{data.coalesce_ms}:{data.coalesce_chars}"
+    if flight_key not in single_flight.flights and not llm_admission.has_capacity():
+        return overloaded_response(llm_admission.shed())
+
+    flight, _ = single_flight.join(flight_key, lambda: analysis_events(
+        data.tweet, key, index_store, query_embedding, data.coalesce_ms, data.coalesce_chars
+    ))
+    events = flight.subscribe()
+    first_event = await events.__anext__()
+    if first_event["type"] == "reject":
+        return JSONResponse(status_code=first_event["status_code"], content=first_event["content"], headers=first_event.get("headers"))
+    if first_event["type"] == "error":
+        return JSONResponse(status_code=500, content={"error": first_event["message"], "streaming": False})
+
+    return StreamingResponse(analysis_frames(events, data.stream_protocol), media_type="application/x-ndjson")
+
+@app.post("/analyze/batch")
+async def LLM_analyze_batch(
+    request: Request,
+    order: str = Query("input", enum=BATCH_ORDERS, description="Yield the results in input or completion order"),
+    llm_concurrency: int = Query(BATCH_LLM_CONCURRENCY, ge=1, le=16, description="Concurrent LLM calls for this batch"),
+):
+    """
+    Attribute many tweets in one call. The body is either a JSON object {"tweets": [...]}, a
+    multipart file upload ("file": CSV with a Text column, NDJSON or one tweet per line), or an
+    NDJSON stream (Content-Type: application/x-ndjson) read while it is being analyzed.
+    Results are streamed as NDJSON lines followed by a summary line.
+    """
+    disabled = llm_disabled_response()
+    if disabled:
+        return disabled
+
+    content_type = request.headers.get("content-type", "")
+    try:
+        if content_type.startswith("application/x-ndjson"):
+            tweets = iterate_ndjson(request.stream())
+        else:
+            if content_type.startswith("multipart/form-data"):
+                upload = (await request.form()).get("file")
+                if upload is None or isinstance(upload, str):
+                    return JSONResponse(status_code=400, content={"error": "Missing 'file' upload."})
+                texts = parse_upload(upload.filename, await upload.read())
+            else:
+                payload = await request.json()
+                texts = BatchTweetRequest(**(payload if isinstance(payload, dict) else {"tweets": payload})).tweets
+            if len(texts) > BATCH_MAX_ITEMS:
+                return JSONResponse(status_code=413, content={"error": f"A batch can contain at most {BATCH_MAX_ITEMS} tweets."})
+            tweets = iterate_list(texts)
+    except (ValueError, TypeError) as e:
+        return JSONResponse(status_code=400, content={"error": f"Invalid batch: {e}"})
+
+    index_store = await run_in_threadpool(registry.get, "topic_indexes")
+
+    def cached_result(tweet):
+        if not RESPONSE_CACHE_ENABLED:
+            return None
+        return response_cache.get(cache_key(tweet, ANALYZE_PROMPT_VERSION, LLM_MODEL))
+
+    def store_result(tweet, result):
+        if RESPONSE_CACHE_ENABLED:
+            response_cache.put(cache_key(tweet, ANALYZE_PROMPT_VERSION, LLM_MODEL), result)
+
+    async def lines():
+        async for result in analyze_batch(tweets, index_store, llm_admission, order, llm_concurrency,
+                                          cached_result=cached_result, store_result=store_result):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 @app.post("/generate_tweet")
 async def LLM_generate_author_tweet(data: TweetGenerationRequest):
+    disabled = llm_disabled_response()
+    if disabled:
+        return disabled
+
     author = data.author
     topic = data.topic
 
-    print(f"[DEBUG] Generating tweet for Author: {author}, Topic: {topic}")
+    logger.debug("Generating tweet for Author: %s, Topic: %s", author, topic)
+
+    # Replay a pooled generation for this (author, topic) once the pool is full
+    if GENERATION_CACHE_MODE == "pool":
+        pooled = generation_pool.get(author, topic)
+        if pooled is not None:
+            return StreamingResponse(replay(data.stream_protocol, "generated_tweet", {**pooled, "cached": True}), media_type="application/x-ndjson")
 
-    # Retrieve tweets by author and topic
-    df = connector.LLM_get_tweets_by_author_topic(author, topic)
-    df = pd.DataFrame(df)
+    # Select up to 20 example tweets by author and topic (random sample, or diverse with MMR)
+    with metrics.stage("context_selection"):
+        sample_tweets = await context_selector.select(author, topic)
 
-    if df.empty:
+    if not sample_tweets:
         return JSONResponse(status_code=404, content={
             "error": f"No tweets found for {author} on topic '{topic}'. Cannot generate.",
             "streaming": False
         })
 
-    # Randomly select 20 tweets (or fewer if less than 20 available)
-    sample_size = min(20, len(df))
-    sample_tweets = df.sample(n=sample_size)["text"].tolist() # .sample() to get random rows from the DataFrame
-
     context_tweets = "\n".join([f'- "{t}"' for t in sample_tweets])
-    print(f"[DEBUG] Sample context tweets for generation:\n{context_tweets}")
+    logger.debug("Sample context tweets for generation:\n%s", context_tweets)
 
     # 3. Construct the prompt for the LLM
     system_prompt = f"You are an expert in generating tweets in the style of a specific author. Your task is to produce a tweet that closely mimics the writing style, tone, and common vocabulary of {author} on the given topic."
@@ -162,16 +444,43 @@ Now, generate a new tweet in the style of {author} about {topic}.
 The tweet should be concise and engaging. 
 Do NOT include any explanations or extra text, just the tweet itself."""
 
+    # Shed the request right away when the LLM queue is full
+    if not llm_admission.has_capacity():
+        return overloaded_response(llm_admission.shed())
+
     async def generate_response_stream():
+        stream = make_stream(data.stream_protocol, "generated_tweet")
         # Initial chunk for frontend, indicating streaming has started
-        yield json.dumps({"generated_tweet": "", "streaming": True}) + "\n"
+        yield stream.start()
+
+        try:
+            ticket = llm_admission.enter()
+        except Overloaded as e:
+            yield stream.final({"error": str(e), "generated_tweet": "", "streaming": False})
+            return
 
         full_generated_tweet = ""
-        # Stream the response from the LLM
-        async for text_chunk in stream_llm_generation(system_prompt, user_prompt): 
-            full_generated_tweet += text_chunk
-            # Send partial update for frontend
-            yield json.dumps({"generated_tweet": full_generated_tweet, "streaming": True}) + "\n"
+        try:
+            # Wait for a slot on the local LLM
+            try:
+                async for position in ticket.wait():
+                    yield stream.queued(position)
+            except asyncio.TimeoutError:
+                yield stream.final({"error": "The LLM queue timed out, please retry later.", "generated_tweet": "", "streaming": False})
+                return
+
+            # Stream the response from the LLM
+            try:
+                async for text_chunk in coalesce(stream_llm_generation(system_prompt, user_prompt), data.coalesce_ms, data.coalesce_chars):
+                    full_generated_tweet += text_chunk
+                    # Send partial update for frontend
+                    yield stream.delta(text_chunk)
+            except LLMError as e:
+                # Failed generations are never pooled
+                yield stream.final({"error": str(e), "generated_tweet": "", "streaming": False})
+                return
+        finally:
+            ticket.release()
         
         # Post-processing to remove quotes
         full_generated_tweet = full_generated_tweet.strip() # Remove leading/trailing whitespace
@@ -179,15 +488,81 @@ Do NOT include any explanations or extra text, just the tweet itself."""
             full_generated_tweet = full_generated_tweet[1:-1].strip() # Remove quotes and re-strip
         
         # Final chunk, indicating streaming is complete
-        yield json.dumps({"generated_tweet": full_generated_tweet, "streaming": False}) + "\n"
-        print(f"[FINAL GENERATED TWEET] Author: {author}, Topic: {topic}\nTweet: \"{full_generated_tweet}\"")
+        yield stream.final({"generated_tweet": full_generated_tweet, "streaming": False})
+        if GENERATION_CACHE_MODE == "pool" and full_generated_tweet:
+            generation_pool.add(author, topic, {"generated_tweet": full_generated_tweet, "streaming": False})
+        logger.info("Generated tweet for Author: %s, Topic: %s: \"%s\"", author, topic, full_generated_tweet)
 
     return StreamingResponse(generate_response_stream(), media_type="application/x-ndjson")
 
+@app.get("/health/ready")
+async def readiness():
+    models = registry.status()
+    required = [] if BACKEND_ROLE == "analytics" else LLM_MODELS
+    ready = all(models[name]["state"] == "ready" for name in required)
+    return JSONResponse(status_code=200 if ready else 503, content={
+        "role": BACKEND_ROLE,
+        "ready": ready,
+        "models": models
+    })
+
+# Stats of the services, exported as gauges by GET /metrics
+metrics.register("topic_classifier", topic_batcher.stats)
+metrics.register("response_cache", response_cache.stats)
+metrics.register("generation_pool", generation_pool.stats)
+metrics.register("llm_admission", llm_admission.stats)
+metrics.register("single_flight", single_flight.stats)
+metrics.register("query_cache", query_cache.stats)
+metrics.register("context_selection", context_selector.stats)
+metrics.register("models", registry.status)
+metrics.register("retrieval", retrieval_stats)
+if analytics_engine:
+    metrics.register("analytics_engine", analytics_engine.stats)
+if remote_inference():
+    metrics.register("inference_client", lambda: get_client().stats())
+    metrics.register("inference_worker", lambda: get_client().call("stats"))
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    # Prometheus text exposition format: stage latency histograms, request latencies, counters and service stats.
+    # Rendered in the threadpool: the inference worker collector is a blocking call to the worker.
+    return Response(await run_in_threadpool(metrics.render), media_type="text/plain; version=0.0.4")
+
+@app.get("/metrics/topic-classifier")
+async def topic_classifier_metrics():
+    return topic_batcher.stats()
+
+@app.get("/metrics/response-cache")
+async def response_cache_metrics():
+    return {"analyze": response_cache.stats(), "generate": generation_pool.stats()}
+
+@app.get("/metrics/llm-admission")
+async def llm_admission_metrics():
+    return {"admission": llm_admission.stats(), "single_flight": single_flight.stats()}
+
+@app.get("/metrics/context-selection")
+async def context_selection_metrics():
+    return context_selector.stats()
+
+@app.get("/metrics/query-cache")
+async def query_cache_metrics():
+    return query_cache.stats()
+
+@app.get("/metrics/analytics-engine")
+async def analytics_engine_metrics():
+    return {"engine": ANALYTICS_ENGINE, **(analytics_engine.stats() if analytics_engine else {})}
+
+@app.get("/metrics/inference")
+async def inference_metrics():
+    if not remote_inference():
+        return {"mode": "local"}
+    client = get_client()
+    return {"mode": "remote", "client": client.stats(), "worker": await run_in_threadpool(client.call, "stats")}
+
 @app.get("/analytics/topics")
 async def A_get_topics(author: str = Query(...)):
     try:
-        topics = connector.A_get_topics_by_author(author)
+        topics = await async_analytics.A_get_topics_by_author(author)
         return {"author": author, "topics": topics}
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
@@ -195,35 +570,50 @@ async def A_get_topics(author: str = Query(...)):
 @app.get("/analytics/years")
 async def A_get_years(author: str = Query("All")):
     try:
-        years = connector.A_get_years_by_author(author)
+        years = await async_analytics.A_get_years_by_author(author)
         return {"author": author, "years": years}
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
+@app.get("/analytics/overview")
+async def A_get_overview(author: str = Query(...)):
+    try:
+        # Independent queries run concurrently on separate pooled sessions
+        topics, years, sentiment = await async_analytics.gather(
+            async_analytics.A_get_topics_by_author(author),
+            async_analytics.A_get_years_by_author(author),
+            async_analytics.A5_get_average_sentiment_per_year(author),
+        )
+        return {"author": author, "topics": topics, "years": years, "sentiment_per_year": sentiment}
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
 @app.get("/analytics/likes-by-year")
 async def A1_get_likes_by_year(topic: str = Query(..., description="Topic to analyze"), author: str = Query(..., description="Author to filter by")):
     try:
-        data = connector.A1_get_likes_by_year_for_topic_and_author(topic,author)
+        data = await async_analytics.A1_get_likes_by_year_for_topic_and_author(topic,author)
         return {"topic": topic, "author": author, "data": data}
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
     
 @app.get("/topic-trend-by-year")
 def A2_topic_trend_by_year(year: str = Query(..., min_length=4, max_length=4), author: str = Query("All")):
-    data = connector.A2_get_topic_trend_by_month_year(year, author)
+    if not year.isdigit():
+        return JSONResponse(status_code=400, content={"error": f"Invalid year '{year}', expected 4 digits."})
+    data = analytics.A2_get_topic_trend_by_month_year(year, author)
     return {"data": data}
 
 @app.get("/top-tweets")
 def A3_get_top_tweets(metric: str = Query("likes", enum=["likes", "retweets"]), limit: int = 5, author: str = Query(...)):
-    data = connector.A3_get_top_tweets(metric, limit, author)
+    data = analytics.A3_get_top_tweets(metric, limit, author)
     return {"data": data}
 
 @app.get("/analytics/sentiment-by-topic")
 def A4_sentiment_by_topic():
-    data = connector.A4_get_average_sentiment_by_topic()
+    data = analytics.A4_get_average_sentiment_by_topic()
     return {"data": data}
 
 @app.get("/sentiment-per-year")
 def A5_sentiment_per_year(author: str = Query(...)):
-    data = connector.A5_get_average_sentiment_per_year(author)
+    data = analytics.A5_get_average_sentiment_per_year(author)
     return {"data": data}
\ No newline at end of file
@@ -1,104 +1,490 @@
-from neo4j import GraphDatabase
+from neo4j import GraphDatabase, AsyncGraphDatabase, READ_ACCESS
+import asyncio
+import logging
 import os
 from dotenv import load_dotenv
 
+from services.metrics import metrics
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Driver pool settings shared by the sync and async connectors
+NEO4J_MAX_POOL_SIZE = int(os.getenv("NEO4J_MAX_POOL_SIZE", "50"))
+NEO4J_ACQUISITION_TIMEOUT = float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "30"))
+NEO4J_FETCH_SIZE = int(os.getenv("NEO4J_FETCH_SIZE", "1000"))
+NEO4J_DATABASE = os.getenv("NEO4J_DATABASE") or None
+# Answer the analytics aggregations from the TweetStats cubes (see neo4j_cubes.py) instead of the tweets
+ANALYTICS_CUBES = os.getenv("ANALYTICS_CUBES", "1") == "1"
+
+
+def driver_config(max_pool_size: int = NEO4J_MAX_POOL_SIZE, acquisition_timeout: float = NEO4J_ACQUISITION_TIMEOUT):
+    """
+    Build the keyword arguments used to create a Neo4j driver (auth and connection pool settings).
+    """
+    return {
+        "auth": (os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD")),
+        "max_connection_pool_size": max_pool_size,
+        "connection_acquisition_timeout": acquisition_timeout,
+    }
+
+
+class TweetQueries:
+    """
+    Cypher statements behind the connector methods. Each builder returns a tuple
+    (query, parameters, transform) where transform turns the list of fetched records into
+    the value returned by the connector. A None query means there is nothing to fetch.
+
+    The queries filter on the indexed `author`, `topic`, `year` and `month` properties
+    created by the schema migrations (see neo4j_schema.py).
+    """
+
+    @staticmethod
+    def LLM_get_tweets_by_topic(topic: str):
+        query = """
+        MATCH (t:Tweet)
+        WHERE t.topic = $topic
+        RETURN t.text AS text, t.date AS date, t.sentiment AS sentiment, t.author AS author
+        """
+        return query, {"topic": topic}, lambda records: [record.data() for record in records]
+
+    @staticmethod
+    def LLM_get_tweets_by_author_topic(author: str, topic: str):
+        if author not in ["Obama", "Musk"]:
+            logger.debug("Author '%s' not supported for tweet generation.", author)
+            return None, {}, lambda records: []
+
+        query = """
+        MATCH (t:Tweet)
+        WHERE t.author = $author AND t.topic = $topic
+        RETURN t.text AS text, t.date AS date, t.sentiment AS sentiment, t.author AS author
+        """
+        return query, {"author": author, "topic": topic}, lambda records: [record.data() for record in records]
+
+    @staticmethod
+    def LLM_sample_tweets_by_author_topic(author: str, topic: str, n: int):
+        if author not in ["Obama", "Musk"]:
+            logger.debug("Author '%s' not supported for tweet generation.", author)
+            return None, {}, lambda records: []
+
+        # Sampled in the database and projected to the text: only n strings cross the wire
+        query = """
+        MATCH (t:Tweet)
+        WHERE t.author = $author AND t.topic = $topic
+        WITH t.text AS text
+        ORDER BY rand()
+        LIMIT $n
+        RETURN text
+        """
+        return query, {"author": author, "topic": topic, "n": n}, lambda records: [record["text"] for record in records]
+
+    @staticmethod
+    def LLM_get_entity_mentions_by_topic(topic: str):
+        query = """
+        MATCH (t:Tweet)-[:MENTIONS]->(e:Entity)
+        WHERE t.topic = $topic
+        RETURN t.text AS text, t.author AS author, collect([e.name, e.type]) AS entities
+        """
+        return query, {"topic": topic}, lambda records: [record.data() for record in records]
+
+    @staticmethod
+    def LLM_search_similar_tweets(topic: str, embeddings: list, k: int, candidates: int, index_name: str):
+        # The vector index can't be filtered by topic: fetch `candidates` nearest tweets of every
+        # topic per query and keep the k best of the requested one, so only k rows are returned
+        query = """
+        UNWIND range(0, size($embeddings) - 1) AS i
+        CALL {
+            WITH i
+            CALL db.index.vector.queryNodes($index_name, $candidates, $embeddings[i]) YIELD node AS t, score
+            WITH t, score
+            WHERE t.topic = $topic
+            RETURN t.text AS text, t.author AS author, score
+            ORDER BY score DESC
+            LIMIT $k
+        }
+        RETURN i, collect({text: text, author: author, score: score}) AS hits
+        """
+        params = {"topic": topic, "embeddings": embeddings, "k": k, "candidates": candidates, "index_name": index_name}
+
+        def transform(records):
+            hits = [[] for _ in embeddings]
+            for record in records:
+                hits[record["i"]] = record["hits"]
+            return hits
+
+        return query, params, transform
+
+    @staticmethod
+    def A_get_topics_by_author(author: str):
+        query = """
+        MATCH (t:Tweet)
+        WHERE t.topic IS NOT NULL
+        """
+
+        if author != "All":
+            query += " AND t.author = $author"
+
+        query += """
+        RETURN DISTINCT t.topic AS topic
+        ORDER BY topic
+        """
+        params = {"author": author} if author != "All" else {}
+        return query, params, lambda records: [record["topic"] for record in records]
+
+    @staticmethod
+    def A_get_years_by_author(author: str):
+        query = """
+        MATCH (t:Tweet)
+        WHERE t.year IS NOT NULL
+        """
+
+        if author != "All":
+            query += " AND t.author = $author"
+
+        query += """
+        RETURN DISTINCT toString(t.year) AS year
+        ORDER BY year
+        """
+        params = {"author": author} if author != "All" else {}
+        return query, params, lambda records: [record["year"] for record in records]
+
+    @staticmethod
+    def A1_get_likes_by_year_for_topic_and_author(topic: str, author: str):
+        query = """
+        MATCH (t:Tweet)
+        WHERE t.author = $author AND t.topic = $topic
+        RETURN toString(t.year) AS year, sum(t.likes) AS total_likes
+        ORDER BY year
+        """
+        return query, {"topic": topic, "author": author}, lambda records: [
+            {"year": record["year"], "likes": record["total_likes"]} for record in records
+        ]
+
+    @staticmethod
+    def A2_get_topic_trend_by_month_year(year: str, author: str):
+        query = """
+        MATCH (t:Tweet)
+        WHERE t.year = $year
+        AND t.topic IS NOT NULL
+        """
+
+        if author != "All":
+            query += " AND t.author = $author"
+
+        query += """
+        WITH t.month AS month_number, t.topic AS topic, count(*) AS count
+        RETURN right("0" + toString(month_number), 2) AS month, topic, count
+        ORDER BY month, count DESC
+        """
+
+        params = {"year": int(year)}
+        if author != "All":
+            params["author"] = author
+        return query, params, lambda records: [record.data() for record in records]
+
+    @staticmethod
+    def A3_get_top_tweets(metric: str, limit: int, author: str):
+        assert metric in ["likes", "retweets"]
+        query = f"""
+        MATCH (t:Tweet)
+        WHERE t.{metric} IS NOT NULL
+        """
+
+        if author != "All":
+            query += " AND t.author = $author"
+
+        query += f"""
+        RETURN t.text AS content, t.likes AS likes, t.retweets AS retweets,
+            toString(date(t.datetime)) AS date, t.topic AS topic, t.author AS author
+        ORDER BY t.{metric} DESC
+        LIMIT $limit"""
+
+        params = {"limit": limit}
+        if author != "All":
+            params["author"] = author
+        return query, params, lambda records: [record.data() for record in records]
+
+    @staticmethod
+    def A4_get_average_sentiment_by_topic():
+        query = """
+        MATCH (t:Tweet)
+        WHERE t.sentiment IN ['positive', 'neutral', 'negative']
+        AND t.topic IS NOT NULL
+        AND t.sentiment_confidence IS NOT NULL
+        WITH t.topic AS topic,
+            CASE t.sentiment
+                WHEN 'positive' THEN 1
+                WHEN 'neutral' THEN 0
+                WHEN 'negative' THEN -1
+            END AS s_value,
+            t.sentiment_confidence AS weight
+        RETURN topic,
+            sum(s_value * weight) / sum(weight) AS weighted_average_sentiment
+        ORDER BY weighted_average_sentiment DESC
+        """
+        return query, {}, lambda records: [
+            {"topic": row["topic"], "average_sentiment": row["weighted_average_sentiment"]}
+            for row in records
+        ]
+
+    @staticmethod
+    def A5_get_average_sentiment_per_year(author: str):
+        query = """
+        MATCH (t:Tweet)
+        WHERE t.author = $author
+        WITH t.year AS year,
+            CASE t.sentiment
+                WHEN "positive" THEN 1.0 * t.sentiment_confidence
+                WHEN "negative" THEN -1.0 * t.sentiment_confidence
+                ELSE 0
+            END AS sentiment_score
+        RETURN year, avg(sentiment_score) AS avg_sentiment
+        ORDER BY year
+        """
+        return query, {"author": author}, lambda records: [
+            {"year": record["year"], "avg_sentiment": record["avg_sentiment"]} for record in records
+        ]
+
+    @staticmethod
+    def A_get_analytics_columns():
+        query = """
+        MATCH (t:Tweet)
+        RETURN t.author AS author, t.topic AS topic, t.year AS year, t.month AS month,
+            t.likes AS likes, t.retweets AS retweets, t.sentiment AS sentiment,
+            t.sentiment_confidence AS sentiment_confidence, t.text AS text,
+            toString(date(t.datetime)) AS date
+        """
+        return query, {}, lambda records: [record.data() for record in records]
+
+    @staticmethod
+    def get_data_version():
+        query = """
+        OPTIONAL MATCH (v:DataVersion {name: "tweets"})
+        RETURN coalesce(v.version, 0) AS version
+        """
+        return query, {}, lambda records: records[0]["version"] if records else 0
+
+
+class CubeQueries(TweetQueries):
+    """
+    Analytics aggregations read from the (:TweetStats) cubes maintained by ingest.py and the
+    schema migrations (see neo4j_cubes.py): they scan one node per (author, topic, year, month)
+    instead of one per tweet, so their latency does not grow with the number of tweets.
+    Results are the same as the TweetQueries ones. A3 ranks individual tweets and still reads
+    the Tweet nodes through the likes/retweets indexes.
+    """
+
+    @staticmethod
+    def A_get_topics_by_author(author: str):
+        query = """
+        MATCH (s:TweetStats)
+        WHERE s.topic IS NOT NULL
+        """
+
+        if author != "All":
+            query += " AND s.author = $author"
+
+        query += """
+        RETURN DISTINCT s.topic AS topic
+        ORDER BY topic
+        """
+        params = {"author": author} if author != "All" else {}
+        return query, params, lambda records: [record["topic"] for record in records]
+
+    @staticmethod
+    def A_get_years_by_author(author: str):
+        query = """
+        MATCH (s:TweetStats)
+        WHERE s.year IS NOT NULL
+        """
+
+        if author != "All":
+            query += " AND s.author = $author"
+
+        query += """
+        RETURN DISTINCT toString(s.year) AS year
+        ORDER BY year
+        """
+        params = {"author": author} if author != "All" else {}
+        return query, params, lambda records: [record["year"] for record in records]
+
+    @staticmethod
+    def A1_get_likes_by_year_for_topic_and_author(topic: str, author: str):
+        query = """
+        MATCH (s:TweetStats)
+        WHERE s.author = $author AND s.topic = $topic
+        RETURN toString(s.year) AS year, sum(s.likes) AS total_likes
+        ORDER BY year
+        """
+        return query, {"topic": topic, "author": author}, lambda records: [
+            {"year": record["year"], "likes": record["total_likes"]} for record in records
+        ]
+
+    @staticmethod
+    def A2_get_topic_trend_by_month_year(year: str, author: str):
+        query = """
+        MATCH (s:TweetStats)
+        WHERE s.year = $year
+        AND s.topic IS NOT NULL
+        """
+
+        if author != "All":
+            query += " AND s.author = $author"
+
+        query += """
+        WITH s.month AS month_number, s.topic AS topic, sum(s.tweets) AS count
+        RETURN right("0" + toString(month_number), 2) AS month, topic, count
+        ORDER BY month, count DESC
+        """
+
+        params = {"year": int(year)}
+        if author != "All":
+            params["author"] = author
+        return query, params, lambda records: [record.data() for record in records]
+
+    @staticmethod
+    def A4_get_average_sentiment_by_topic():
+        query = """
+        MATCH (s:TweetStats)
+        WHERE s.topic IS NOT NULL AND s.sentiment_rows > 0
+        WITH s.topic AS topic, sum(s.sentiment_weighted) AS weighted, sum(s.sentiment_weight) AS weight
+        RETURN topic,
+            weighted / weight AS weighted_average_sentiment
+        ORDER BY weighted_average_sentiment DESC
+        """
+        return query, {}, lambda records: [
+            {"topic": row["topic"], "average_sentiment": row["weighted_average_sentiment"]}
+            for row in records
+        ]
+
+    @staticmethod
+    def A5_get_average_sentiment_per_year(author: str):
+        query = """
+        MATCH (s:TweetStats)
+        WHERE s.author = $author
+        WITH s.year AS year, sum(s.score_sum) AS total, sum(s.score_count) AS scored
+        RETURN year, CASE WHEN scored > 0 THEN total / scored END AS avg_sentiment
+        ORDER BY year
+        """
+        return query, {"author": author}, lambda records: [
+            {"year": record["year"], "avg_sentiment": record["avg_sentiment"]} for record in records
+        ]
+
+
 class Neo4jConnector:
-    def __init__(self):
+    def __init__(self, max_pool_size: int = NEO4J_MAX_POOL_SIZE, acquisition_timeout: float = NEO4J_ACQUISITION_TIMEOUT, fetch_size: int = NEO4J_FETCH_SIZE, use_cubes: bool = ANALYTICS_CUBES):
         """
         Initialize the Neo4j database connection using environment variables.
+
+        Args:
+            max_pool_size (int): Maximum number of connections kept in the driver pool.
+            acquisition_timeout (float): Seconds to wait for a free connection from the pool.
+            fetch_size (int): Number of records fetched per batch from the server.
+            use_cubes (bool): Answer the analytics aggregations from the TweetStats cubes.
         """
         self.driver = GraphDatabase.driver(
             os.getenv("NEO4J_URI"),
-            auth=(os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD"))
+            **driver_config(max_pool_size, acquisition_timeout)
         )
+        self.fetch_size = fetch_size
+        self.queries = CubeQueries if use_cubes else TweetQueries
 
     def close(self):
         """
         Close the Neo4j database connection.
         """
         self.driver.close()
-        
+
+    def _read(self, query, params: dict, transform):
+        """
+        Run a query in a read transaction (routed to a reader in a cluster) and transform its records.
+        """
+        if query is None:
+            return transform([])
+
+        with metrics.stage("neo4j"), self.driver.session(database=NEO4J_DATABASE, fetch_size=self.fetch_size, default_access_mode=READ_ACCESS) as session:
+            return session.execute_read(lambda tx: transform(list(tx.run(query, params))))
+
     def LLM_get_tweets_by_topic(self, topic: str):
         """
         Retrieve tweets by a specific author and topic from the Neo4j database.
-        
+
         Args:
             topic (str): The topic to filter tweets by.
-            
+
         Returns:
             list: A list of tweets by the specified topic, each represented as a dictionary.
         """
-        """if author not in  ["Obama", "Musk"]:
-            print("[DEBUG] Author not found.")
-            return []"""
-        
-        with self.driver.session() as session:
-            result = session.run(
-                """
-                MATCH (t:Tweet)
-                WHERE t.topic = $topic 
-                RETURN t.text AS text, t.date AS date, t.sentiment AS sentiment, t.author AS author
-                """,
-                
-                topic=topic
-            )
-            return [record.data() for record in result]
+        return self._read(*self.queries.LLM_get_tweets_by_topic(topic))
 
     def LLM_get_tweets_by_author_topic(self, author: str, topic: str):
         """
         Retrieve tweets by a specific author and topic for tweet generation.
-        
+
         Args:
             author (str): The author to filter tweets by (e.g., "Obama", "Musk").
             topic (str): The topic to filter tweets by.
-            
+
         Returns:
             list: A list of tweets by the specified author and topic, each as a dictionary.
         """
-        if author not in ["Obama", "Musk"]:
-            print(f"[DEBUG] Author '{author}' not supported for tweet generation.")
-            return []
-        
-        with self.driver.session() as session:
-            result = session.run(
-                """
-                MATCH (t:Tweet)
-                WHERE t.author = $author AND t.topic = $topic
-                RETURN t.text AS text, t.date AS date, t.sentiment AS sentiment, t.author AS author
-                """,
-                author=author,
-                topic=topic
-            )
-            return [record.data() for record in result]
+        return self._read(*self.queries.LLM_get_tweets_by_author_topic(author, topic))
 
-    def A_get_topics_by_author(self, author: str):
+    def LLM_sample_tweets_by_author_topic(self, author: str, topic: str, n: int):
         """
-        Return distinct topics for tweets authored by the given author.
-        
+        Return the text of a random sample of the tweets of an author on a topic.
+
         Args:
-            author (str): The author's name to filter tweets by (or 'All')
-            
+            author (str): The author to filter tweets by (e.g., "Obama", "Musk").
+            topic (str): The topic to filter tweets by.
+            n (int): Maximum number of tweets to return.
+
         Returns:
-            list: A list of distinct topics associated with the author's tweets.
+            list: Up to n tweet texts, in random order.
         """
-        query = """
-        MATCH (t:Tweet)
-        WHERE t.topic IS NOT NULL
+        return self._read(*self.queries.LLM_sample_tweets_by_author_topic(author, topic, n))
+
+    def LLM_get_entity_mentions_by_topic(self, topic: str):
         """
+        Return the entities mentioned by the tweets of a topic (MENTIONS relationships).
 
-        if author != "All":
-            query += " AND t.author = $author"
+        Args:
+            topic (str): The topic to filter tweets by.
 
-        query += """
-        RETURN DISTINCT t.topic AS topic
-        ORDER BY topic
+        Returns:
+            list: For each tweet with at least one entity, a dictionary with text, author and
+            entities (a list of [name, type] pairs).
+        """
+        return self._read(*self.queries.LLM_get_entity_mentions_by_topic(topic))
+
+    def LLM_search_similar_tweets(self, topic: str, embeddings: list, k: int, candidates: int, index_name: str):
+        """
+        Find the tweets of a topic closest to query embeddings with the Neo4j vector index.
+
+        Args:
+            topic (str): The topic the returned tweets must have.
+            embeddings (list): The query embeddings, as lists of floats.
+            k (int): Number of tweets to return per query.
+            candidates (int): Number of nearest tweets (all topics) fetched from the index per query.
+            index_name (str): Name of the vector index on the Tweet embeddings.
+
+        Returns:
+            list: For each query, up to k dictionaries with text, author and score (cosine, highest first).
         """
+        return self._read(*self.queries.LLM_search_similar_tweets(topic, embeddings, k, candidates, index_name))
 
-        with self.driver.session() as session:
-            result = session.run(query, author=author) if author != "All" else session.run(query)
-            return [record["topic"] for record in result]
+    def A_get_topics_by_author(self, author: str):
+        """
+        Return distinct topics for tweets authored by the given author.
+
+        Args:
+            author (str): The author's name to filter tweets by (or 'All')
+
+        Returns:
+            list: A list of distinct topics associated with the author's tweets.
+        """
+        return self._read(*self.queries.A_get_topics_by_author(author))
 
     def A_get_years_by_author(self, author: str):
         """
@@ -106,85 +492,38 @@ class Neo4jConnector:
 
         Args:
             author (str): Author name or "All"
-        
+
         Returns:
             list: A sorted list of years (as strings)
         """
-        query = """
-        MATCH (t:Tweet)
-        WHERE t.date IS NOT NULL
-        """
+        return self._read(*self.queries.A_get_years_by_author(author))
 
-        if author != "All":
-            query += " AND t.author = $author"
+    def A1_get_likes_by_year_for_topic_and_author(self, topic: str, author: str):
 
-        query += """
-        RETURN DISTINCT substring(t.date, 0, 4) AS year
-        ORDER BY year
         """
+        Return number of likes per year for a given topic.
 
-        with self.driver.session() as session:
-            result = session.run(query, author=author) if author != "All" else session.run(query)
-            return [record["year"] for record in result]
-
-    def A1_get_likes_by_year_for_topic_and_author(self, topic: str, author: str):
-        
-        """
-        Return number of likes per year for a given topic. 
-        
         Args:
             topic (str): The topic to filter tweets by.
             author (str): The author to filter tweets by.
-        
+
         Returns:
             list: A list of dictionaries with year and total likes for that year.
         """
-        with self.driver.session() as session:
-            result = session.run(
-                """
-                MATCH (t:Tweet)
-                WHERE t.topic = $topic AND t.author = $author
-                WITH t, substring(t.date, 0, 4) AS year
-                RETURN year, sum(t.likes) AS total_likes
-                ORDER BY year
-                """,
-                topic=topic,
-                author=author
-            )
-            return [{"year": record["year"], "likes": record["total_likes"]} for record in result]
-        
+        return self._read(*self.queries.A1_get_likes_by_year_for_topic_and_author(topic, author))
+
     def A2_get_topic_trend_by_month_year(self, year: str, author: str):
         """
         Retrieve the topic trend for a specific year and author from the Neo4j database.
-        
+
         Args:
             year (str): Year in 'YYYY' format
             author (str): Author name or 'All' for all authors
-        
+
         Returns:
             list: List of {month, topic, count}
         """
-        query = """
-        MATCH (t:Tweet)
-        WHERE t.date STARTS WITH $year
-        AND t.topic IS NOT NULL
-        """
-
-        if author != "All":
-            query += " AND t.author = $author"
-
-        query += """
-        RETURN substring(t.date, 5, 2) AS month, t.topic AS topic, count(*) AS count
-        ORDER BY month, count DESC
-        """
-
-        params = {"year": year}
-        if author != "All":
-            params["author"] = author
-
-        with self.driver.session() as session:
-            result = session.run(query, **params)
-            return result.data()
+        return self._read(*self.queries.A2_get_topic_trend_by_month_year(year, author))
 
     def A3_get_top_tweets(self, metric: str, limit: int, author: str):
         """
@@ -198,78 +537,188 @@ class Neo4jConnector:
         Returns:
             list: tweets with id, content, likes, retweets, date, and topic
         """
-        assert metric in ["likes", "retweets"]
-        query = f"""
-        MATCH (t:Tweet)
-        WHERE t.{metric} IS NOT NULL
-        """
-        
-        if author != "All":
-            query += " AND t.author = $author"
-            
-        query += f"""
-        RETURN t.text AS content, t.likes AS likes, t.retweets AS retweets,
-            substring(t.date, 0, 10) AS date, t.topic AS topic, t.author AS author
-        ORDER BY t.{metric} DESC
-        LIMIT $limit"""
-        
-        with self.driver.session() as session:
-            params = {"limit": limit}
-            if author != "All":
-                params["author"] = author
-            result = session.run(query, **params)
-            return result.data()
+        return self._read(*self.queries.A3_get_top_tweets(metric, limit, author))
 
     def A4_get_average_sentiment_by_topic(self):
         """
         Retrieve the average sentiment for each topic from the Neo4j database.
-        
+
         Returns:
             list: A list of dictionaries containing the topic and its average sentiment value.
         """
-        with self.driver.session() as session:
-            result = session.run("""
-                MATCH (t:Tweet)
-                WHERE t.sentiment IN ['positive', 'neutral', 'negative'] 
-                AND t.topic IS NOT NULL 
-                AND t.sentiment_confidence IS NOT NULL
-                WITH t.topic AS topic,
-                    CASE t.sentiment
-                        WHEN 'positive' THEN 1
-                        WHEN 'neutral' THEN 0
-                        WHEN 'negative' THEN -1
-                    END AS s_value,
-                    t.sentiment_confidence AS weight
-                RETURN topic, 
-                    sum(s_value * weight) / sum(weight) AS weighted_average_sentiment
-                ORDER BY weighted_average_sentiment DESC
-            """)
-            return [
-                {"topic": row["topic"], "average_sentiment": row["weighted_average_sentiment"]}
-                for row in result
-            ]
+        return self._read(*self.queries.A4_get_average_sentiment_by_topic())
 
     def A5_get_average_sentiment_per_year(self, author):
         """
         Retrieve the average sentiment per year for a given author.
-        
+
         Args:
             author (str): Author to filter tweets by.
-        
+
         Returns:
             list: List of dictionaries with year and average sentiment.
         """
-        with self.driver.session() as session:
-            result = session.run("""
-                MATCH (t:Tweet)
-                WHERE t.author = $author
-                WITH toInteger(split(t.date, "-")[0]) AS year,
-                    CASE t.sentiment
-                        WHEN "positive" THEN 1.0 * t.sentiment_confidence
-                        WHEN "negative" THEN -1.0 * t.sentiment_confidence
-                        ELSE 0
-                    END AS sentiment_score
-                RETURN year, avg(sentiment_score) AS avg_sentiment
-                ORDER BY year
-            """, author=author)
-            return [{"year": record["year"], "avg_sentiment": record["avg_sentiment"]} for record in result]
+        return self._read(*self.queries.A5_get_average_sentiment_per_year(author))
+
+    def A_get_analytics_columns(self):
+        """
+        Retrieve the scalar columns of every tweet used by the analytics (see services/analytics_engine.py).
+
+        Returns:
+            list: One dictionary per tweet with author, topic, year, month, likes, retweets,
+                sentiment, sentiment_confidence, text and date.
+        """
+        return self._read(*self.queries.A_get_analytics_columns())
+
+    def get_data_version(self):
+        """
+        Return the tweet data version, incremented by every ingestion run.
+
+        Returns:
+            int: The current data version (0 if nothing was ingested through ingest.py).
+        """
+        return self._read(*self.queries.get_data_version())
+
+
+class AsyncNeo4jConnector:
+    """
+    Asynchronous counterpart of Neo4jConnector, built on the neo4j async driver, for the
+    `async def` FastAPI routes. Methods have the same names, arguments and results.
+    """
+
+    def __init__(self, max_pool_size: int = NEO4J_MAX_POOL_SIZE, acquisition_timeout: float = NEO4J_ACQUISITION_TIMEOUT, fetch_size: int = NEO4J_FETCH_SIZE, use_cubes: bool = ANALYTICS_CUBES):
+        """
+        Initialize the async Neo4j driver using environment variables.
+
+        Args:
+            max_pool_size (int): Maximum number of connections kept in the driver pool.
+            acquisition_timeout (float): Seconds to wait for a free connection from the pool.
+            fetch_size (int): Number of records fetched per batch from the server.
+            use_cubes (bool): Answer the analytics aggregations from the TweetStats cubes.
+        """
+        self.driver = AsyncGraphDatabase.driver(
+            os.getenv("NEO4J_URI"),
+            **driver_config(max_pool_size, acquisition_timeout)
+        )
+        self.fetch_size = fetch_size
+        self.queries = CubeQueries if use_cubes else TweetQueries
+
+    async def close(self):
+        """
+        Close the async Neo4j driver.
+        """
+        await self.driver.close()
+
+    async def _read(self, query, params: dict, transform):
+        """
+        Run a query in a read transaction (routed to a reader in a cluster) and transform its records.
+        """
+        if query is None:
+            return transform([])
+
+        async def work(tx):
+            result = await tx.run(query, params)
+            return transform([record async for record in result])
+
+        with metrics.stage("neo4j"):
+            async with self.driver.session(database=NEO4J_DATABASE, fetch_size=self.fetch_size, default_access_mode=READ_ACCESS) as session:
+                return await session.execute_read(work)
+
+    async def gather(self, *calls):
+        """
+        Run several connector calls concurrently, each on its own pooled session.
+
+        Example:
+            topics, years = await connector.gather(
+                connector.A_get_topics_by_author("Obama"),
+                connector.A_get_years_by_author("Obama"),
+            )
+
+        Returns:
+            list: The results of the calls, in the order they were given.
+        """
+        return await asyncio.gather(*calls)
+
+    async def LLM_get_tweets_by_topic(self, topic: str):
+        """
+        Retrieve tweets by a specific topic (see Neo4jConnector.LLM_get_tweets_by_topic).
+        """
+        return await self._read(*self.queries.LLM_get_tweets_by_topic(topic))
+
+    async def LLM_get_tweets_by_author_topic(self, author: str, topic: str):
+        """
+        Retrieve tweets by author and topic (see Neo4jConnector.LLM_get_tweets_by_author_topic).
+        """
+        return await self._read(*self.queries.LLM_get_tweets_by_author_topic(author, topic))
+
+    async def LLM_sample_tweets_by_author_topic(self, author: str, topic: str, n: int):
+        """
+        Return the text of a random sample of tweets (see Neo4jConnector.LLM_sample_tweets_by_author_topic).
+        """
+        return await self._read(*self.queries.LLM_sample_tweets_by_author_topic(author, topic, n))
+
+    async def LLM_get_entity_mentions_by_topic(self, topic: str):
+        """
+        Return the entities mentioned by the tweets of a topic (see Neo4jConnector.LLM_get_entity_mentions_by_topic).
+        """
+        return await self._read(*self.queries.LLM_get_entity_mentions_by_topic(topic))
+
+    async def LLM_search_similar_tweets(self, topic: str, embeddings: list, k: int, candidates: int, index_name: str):
+        """
+        Find the tweets of a topic closest to query embeddings (see Neo4jConnector.LLM_search_similar_tweets).
+        """
+        return await self._read(*self.queries.LLM_search_similar_tweets(topic, embeddings, k, candidates, index_name))
+
+    async def A_get_topics_by_author(self, author: str):
+        """
+        Return distinct topics of an author (see Neo4jConnector.A_get_topics_by_author).
+        """
+        return await self._read(*self.queries.A_get_topics_by_author(author))
+
+    async def A_get_years_by_author(self, author: str):
+        """
+        Return distinct years of an author (see Neo4jConnector.A_get_years_by_author).
+        """
+        return await self._read(*self.queries.A_get_years_by_author(author))
+
+    async def A1_get_likes_by_year_for_topic_and_author(self, topic: str, author: str):
+        """
+        Return likes per year (see Neo4jConnector.A1_get_likes_by_year_for_topic_and_author).
+        """
+        return await self._read(*self.queries.A1_get_likes_by_year_for_topic_and_author(topic, author))
+
+    async def A2_get_topic_trend_by_month_year(self, year: str, author: str):
+        """
+        Return the monthly topic trend (see Neo4jConnector.A2_get_topic_trend_by_month_year).
+        """
+        return await self._read(*self.queries.A2_get_topic_trend_by_month_year(year, author))
+
+    async def A3_get_top_tweets(self, metric: str, limit: int, author: str):
+        """
+        Return the top tweets (see Neo4jConnector.A3_get_top_tweets).
+        """
+        return await self._read(*self.queries.A3_get_top_tweets(metric, limit, author))
+
+    async def A4_get_average_sentiment_by_topic(self):
+        """
+        Return the average sentiment per topic (see Neo4jConnector.A4_get_average_sentiment_by_topic).
+        """
+        return await self._read(*self.queries.A4_get_average_sentiment_by_topic())
+
+    async def A5_get_average_sentiment_per_year(self, author: str):
+        """
+        Return the average sentiment per year (see Neo4jConnector.A5_get_average_sentiment_per_year).
+        """
+        return await self._read(*self.queries.A5_get_average_sentiment_per_year(author))
+
+    async def A_get_analytics_columns(self):
+        """
+        Retrieve the scalar columns of every tweet (see Neo4jConnector.A_get_analytics_columns).
+        """
+        return await self._read(*self.queries.A_get_analytics_columns())
+
+    async def get_data_version(self):
+        """
+        Return the tweet data version (see Neo4jConnector.get_data_version).
+        """
+        return await self._read(*self.queries.get_data_version())
@@ -0,0 +1,157 @@
+from neo4j import GraphDatabase
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Aggregate cubes: one (:TweetStats) node per (author, topic, year, month) cell holding the sums
+# the analytics queries need, so that they aggregate a few thousand cells instead of every tweet.
+#   tweets                                    number of tweets (A2)
+#   likes                                     sum of the likes (A1)
+#   sentiment_weighted, sentiment_weight,     sum of sentiment value * confidence, sum of confidence and
+#   sentiment_rows                            number of tweets with a sentiment and a confidence (A4)
+#   score_sum, score_count                    sum and number of the non-null sentiment scores (A5)
+# Null dimensions are stored as missing properties, like on the Tweet nodes.
+
+SENTIMENT_VALUES = {"positive": 1, "neutral": 0, "negative": -1}
+
+# Cells are identified by a key built from the dimensions (empty string for null)
+CYPHER_CELL_KEY = """
+coalesce(author, "") + "\\u001f" + coalesce(topic, "") + "\\u001f" +
+coalesce(toString(year), "") + "\\u001f" + coalesce(toString(month), "")
+"""
+
+DELETE_CUBES = """
+MATCH (s:TweetStats)
+CALL {
+    WITH s
+    DELETE s
+} IN TRANSACTIONS OF 10000 ROWS
+"""
+
+BUILD_CUBES = f"""
+MATCH (t:Tweet)
+WITH t.author AS author, t.topic AS topic, t.year AS year, t.month AS month,
+    CASE t.sentiment WHEN 'positive' THEN 1 WHEN 'neutral' THEN 0 WHEN 'negative' THEN -1 END AS s_value,
+    t.sentiment_confidence AS weight,
+    CASE t.sentiment
+        WHEN "positive" THEN 1.0 * t.sentiment_confidence
+        WHEN "negative" THEN -1.0 * t.sentiment_confidence
+        ELSE 0.0
+    END AS score,
+    t.likes AS likes
+WITH author, topic, year, month,
+    count(*) AS tweets,
+    sum(likes) AS likes,
+    sum(CASE WHEN s_value IS NOT NULL AND weight IS NOT NULL THEN s_value * weight ELSE 0.0 END) AS sentiment_weighted,
+    sum(CASE WHEN s_value IS NOT NULL AND weight IS NOT NULL THEN weight ELSE 0.0 END) AS sentiment_weight,
+    count(CASE WHEN s_value IS NOT NULL AND weight IS NOT NULL THEN 1 END) AS sentiment_rows,
+    sum(coalesce(score, 0.0)) AS score_sum,
+    count(score) AS score_count
+CREATE (:TweetStats {{
+    key: {CYPHER_CELL_KEY},
+    author: author, topic: topic, year: year, month: month,
+    tweets: tweets, likes: likes,
+    sentiment_weighted: sentiment_weighted, sentiment_weight: sentiment_weight, sentiment_rows: sentiment_rows,
+    score_sum: score_sum, score_count: score_count
+}})
+"""
+
+MERGE_CELLS = """
+UNWIND $cells AS cell
+MERGE (s:TweetStats {key: cell.key})
+ON CREATE SET s.author = cell.author, s.topic = cell.topic, s.year = cell.year, s.month = cell.month,
+    s.tweets = 0, s.likes = 0, s.sentiment_weighted = 0.0, s.sentiment_weight = 0.0, s.sentiment_rows = 0,
+    s.score_sum = 0.0, s.score_count = 0
+SET s.tweets = s.tweets + cell.tweets,
+    s.likes = s.likes + cell.likes,
+    s.sentiment_weighted = s.sentiment_weighted + cell.sentiment_weighted,
+    s.sentiment_weight = s.sentiment_weight + cell.sentiment_weight,
+    s.sentiment_rows = s.sentiment_rows + cell.sentiment_rows,
+    s.score_sum = s.score_sum + cell.score_sum,
+    s.score_count = s.score_count + cell.score_count
+"""
+
+
+def cell_key(author, topic, year, month) -> str:
+    """
+    Build the key of a cube cell, identical to the one computed in Cypher (CYPHER_CELL_KEY).
+    """
+    return "\x1f".join("" if value is None else str(value) for value in (author, topic, year, month))
+
+
+def aggregate_rows(rows: list) -> list:
+    """
+    Aggregate parsed tweet rows (see dataset.parse_row) into cube cell increments.
+
+    Args:
+        rows (list): Parsed rows of new tweets.
+
+    Returns:
+        list: One dictionary per cell with its dimensions, key and the sums to add.
+    """
+    cells = {}
+    for row in rows:
+        dimensions = (row["author"], row["topic"], row["year"], row["month"])
+        cell = cells.get(dimensions)
+        if cell is None:
+            cell = cells[dimensions] = {
+                "key": cell_key(*dimensions),
+                "author": row["author"], "topic": row["topic"], "year": row["year"], "month": row["month"],
+                "tweets": 0, "likes": 0, "sentiment_weighted": 0.0, "sentiment_weight": 0.0,
+                "sentiment_rows": 0, "score_sum": 0.0, "score_count": 0,
+            }
+
+        cell["tweets"] += 1
+        cell["likes"] += row["likes"] or 0
+
+        value = SENTIMENT_VALUES.get(row["sentiment"])
+        weight = row["sentiment_confidence"]
+        if value is not None and weight is not None:
+            cell["sentiment_weighted"] += value * weight
+            cell["sentiment_weight"] += weight
+            cell["sentiment_rows"] += 1
+
+        # Same score as A5: a positive/negative tweet without confidence has no score
+        if value in (1, -1):
+            if weight is not None:
+                cell["score_sum"] += value * weight
+                cell["score_count"] += 1
+        else:
+            cell["score_count"] += 1
+    return list(cells.values())
+
+
+def update_cubes(session, rows: list, batch_size: int = 5000):
+    """
+    Add new tweets to the cubes. The rows must not be in the cubes yet (a tweet written twice
+    would be counted twice): full reloads rebuild the cubes instead.
+    """
+    cells = aggregate_rows(rows)
+    for start in range(0, len(cells), batch_size):
+        session.run(MERGE_CELLS, cells=cells[start:start + batch_size]).consume()
+    return len(cells)
+
+
+def rebuild_cubes(session):
+    """
+    Recompute every cube cell from the Tweet nodes.
+    """
+    session.run(DELETE_CUBES).consume()
+    session.run(BUILD_CUBES).consume()
+    count = session.run("MATCH (s:TweetStats) RETURN count(s) AS cells").single()["cells"]
+    print(f"[CUBES] Rebuilt {count} aggregate cells")
+    return count
+
+
+if __name__ == "__main__":
+    # Rebuild the cubes after loading tweets without ingest.py: `python neo4j_cubes.py`
+    driver = GraphDatabase.driver(
+        os.getenv("NEO4J_URI"),
+        auth=(os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD"))
+    )
+    try:
+        with driver.session(database=os.getenv("NEO4J_DATABASE") or None) as session:
+            rebuild_cubes(session)
+    finally:
+        driver.close()
@@ -0,0 +1,246 @@
+from neo4j import GraphDatabase
+from neo4j.exceptions import ClientError
+import contextlib
+import hashlib
+import os
+import re
+import socket
+import time
+import uuid
+from dotenv import load_dotenv
+
+from neo4j_cubes import rebuild_cubes
+
+load_dotenv()
+
+BACKFILL_BATCH_SIZE = 10000
+
+# Backend workers started together (uvicorn --workers N) migrate one at a time: the others wait
+# for the lock, then find the migrations applied. An expired lock (crashed owner) can be taken over.
+MIGRATION_LOCK_TTL_S = float(os.getenv("NEO4J_MIGRATION_LOCK_TTL_S", "1800"))
+MIGRATION_LOCK_WAIT_S = float(os.getenv("NEO4J_MIGRATION_LOCK_WAIT_S", "1800"))
+
+LOCK_CONSTRAINT = "CREATE CONSTRAINT schema_lock_name IF NOT EXISTS FOR (l:SchemaLock) REQUIRE l.name IS UNIQUE"
+
+# Setting `l.locked` first takes the write lock of the node, so the owner check below sees the
+# last committed owner and two processes cannot both acquire the lock
+ACQUIRE_LOCK = """
+MERGE (l:SchemaLock {name: $name})
+SET l.locked = true
+WITH l
+WHERE l.owner IS NULL OR l.owner = $owner OR l.expires_at < datetime()
+SET l.owner = $owner, l.expires_at = datetime() + duration({seconds: $ttl})
+RETURN l.owner AS owner
+"""
+
+RELEASE_LOCK = """
+MATCH (l:SchemaLock {name: $name})
+WHERE l.owner = $owner
+SET l.locked = false, l.owner = null, l.expires_at = null
+"""
+
+# Vector index on the Tweet embeddings (all-MiniLM-L6-v2 sentence embeddings, see services/retrieval.py)
+VECTOR_INDEX_NAME = "tweet_embedding"
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "384"))
+# Vector indexes are available from Neo4j 5.11
+VECTOR_INDEX_MIN_VERSION = (5, 11)
+
+
+def tweet_id(date: str, text: str) -> str:
+    """
+    Compute the identity of a tweet: a hash of its date and text, the pair the dataset is deduplicated on.
+
+    Args:
+        date (str): The tweet date as stored in the dataset ("YYYY-MM-DD HH:MM:SS").
+        text (str): The tweet text.
+
+    Returns:
+        str: The hexadecimal SHA-1 digest used as the Tweet `id` property.
+    """
+    return hashlib.sha1(f"{date}\x1f{text}".encode("utf-8")).hexdigest()
+
+
+def backfill_tweet_ids(session):
+    """
+    Set the `id` property on the Tweet nodes that don't have one yet.
+    """
+    while True:
+        rows = session.run(
+            """
+            MATCH (t:Tweet)
+            WHERE t.id IS NULL
+            RETURN elementId(t) AS element_id, t.date AS date, t.text AS text
+            LIMIT $limit
+            """,
+            limit=BACKFILL_BATCH_SIZE
+        ).data()
+        if not rows:
+            return
+
+        session.run(
+            """
+            UNWIND $rows AS row
+            MATCH (t:Tweet) WHERE elementId(t) = row.element_id
+            SET t.id = row.id
+            """,
+            rows=[{"element_id": r["element_id"], "id": tweet_id(r["date"], r["text"])} for r in rows]
+        ).consume()
+
+
+def server_version(session) -> tuple:
+    """
+    Return the (major, minor) version of the Neo4j server.
+    """
+    version = session.run("CALL dbms.components() YIELD versions RETURN versions[0] AS version").single()["version"]
+    # e.g. "5.26.0", "5.27-aura" or "2025.01.0"
+    return tuple(int(part) for part in re.findall(r"\d+", version)[:2])
+
+
+def create_vector_index(session):
+    """
+    Create the vector index on the Tweet embeddings. Servers without vector indexes are skipped
+    (the index can still be created after an upgrade with `python -m services.retrieval backfill`).
+    """
+    if server_version(session) < VECTOR_INDEX_MIN_VERSION:
+        print(f"[SCHEMA] Neo4j < {'.'.join(map(str, VECTOR_INDEX_MIN_VERSION))} has no vector index, skipping '{VECTOR_INDEX_NAME}'")
+        return
+    session.run(
+        f"""
+        CREATE VECTOR INDEX {VECTOR_INDEX_NAME} IF NOT EXISTS
+        FOR (t:Tweet) ON (t.embedding)
+        OPTIONS {{indexConfig: {{`vector.dimensions`: {EMBEDDING_DIMENSIONS}, `vector.similarity_function`: 'cosine'}}}}
+        """
+    ).consume()
+
+
+# Ordered schema migrations: (version, description, steps). A step is either a Cypher statement
+# (run in an auto-commit transaction, so `CALL {...} IN TRANSACTIONS` is allowed) or a function
+# receiving the session. Every step must be idempotent.
+MIGRATIONS = [
+    (1, "Tweet identity: id property and uniqueness constraint", [
+        backfill_tweet_ids,
+        "CREATE CONSTRAINT tweet_id_unique IF NOT EXISTS FOR (t:Tweet) REQUIRE t.id IS UNIQUE",
+    ]),
+    (2, "Native temporal properties: year, month and datetime", [
+        """
+        MATCH (t:Tweet)
+        WHERE t.date IS NOT NULL AND t.datetime IS NULL
+        CALL {
+            WITH t
+            SET t.year = toInteger(substring(t.date, 0, 4)),
+                t.month = toInteger(substring(t.date, 5, 2)),
+                t.datetime = datetime(replace(t.date, " ", "T"))
+        } IN TRANSACTIONS OF 10000 ROWS
+        """,
+    ]),
+    (3, "Indexes for the analytics and retrieval queries", [
+        "CREATE INDEX tweet_author_topic IF NOT EXISTS FOR (t:Tweet) ON (t.author, t.topic)",
+        "CREATE INDEX tweet_topic IF NOT EXISTS FOR (t:Tweet) ON (t.topic)",
+        "CREATE INDEX tweet_author_year IF NOT EXISTS FOR (t:Tweet) ON (t.author, t.year)",
+        "CREATE INDEX tweet_year_month IF NOT EXISTS FOR (t:Tweet) ON (t.year, t.month)",
+        "CREATE INDEX tweet_likes IF NOT EXISTS FOR (t:Tweet) ON (t.likes)",
+        "CREATE INDEX tweet_retweets IF NOT EXISTS FOR (t:Tweet) ON (t.retweets)",
+        "CREATE INDEX entity_name_type IF NOT EXISTS FOR (e:Entity) ON (e.name, e.type)",
+    ]),
+    (4, "Aggregate cubes: TweetStats summary nodes per (author, topic, year, month)", [
+        "CREATE CONSTRAINT tweet_stats_key IF NOT EXISTS FOR (s:TweetStats) REQUIRE s.key IS UNIQUE",
+        rebuild_cubes,
+    ]),
+    (5, "Vector index on the Tweet embeddings (RETRIEVAL_BACKEND=neo4j)", [
+        create_vector_index,
+    ]),
+]
+
+
+@contextlib.contextmanager
+def migration_lock(session, name: str = "migrations", ttl_s: float = MIGRATION_LOCK_TTL_S, wait_s: float = MIGRATION_LOCK_WAIT_S):
+    """
+    Hold a lock stored in the graph (a SchemaLock node) while migrating, waiting for the other
+    processes that hold it.
+
+    Args:
+        session: A sync Neo4j session.
+        name (str): The name of the lock.
+        ttl_s (float): Time after which a lock that was not released can be taken over.
+        wait_s (float): Maximum time to wait for the lock.
+
+    Raises:
+        TimeoutError: If the lock could not be acquired within `wait_s` seconds.
+    """
+    try:
+        session.run(LOCK_CONSTRAINT).consume()
+    except ClientError:
+        pass  # Created concurrently by another process
+
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}"
+    deadline = time.monotonic() + wait_s
+    while session.execute_write(lambda tx: tx.run(ACQUIRE_LOCK, name=name, owner=owner, ttl=int(ttl_s)).single()) is None:
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"Schema lock '{name}' still held after {wait_s}s")
+        time.sleep(1)
+    try:
+        yield
+    finally:
+        session.execute_write(lambda tx: tx.run(RELEASE_LOCK, name=name, owner=owner).consume())
+
+
+def applied_versions(session) -> set:
+    """
+    Return the versions of the migrations already applied to the database.
+    """
+    result = session.run("MATCH (m:SchemaMigration) RETURN m.version AS version")
+    return {record["version"] for record in result}
+
+
+def apply_migrations(driver, database: str = None) -> list:
+    """
+    Apply the pending schema migrations in order and record them as SchemaMigration nodes, then
+    set the id of the Tweet nodes created without one since the first migration. Concurrent calls
+    (e.g. backend workers starting together) are serialized by the schema lock.
+
+    Args:
+        driver: A sync Neo4j driver.
+        database (str): The database to migrate (default database if None).
+
+    Returns:
+        list: The versions that were applied by this call.
+    """
+    applied = []
+    with driver.session(database=database) as session, migration_lock(session):
+        done = applied_versions(session)
+        for version, description, steps in MIGRATIONS:
+            if version in done:
+                continue
+
+            print(f"[SCHEMA] Applying migration {version}: {description}")
+            for step in steps:
+                if callable(step):
+                    step(session)
+                else:
+                    session.run(step).consume()
+            session.run(
+                "MERGE (m:SchemaMigration {version: $version}) SET m.description = $description, m.applied_at = datetime()",
+                version=version,
+                description=description
+            ).consume()
+            applied.append(version)
+
+        if 1 in done:
+            # Tweets loaded outside ingest.py (e.g. utils/cypher_create_dataset.txt) have no id yet
+            backfill_tweet_ids(session)
+
+        if applied:
+            session.run("CALL db.awaitIndexes(300)").consume()
+    return applied
+
+
+if __name__ == "__main__":
+    driver = GraphDatabase.driver(
+        os.getenv("NEO4J_URI"),
+        auth=(os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD"))
+    )
+    try:
+        versions = apply_migrations(driver, os.getenv("NEO4J_DATABASE") or None)
+        print(f"[SCHEMA] Applied migrations: {versions}" if versions else "[SCHEMA] Schema is up to date")
+    finally:
+        driver.close()
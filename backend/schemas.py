@@ -1,13 +1,24 @@
 from pydantic import BaseModel
+from typing import Literal
 
-class TweetRequest(BaseModel):
+class StreamOptions(BaseModel):
+    # 1: frames with the full text so far, 2: delta frames with sequence numbers (see services/streaming.py)
+    stream_protocol: Literal[1, 2] = 1
+    # Optional server-side coalescing of tokens into frames (0 = disabled)
+    coalesce_ms: float = 0
+    coalesce_chars: int = 0
+
+class TweetRequest(StreamOptions):
     tweet: str
 
+class BatchTweetRequest(BaseModel):
+    tweets: list[str]
+
 class TweetResponse(BaseModel):
     author: str
     confidence: float
     message: str
 
-class TweetGenerationRequest(BaseModel):
+class TweetGenerationRequest(StreamOptions):
     author: str
     topic: str
\ No newline at end of file
@@ -0,0 +1,224 @@
+import asyncio
+import collections
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "2"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "16"))
+LLM_QUEUE_TIMEOUT_S = float(os.getenv("LLM_QUEUE_TIMEOUT_S", "60"))
+LLM_REJECT_STATUS = int(os.getenv("LLM_REJECT_STATUS", "503"))  # 503 or 429
+QUEUE_POSITION_INTERVAL_S = 0.5
+
+
+class Overloaded(Exception):
+    """
+    Raised when a request cannot be admitted because the LLM queue is full.
+    """
+
+    def __init__(self, status_code: int = LLM_REJECT_STATUS, retry_after: int = 5):
+        super().__init__("The LLM queue is full, please retry later.")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """
+    A place in the LLM admission queue. Release it once the LLM stream is done.
+    """
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.admitted = asyncio.get_running_loop().create_future()
+        self.released = False
+
+    def position(self) -> int:
+        """
+        Return the 1-based position in the queue (0 once admitted).
+        """
+        if self.admitted.done():
+            return 0
+        return self.controller.waiters.index(self) + 1
+
+    async def wait(self, timeout_s: float = LLM_QUEUE_TIMEOUT_S, interval_s: float = QUEUE_POSITION_INTERVAL_S):
+        """
+        Wait until admitted, yielding the queue position whenever it changes.
+
+        Raises:
+            asyncio.TimeoutError: If not admitted within timeout_s seconds.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout_s
+        last_position = None
+        while not self.admitted.done():
+            position = self.position()
+            if position != last_position:
+                last_position = position
+                yield position
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                self.release()
+                raise asyncio.TimeoutError()
+            await asyncio.wait({self.admitted}, timeout=min(interval_s, remaining))
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.controller._release(self)
+
+
+class AdmissionController:
+    """
+    Bounded admission to the local LLM: at most `max_concurrency` streams run at once, at most
+    `max_queue` requests wait, and the others are rejected immediately (load shedding).
+    """
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, max_queue: int = LLM_MAX_QUEUE):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.active = 0
+        self.waiters = collections.deque()
+        self.admitted_total = 0
+        self.rejected_total = 0
+
+    def has_capacity(self) -> bool:
+        return self.active < self.max_concurrency or len(self.waiters) < self.max_queue
+
+    def shed(self) -> Overloaded:
+        """
+        Count a request rejected before taking a ticket and return the error to report.
+        """
+        self.rejected_total += 1
+        return Overloaded()
+
+    def enter(self) -> AdmissionTicket:
+        """
+        Take a ticket: admitted right away if a slot is free, queued otherwise.
+
+        Raises:
+            Overloaded: If the queue is full.
+        """
+        if not self.has_capacity():
+            raise self.shed()
+
+        ticket = AdmissionTicket(self)
+        if self.active < self.max_concurrency:
+            self.active += 1
+            self.admitted_total += 1
+            ticket.admitted.set_result(True)
+        else:
+            self.waiters.append(ticket)
+        return ticket
+
+    def _release(self, ticket: AdmissionTicket):
+        if not ticket.admitted.done():
+            # Left the queue before being admitted
+            self.waiters.remove(ticket)
+            ticket.admitted.cancel()
+            return
+
+        self.active -= 1
+        if self.waiters:
+            next_ticket = self.waiters.popleft()
+            self.active += 1
+            self.admitted_total += 1
+            next_ticket.admitted.set_result(True)
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queued": len(self.waiters),
+            "admitted_total": self.admitted_total,
+            "rejected_total": self.rejected_total,
+        }
+
+
+class Flight:
+    """
+    An in-flight computation whose events are recorded so that every subscriber, including
+    late ones, receives the whole sequence.
+    """
+
+    def __init__(self):
+        self.events = []
+        self.done = False
+        self.changed = asyncio.Condition()
+
+    async def publish(self, event: dict):
+        async with self.changed:
+            self.events.append(event)
+            self.changed.notify_all()
+
+    async def finish(self):
+        async with self.changed:
+            self.done = True
+            self.changed.notify_all()
+
+    async def subscribe(self):
+        """
+        Yield every event of the flight, from the first one, until it is done.
+        """
+        index = 0
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: len(self.events) > index or self.done)
+                events = self.events[index:]
+                finished = self.done
+            for event in events:
+                yield event
+            index += len(events)
+            if finished and index >= len(self.events):
+                return
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical requests: the first one starts the computation, the others
+    subscribe to its events instead of running it again.
+    """
+
+    def __init__(self):
+        self.flights = {}
+        self.tasks = set()
+        self.started_total = 0
+        self.joined_total = 0
+
+    def join(self, key: str, producer):
+        """
+        Return the flight of a key, starting `producer()` (an async iterator of events) if there is none.
+
+        Returns:
+            tuple: (flight, True if this call started it)
+        """
+        if key in self.flights:
+            self.joined_total += 1
+            return self.flights[key], False
+
+        flight = Flight()
+        self.flights[key] = flight
+        self.started_total += 1
+
+        async def run():
+            try:
+                async for event in producer():
+                    await flight.publish(event)
+            except Exception as e:
+                await flight.publish({"type": "error", "message": f"ERROR: An unexpected error occurred: {e}"})
+            finally:
+                self.flights.pop(key, None)
+                await flight.finish()
+
+        task = asyncio.create_task(run())
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return flight, True
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self.flights),
+            "started_total": self.started_total,
+            "joined_total": self.joined_total,
+        }
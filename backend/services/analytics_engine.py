@@ -0,0 +1,408 @@
+import argparse
+import asyncio
+import logging
+import os
+import threading
+import time
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# "cypher" (default): the analytics routes query Neo4j; "columnar": they are answered from an
+# in-memory copy of the tweet columns, reloaded when an ingestion bumps the data version
+ANALYTICS_ENGINE = os.getenv("ANALYTICS_ENGINE", "cypher")
+
+SENTIMENT_VALUES = {"positive": 1.0, "neutral": 0.0, "negative": -1.0}
+
+
+def _categorical(values: list):
+    """
+    Dictionary-encode a list of strings.
+
+    Returns:
+        tuple: (sorted list of the distinct non-null values, int32 array of codes, -1 for null).
+    """
+    categories = sorted({value for value in values if value is not None})
+    index = {value: code for code, value in enumerate(categories)}
+    codes = np.fromiter((index.get(value, -1) for value in values), dtype=np.int32, count=len(values))
+    return categories, codes
+
+
+def _nullable(values: list, dtype, null=0):
+    """
+    Convert a list of numbers with None into (array with `null` in place of None, validity mask).
+    """
+    valid = np.fromiter((value is not None for value in values), dtype=bool, count=len(values))
+    array = np.fromiter((null if value is None else value for value in values), dtype=dtype, count=len(values))
+    return array, valid
+
+
+class TweetColumns:
+    """
+    Immutable column arrays of the Tweet nodes, built once per data version.
+    """
+
+    def __init__(self, records: list, version: int = 0):
+        """
+        Args:
+            records (list): Rows returned by Neo4jConnector.A_get_analytics_columns.
+            version (int): The data version the rows were read at.
+        """
+        self.version = version
+        self.size = len(records)
+        self.authors, self.author = _categorical([r["author"] for r in records])
+        self.topics, self.topic = _categorical([r["topic"] for r in records])
+        self.year, _ = _nullable([r["year"] for r in records], np.int32, null=-1)
+        self.month, _ = _nullable([r["month"] for r in records], np.int32, null=-1)
+        self.likes, self.has_likes = _nullable([r["likes"] for r in records], np.int64)
+        self.retweets, self.has_retweets = _nullable([r["retweets"] for r in records], np.int64)
+        self.sentiment = np.array([SENTIMENT_VALUES.get(r["sentiment"], np.nan) for r in records], dtype=np.float64)
+        self.confidence, self.has_confidence = _nullable([r["sentiment_confidence"] for r in records], np.float64)
+        # Only read for the few rows returned by A3
+        self.text = np.array([r["text"] for r in records], dtype=object)
+        self.date = np.array([r["date"] for r in records], dtype=object)
+
+    def code(self, categories: list, value: str) -> int:
+        """
+        Return the code of a value in a categorical column, -2 (matches no row) if it is absent.
+        """
+        try:
+            return categories.index(value)
+        except ValueError:
+            return -2
+
+    def author_mask(self, author: str, allow_all: bool = True):
+        """
+        Boolean mask of the tweets of an author ("All" selects every tweet when allow_all is set,
+        like the Cypher queries that skip the author filter).
+        """
+        if allow_all and author == "All":
+            return np.ones(self.size, dtype=bool)
+        return self.author == self.code(self.authors, author)
+
+
+def _year_label(year: int):
+    return None if year < 0 else str(int(year))
+
+
+def _null_last(values):
+    # Cypher sorts nulls after every other value in ascending order
+    return (values < 0, values)
+
+
+class ColumnarAnalytics:
+    """
+    In-memory analytics engine answering the A1-A5 queries with vectorized NumPy group-bys over
+    the tweet columns, instead of scanning the Tweet nodes in Neo4j on every request.
+
+    Methods have the same names, arguments and results as the Neo4jConnector analytics methods
+    (check with `python -m services.analytics_engine --check-parity`).
+    """
+
+    def __init__(self):
+        self.columns = TweetColumns([])
+        self.loaded_at = None
+        self._refresh_lock = threading.Lock()
+
+    def load(self, connector) -> int:
+        """
+        Read the tweet columns from Neo4j and swap them in atomically.
+
+        Args:
+            connector: A sync Neo4jConnector.
+
+        Returns:
+            int: The number of tweets loaded.
+        """
+        with self._refresh_lock:
+            start = time.perf_counter()
+            # Read the version first: an ingestion finishing during the load triggers another refresh
+            version = connector.get_data_version()
+            columns = TweetColumns(connector.A_get_analytics_columns(), version)
+            self.columns = columns
+            self.loaded_at = time.time()
+            logger.info("Loaded %d tweets (data version %s) in %.2fs", columns.size, version, time.perf_counter() - start)
+            return columns.size
+
+    def refresh_if_stale(self, connector, version: int = None) -> bool:
+        """
+        Reload the columns if an ingestion bumped the data version since the last load.
+
+        Args:
+            connector: A sync Neo4jConnector.
+            version (int): The current data version, read from the connector if None.
+
+        Returns:
+            bool: True if the columns were reloaded.
+        """
+        if version is None:
+            version = connector.get_data_version()
+        if version == self.columns.version and self.loaded_at is not None:
+            return False
+        self.load(connector)
+        return True
+
+    def stats(self) -> dict:
+        columns = self.columns
+        return {
+            "tweets": columns.size,
+            "data_version": columns.version,
+            "loaded_at": self.loaded_at,
+        }
+
+    def A_get_topics_by_author(self, author: str):
+        """
+        Retrieve the distinct topics of an author ("All" for every author), sorted.
+        """
+        c = self.columns
+        codes = np.unique(c.topic[c.author_mask(author) & (c.topic >= 0)])
+        # Codes follow the sorted order of the categories
+        return [c.topics[code] for code in codes]
+
+    def A_get_years_by_author(self, author: str):
+        """
+        Retrieve the distinct years of an author's tweets as strings, sorted.
+        """
+        c = self.columns
+        years = np.unique(c.year[c.author_mask(author) & (c.year >= 0)])
+        # Same order as the Cypher query, which sorts the years as strings
+        return sorted(str(int(year)) for year in years)
+
+    def A1_get_likes_by_year_for_topic_and_author(self, topic: str, author: str):
+        """
+        Retrieve the total likes per year for an author and a topic.
+        """
+        c = self.columns
+        mask = c.author_mask(author, allow_all=False) & (c.topic == c.code(c.topics, topic))
+        years, inverse = np.unique(c.year[mask], return_inverse=True)
+        likes = np.bincount(inverse, weights=c.likes[mask], minlength=len(years))
+        rows = [{"year": _year_label(year), "likes": int(total)} for year, total in zip(years, likes)]
+        return sorted(rows, key=lambda row: (row["year"] is None, row["year"] or ""))
+
+    def A2_get_topic_trend_by_month_year(self, year: str, author: str):
+        """
+        Retrieve the number of tweets per month and topic for a year, ordered by month then count.
+        """
+        c = self.columns
+        mask = (c.year == int(year)) & (c.topic >= 0) & c.author_mask(author)
+        n_topics = max(len(c.topics), 1)
+        keys, counts = np.unique((c.month[mask] + 1).astype(np.int64) * n_topics + c.topic[mask], return_counts=True)
+        months, topics = keys // n_topics - 1, keys % n_topics
+        order = np.lexsort((topics, -counts, *_null_last(months)[::-1]))
+        return [
+            {"month": None if months[i] < 0 else f"{int(months[i]):02d}", "topic": c.topics[topics[i]], "count": int(counts[i])}
+            for i in order
+        ]
+
+    def A3_get_top_tweets(self, metric: str, limit: int, author: str):
+        """
+        Retrieve the top tweets by likes or retweets.
+        """
+        assert metric in ["likes", "retweets"]
+        c = self.columns
+        values, valid = (c.likes, c.has_likes) if metric == "likes" else (c.retweets, c.has_retweets)
+        rows = np.nonzero(valid & c.author_mask(author))[0]
+        if limit < len(rows):
+            # Partial selection of the top `limit` values before sorting them
+            rows = rows[np.argpartition(-values[rows], limit - 1)[:limit]] if limit > 0 else rows[:0]
+        rows = rows[np.argsort(-values[rows], kind="stable")]
+        return [
+            {
+                "content": c.text[i],
+                "likes": int(c.likes[i]) if c.has_likes[i] else None,
+                "retweets": int(c.retweets[i]) if c.has_retweets[i] else None,
+                "date": c.date[i],
+                "topic": c.topics[c.topic[i]] if c.topic[i] >= 0 else None,
+                "author": c.authors[c.author[i]] if c.author[i] >= 0 else None,
+            }
+            for i in rows
+        ]
+
+    def A4_get_average_sentiment_by_topic(self):
+        """
+        Compute the average sentiment per topic, weighted by the sentiment confidence.
+        """
+        c = self.columns
+        mask = ~np.isnan(c.sentiment) & (c.topic >= 0) & c.has_confidence
+        n_topics = len(c.topics)
+        weights = np.bincount(c.topic[mask], weights=c.confidence[mask], minlength=n_topics)
+        weighted = np.bincount(c.topic[mask], weights=c.sentiment[mask] * c.confidence[mask], minlength=n_topics)
+        present = np.bincount(c.topic[mask], minlength=n_topics) > 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            averages = weighted / weights
+        rows = [
+            {"topic": c.topics[code], "average_sentiment": float(averages[code])}
+            for code in np.nonzero(present)[0]
+        ]
+        return sorted(rows, key=lambda row: row["average_sentiment"], reverse=True)
+
+    def A5_get_average_sentiment_per_year(self, author: str):
+        """
+        Compute the average sentiment score per year for an author (positive/negative weighted
+        by the confidence, 0 for the other sentiments).
+        """
+        c = self.columns
+        mask = c.author_mask(author, allow_all=False)
+        sentiment = c.sentiment[mask]
+        polar = (sentiment == 1.0) | (sentiment == -1.0)
+        scores = np.where(polar, np.nan_to_num(sentiment) * c.confidence[mask], 0.0)
+        # A positive/negative tweet without confidence has a null score, ignored by avg()
+        scored = ~polar | c.has_confidence[mask]
+
+        years, inverse = np.unique(c.year[mask], return_inverse=True)
+        totals = np.bincount(inverse, weights=np.where(scored, scores, 0.0), minlength=len(years))
+        counts = np.bincount(inverse, weights=scored.astype(np.float64), minlength=len(years))
+        order = np.lexsort(_null_last(years)[::-1])
+        return [
+            {
+                "year": None if years[i] < 0 else int(years[i]),
+                "avg_sentiment": float(totals[i] / counts[i]) if counts[i] else None,
+            }
+            for i in order
+        ]
+
+
+class AsyncColumnarAnalytics:
+    """
+    Awaitable view of a ColumnarAnalytics with the interface of AsyncNeo4jConnector, so that the
+    async routes can use either engine. The in-memory queries are short enough to run on the loop.
+    """
+
+    def __init__(self, engine: ColumnarAnalytics):
+        self.engine = engine
+
+    def __getattr__(self, name):
+        method = getattr(self.engine, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+
+        return call
+
+    async def gather(self, *calls):
+        return await asyncio.gather(*calls)
+
+
+def _normalize(value):
+    """
+    Round the floats of a query result so that results of both engines can be compared.
+    """
+    if isinstance(value, float):
+        return round(value, 9)
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def _compare(name: str, expected, actual, ordered_by=None) -> bool:
+    """
+    Compare a Cypher result with a columnar one. When the Cypher order is only partial
+    (ties), rows are compared as multisets and only the `ordered_by` key sequence must match.
+    """
+    expected, actual = _normalize(expected), _normalize(actual)
+    if ordered_by is None:
+        same = expected == actual
+    else:
+        same = (sorted(map(repr, expected)) == sorted(map(repr, actual))
+                and [ordered_by(r) for r in expected] == [ordered_by(r) for r in actual])
+    if not same:
+        print(f"[ANALYTICS] MISMATCH {name}\n  cypher:   {expected}\n  columnar: {actual}")
+    return same
+
+
+def check_parity(connector, engine: ColumnarAnalytics, limit: int = 10) -> bool:
+    """
+    Run every analytics query with both engines on all authors, topics and years of the
+    database and report the differences.
+
+    Returns:
+        bool: True if all the results match.
+    """
+    c = engine.columns
+    authors = ["All"] + c.authors
+    checks = [
+        ("A4", connector.A4_get_average_sentiment_by_topic(), engine.A4_get_average_sentiment_by_topic(),
+         lambda r: r["average_sentiment"]),
+    ]
+    for author in authors:
+        checks += [
+            (f"topics({author})", connector.A_get_topics_by_author(author), engine.A_get_topics_by_author(author), None),
+            (f"years({author})", connector.A_get_years_by_author(author), engine.A_get_years_by_author(author), None),
+            (f"A5({author})", connector.A5_get_average_sentiment_per_year(author), engine.A5_get_average_sentiment_per_year(author), None),
+        ]
+        for metric in ["likes", "retweets"]:
+            expected = connector.A3_get_top_tweets(metric, limit, author)
+            actual = engine.A3_get_top_tweets(metric, limit, author)
+            # Rows tied with the last value may differ: compare the metric values and the rows above them
+            boundary = expected[-1][metric] if expected else None
+            checks += [
+                (f"A3({metric}, {author}) values", [r[metric] for r in expected], [r[metric] for r in actual], None),
+                (f"A3({metric}, {author}) rows", [r for r in expected if r[metric] != boundary],
+                 [r for r in actual if r[metric] != boundary], lambda r: r[metric]),
+            ]
+        for year in engine.A_get_years_by_author(author):
+            checks.append((f"A2({year}, {author})", connector.A2_get_topic_trend_by_month_year(year, author),
+                           engine.A2_get_topic_trend_by_month_year(year, author), lambda r: (r["month"], r["count"])))
+        for topic in c.topics:
+            checks.append((f"A1({topic}, {author})", connector.A1_get_likes_by_year_for_topic_and_author(topic, author),
+                           engine.A1_get_likes_by_year_for_topic_and_author(topic, author), None))
+
+    failures = sum(not _compare(name, expected, actual, ordered_by) for name, expected, actual, ordered_by in checks)
+    print(f"[ANALYTICS] {len(checks) - failures}/{len(checks)} results identical")
+    return failures == 0
+
+
+def benchmark(connector, engine: ColumnarAnalytics, repeat: int = 20):
+    """
+    Print the average latency of the analytics queries with both engines.
+    """
+    author = engine.columns.authors[0] if engine.columns.authors else "All"
+    topic = engine.columns.topics[0] if engine.columns.topics else ""
+    years = engine.A_get_years_by_author("All")
+    queries = [
+        ("A1", "A1_get_likes_by_year_for_topic_and_author", (topic, author)),
+        ("A2", "A2_get_topic_trend_by_month_year", (years[-1] if years else "2020", "All")),
+        ("A3", "A3_get_top_tweets", ("likes", 5, "All")),
+        ("A4", "A4_get_average_sentiment_by_topic", ()),
+        ("A5", "A5_get_average_sentiment_per_year", (author,)),
+    ]
+    print(f"{'query':<8}{'cypher ms':>12}{'columnar ms':>14}")
+    for name, method, args in queries:
+        timings = []
+        for target in (connector, engine):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                getattr(target, method)(*args)
+            timings.append((time.perf_counter() - start) * 1000 / repeat)
+        print(f"{name:<8}{timings[0]:>12.2f}{timings[1]:>14.3f}")
+
+
+if __name__ == "__main__":
+    # Compare both engines on the whole database: `python -m services.analytics_engine --check-parity`
+    # Compare their latency:                      `python -m services.analytics_engine --benchmark`
+    parser = argparse.ArgumentParser(description="In-memory columnar analytics engine.")
+    parser.add_argument("--check-parity", action="store_true", help="Compare every query with the Cypher results")
+    parser.add_argument("--benchmark", action="store_true", help="Compare the query latency of both engines")
+    args = parser.parse_args()
+
+    from neo4j_connector import Neo4jConnector
+    from services.metrics import setup_logging
+
+    setup_logging()
+    connector = Neo4jConnector()
+    try:
+        engine = ColumnarAnalytics()
+        engine.load(connector)
+        ok = True
+        if args.check_parity:
+            ok = check_parity(connector, engine)
+        if args.benchmark:
+            benchmark(connector, engine)
+    finally:
+        connector.close()
+    raise SystemExit(0 if ok else 1)
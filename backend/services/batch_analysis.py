@@ -0,0 +1,327 @@
+import asyncio
+import csv
+import io
+import json
+import os
+import time
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+
+from services.metrics import metrics
+from services.retrieval import RETRIEVAL_BACKEND
+from services.topic_extraction import classify_topics, query_entities
+from services.tweet_analysis_generation import stream_llm_response, build_attribution_prompt, attribution_result, attribution_error, LLMError
+
+load_dotenv()
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "50000"))
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "256"))  # Tweets classified, embedded and searched together
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "2"))
+BATCH_ORDERS = ["input", "completion"]
+CONTEXT_SIZE = 10
+
+
+class BatchTooLarge(Exception):
+    """
+    Raised when a batch has more than BATCH_MAX_ITEMS tweets.
+    """
+
+    def __init__(self, max_items: int = BATCH_MAX_ITEMS):
+        super().__init__(f"A batch can contain at most {max_items} tweets.")
+
+
+def _tweet_from_record(record) -> str:
+    """
+    Extract the tweet text from a decoded NDJSON record: a JSON string or an object with a
+    "tweet" (or "text"/"Text") field.
+    """
+    if isinstance(record, str):
+        return record
+    if isinstance(record, dict):
+        for field in ("tweet", "text", "Text"):
+            if isinstance(record.get(field), str):
+                return record[field]
+    raise ValueError("expected a string or an object with a 'tweet' field")
+
+
+def parse_upload(filename: str, content: bytes) -> list:
+    """
+    Read the tweets of an uploaded file: a CSV with a Text (or tweet) column, an NDJSON file
+    (.ndjson, .jsonl) or a text file with one tweet per line.
+
+    Returns:
+        list: The tweet texts, in file order.
+    """
+    text = content.decode("utf-8-sig")
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        reader = csv.DictReader(io.StringIO(text))
+        column = next((c for c in ("Text", "text", "tweet") if c in (reader.fieldnames or [])), None)
+        if column is None:
+            raise ValueError("the CSV needs a 'Text' or 'tweet' column")
+        return [row[column] for row in reader]
+    if name.endswith((".ndjson", ".jsonl")):
+        return [_tweet_from_record(json.loads(line)) for line in text.splitlines() if line.strip()]
+    return [line for line in text.splitlines() if line.strip()]
+
+
+async def iterate_list(tweets: list, max_items: int = BATCH_MAX_ITEMS):
+    """
+    Async iterator over a list of tweets, for analyze_batch.
+    """
+    if len(tweets) > max_items:
+        raise BatchTooLarge(max_items)
+    for tweet in tweets:
+        yield tweet
+
+
+async def iterate_ndjson(chunks, max_items: int = BATCH_MAX_ITEMS):
+    """
+    Decode a streamed NDJSON body (async iterator of bytes) into tweets as lines arrive, so that
+    the first tweets are analyzed while the client is still sending the others.
+    """
+    buffer = b""
+    count = 0
+
+    def decode(line: bytes):
+        nonlocal count
+        count += 1
+        if count > max_items:
+            raise BatchTooLarge(max_items)
+        try:
+            return _tweet_from_record(json.loads(line))
+        except ValueError:
+            # Reported as an invalid item, the other lines are still analyzed
+            return None
+
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield decode(line)
+    if buffer.strip():
+        yield decode(buffer)
+
+
+def _item_error(index: int, tweet: str, message: str, topic: str = None, confidence: float = 0.0, timings: dict = None) -> dict:
+    return {"type": "result", "index": index, "tweet": tweet, **attribution_error(message, topic, confidence), "timings": timings or {}}
+
+
+async def prepare_chunks(tweets, index_store, chunk_size: int, out: asyncio.Queue, results: asyncio.Queue,
+                         cached_result=None):
+    """
+    First pipeline stage: read the tweets in chunks, classify and embed each chunk in one batch,
+    then search each topic index once with the matrix of the chunk's tweets of that topic.
+    Prepared items are put on `out` for the LLM workers; cached, invalid or context-less tweets
+    go straight to `results`.
+
+    Returns:
+        int: The number of tweets read.
+    """
+    index = 0
+    chunk = []
+
+    async def flush(chunk):
+        texts = [tweet for _, tweet in chunk]
+        start = time.perf_counter()
+        topics = await run_in_threadpool(classify_topics, texts, min(len(texts), 64))
+        classified = time.perf_counter()
+        embeddings = await run_in_threadpool(index_store.embed, texts)
+        embedded = time.perf_counter()
+        # Entities of the queries for the hybrid retrieval (cached by the topic classification)
+        entities = await run_in_threadpool(query_entities, texts) if RETRIEVAL_BACKEND == "hybrid" else None
+
+        by_topic = {}
+        for position, (topic, _) in enumerate(topics):
+            by_topic.setdefault(topic, []).append(position)
+        contexts = [None] * len(chunk)
+        for topic, positions in by_topic.items():
+            found = await run_in_threadpool(
+                index_store.search_batch, topic, embeddings[positions], CONTEXT_SIZE,
+                [entities[p] for p in positions] if entities else None,
+            )
+            for position, context in zip(positions, found):
+                contexts[position] = context
+        searched = time.perf_counter()
+        metrics.observe("stage_seconds", classified - start, stage="batch_topic")
+        metrics.observe("stage_seconds", embedded - classified, stage="batch_embedding")
+        metrics.observe("stage_seconds", searched - embedded, stage="batch_retrieval")
+
+        # Stage timings are amortized over the tweets of the chunk
+        timings = {
+            "classify_ms": round((classified - start) * 1000 / len(chunk), 3),
+            "embed_ms": round((embedded - classified) * 1000 / len(chunk), 3),
+            "search_ms": round((searched - embedded) * 1000 / len(chunk), 3),
+        }
+        for (item_index, tweet), (topic, confidence), context in zip(chunk, topics, contexts):
+            if not context:
+                await results.put(_item_error(item_index, tweet, "No tweets found for this topic.", topic, confidence, dict(timings)))
+                continue
+            await out.put({"index": item_index, "tweet": tweet, "topic": topic, "confidence": confidence,
+                           "context": context, "timings": dict(timings)})
+
+    error = None
+    try:
+        async for tweet in tweets:
+            if not isinstance(tweet, str) or not tweet.strip():
+                await results.put(_item_error(index, tweet, "Invalid or empty tweet."))
+            else:
+                cached = cached_result(tweet) if cached_result else None
+                if cached is not None:
+                    await results.put({"type": "result", "index": index, "tweet": tweet, **cached, "cached": True, "timings": {}})
+                else:
+                    chunk.append((index, tweet))
+            index += 1
+            if len(chunk) >= chunk_size:
+                await flush(chunk)
+                chunk = []
+    except BatchTooLarge as e:
+        # The tweets read before the limit are still analyzed
+        error = e
+    if chunk:
+        await flush(chunk)
+    if error:
+        raise error
+    return index
+
+
+async def llm_worker(items: asyncio.Queue, results: asyncio.Queue, admission, store_result=None):
+    """
+    Second pipeline stage: attribute prepared tweets with the LLM, one at a time. Each call takes
+    a ticket of the shared admission controller, so batches never overflow the queue of the
+    interactive /analyze requests: a worker waits for free capacity instead.
+    """
+    while True:
+        item = await items.get()
+        if item is None:
+            return
+
+        timings = item["timings"]
+        queued_at = time.perf_counter()
+        while not admission.has_capacity():
+            await asyncio.sleep(0.5)
+        ticket = admission.enter()
+        try:
+            async for _ in ticket.wait(timeout_s=float("inf")):
+                pass
+            started = time.perf_counter()
+            timings["queue_ms"] = round((started - queued_at) * 1000, 3)
+
+            explanation = ""
+            error = None
+            try:
+                async for text_chunk in stream_llm_response(build_attribution_prompt(item["tweet"], item["context"])):
+                    if not explanation:
+                        timings["ttft_ms"] = round((time.perf_counter() - started) * 1000, 3)
+                    explanation += text_chunk
+            except LLMError as e:
+                error = str(e)
+            timings["llm_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        finally:
+            ticket.release()
+
+        if error:
+            result = attribution_error(error, item["topic"], item["confidence"])
+        else:
+            result = attribution_result(explanation, item["topic"], item["confidence"])
+            if store_result:
+                store_result(item["tweet"], result)
+        await results.put({"type": "result", "index": item["index"], "tweet": item["tweet"], **result, "timings": timings})
+
+
+async def analyze_batch(tweets, index_store, admission, order: str = "input", llm_concurrency: int = BATCH_LLM_CONCURRENCY,
+                        chunk_size: int = BATCH_CHUNK_SIZE, cached_result=None, store_result=None):
+    """
+    Attribute a batch of tweets and yield one result per tweet, then a summary.
+
+    Tweets are classified, embedded and searched by chunks while the LLM workers process the
+    previous ones, with at most `llm_concurrency` LLM calls of this batch running at once.
+
+    Args:
+        tweets: Async iterator of tweet texts (see iterate_list, iterate_ndjson).
+        index_store: The retriever of the context tweets (TopicIndexStore or Neo4jVectorRetriever).
+        admission: The AdmissionController of the LLM.
+        order (str): "input" to yield results in input order, "completion" as soon as they are ready.
+        llm_concurrency (int): Number of concurrent LLM calls for this batch.
+        chunk_size (int): Number of tweets classified/embedded/searched together.
+        cached_result: Optional function returning the cached result of a tweet, or None.
+        store_result: Optional function storing the result of a tweet.
+
+    Yields:
+        dict: {"type": "result", "index", "tweet", ...attribution, "timings"} for each tweet, in
+            the requested order, then {"type": "summary", "items", "errors", "cached", "elapsed_ms", "tweets_per_s"}
+            (or {"type": "error", "error"} if the input could not be read).
+    """
+    start = time.perf_counter()
+    items = asyncio.Queue(maxsize=max(chunk_size, 2 * llm_concurrency))
+    results = asyncio.Queue()
+
+    async def run():
+        workers = [asyncio.create_task(llm_worker(items, results, admission, store_result)) for _ in range(llm_concurrency)]
+        try:
+            error = None
+            try:
+                total = await prepare_chunks(tweets, index_store, chunk_size, items, results, cached_result)
+            except BatchTooLarge as e:
+                error = e
+            for _ in workers:
+                await items.put(None)
+            await asyncio.gather(*workers)
+            if error:
+                raise error
+            return total
+        finally:
+            # No-op once they are done; stops the LLM calls if the batch failed or was abandoned
+            for worker in workers:
+                worker.cancel()
+
+    producer = asyncio.create_task(run())
+    next_result = None
+    pending = {}
+    next_index = 0
+    errors = cached = 0
+    try:
+        while True:
+            next_result = asyncio.create_task(results.get())
+            await asyncio.wait({next_result, producer}, return_when=asyncio.FIRST_COMPLETED)
+            if not next_result.done():
+                # The producer is done: every result was already queued
+                next_result.cancel()
+                if results.empty():
+                    break
+                continue
+
+            result = next_result.result()
+            errors += result["predicted_author"] == "ERROR"
+            cached += bool(result.get("cached"))
+            if order == "completion":
+                yield result
+                continue
+            pending[result["index"]] = result
+            while next_index in pending:
+                yield pending.pop(next_index)
+                next_index += 1
+
+        try:
+            total = producer.result()
+        except Exception as e:
+            # Results of the tweets read before the error were sent above
+            yield {"type": "error", "error": str(e)}
+            return
+
+        elapsed = time.perf_counter() - start
+        yield {
+            "type": "summary",
+            "items": total,
+            "errors": errors,
+            "cached": cached,
+            "elapsed_ms": round(elapsed * 1000, 3),
+            "tweets_per_s": round(total / elapsed, 3) if elapsed > 0 else None,
+        }
+    finally:
+        if next_result is not None:
+            next_result.cancel()
+        if not producer.done():
+            # Client disconnected: stop reading and cancel the running LLM calls
+            producer.cancel()
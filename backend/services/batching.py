@@ -0,0 +1,126 @@
+import asyncio
+import collections
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services.metrics import metrics, SIZE_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Dynamic batching for model inference: concurrent callers submit single items, which are
+    queued for at most `max_wait_ms` and processed together (up to `max_batch_size` items) by a
+    batch function running in a dedicated worker thread. Each caller receives its own result.
+    """
+
+    def __init__(self, process_batch, max_batch_size: int = 16, max_wait_ms: float = 10, name: str = "batcher"):
+        """
+        Args:
+            process_batch: Function taking a list of items and returning the list of their results, in order.
+            max_batch_size (int): Maximum number of items processed together.
+            max_wait_ms (float): Maximum time the first queued item waits for others to join its batch.
+            name (str): Name used in logs and metrics.
+        """
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+
+        self._queue = None
+        self._worker = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+
+        # Metrics
+        self.started_at = time.perf_counter()
+        self.batches = 0
+        self.items = 0
+        self.errors = 0
+        self.batch_sizes = collections.deque(maxlen=1000)
+        self.latencies = collections.deque(maxlen=1000)
+
+    async def submit(self, item):
+        """
+        Queue an item and wait for its result.
+        """
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self):
+        """
+        Wait for a first item, then gather more until the batch is full or the wait time is over.
+        """
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            batch = [entry for entry in batch if not entry[1].cancelled()]
+            if not batch:
+                continue
+
+            try:
+                results = await loop.run_in_executor(self._executor, self.process_batch, [item for item, _, _ in batch])
+            except Exception as e:
+                self.errors += 1
+                metrics.inc("batch_errors", batcher=self.name)
+                logger.error("%s: batch of %d failed: %s", self.name, len(batch), e)
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            now = time.perf_counter()
+            metrics.observe("batch_size", len(batch), SIZE_BUCKETS, batcher=self.name)
+            for (_, future, queued_at), result in zip(batch, results):
+                self.latencies.append(now - queued_at)
+                metrics.observe("batch_item_seconds", now - queued_at, batcher=self.name)
+                if not future.done():
+                    future.set_result(result)
+
+            self.batches += 1
+            self.items += len(batch)
+            self.batch_sizes.append(len(batch))
+
+    def stats(self) -> dict:
+        """
+        Return throughput, batch size and latency metrics.
+        """
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            return 1000 * latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else 0.0
+
+        return {
+            "name": self.name,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "items": self.items,
+            "errors": self.errors,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "avg_batch_size": sum(self.batch_sizes) / len(self.batch_sizes) if self.batch_sizes else 0.0,
+            "throughput_per_sec": self.items / (time.perf_counter() - self.started_at),
+            "latency_p50_ms": percentile(0.50),
+            "latency_p95_ms": percentile(0.95),
+            "latency_p99_ms": percentile(0.99),
+        }
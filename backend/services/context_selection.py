@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import os
+import random
+import time
+import numpy as np
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+
+from services.tweet_analysis_generation import get_encoder
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Selection of the example tweets of /generate_tweet:
+#   "database"   random sample drawn by Neo4j, only the sampled texts are returned
+#   "reservoir"  random sample drawn from an in-memory reservoir of each (author, topic)
+#   "mmr"        diverse sample: maximal marginal relevance over the embeddings of the reservoir
+CONTEXT_SELECTION_MODE = os.getenv("CONTEXT_SELECTION_MODE", "reservoir")
+CONTEXT_SELECTION_MODES = ["database", "reservoir", "mmr"]
+CONTEXT_SAMPLE_SIZE = int(os.getenv("CONTEXT_SAMPLE_SIZE", "20"))
+# Tweets kept per (author, topic), reloaded when the data version changes
+CONTEXT_RESERVOIR_SIZE = int(os.getenv("CONTEXT_RESERVOIR_SIZE", "1000"))
+# MMR: random candidates drawn from the reservoir per request, and relevance/diversity trade-off (1 = relevance only)
+CONTEXT_MMR_CANDIDATES = int(os.getenv("CONTEXT_MMR_CANDIDATES", "200"))
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.5"))
+
+
+def mmr_select(embeddings: np.ndarray, n: int, lambda_: float = CONTEXT_MMR_LAMBDA) -> list:
+    """
+    Select n rows by maximal marginal relevance: each step takes the tweet most similar to the
+    centroid of the candidates (typical of the author on the topic) penalized by its similarity
+    to the tweets already selected.
+
+    Args:
+        embeddings (np.ndarray): Candidate embeddings, shape (n_candidates, dimension).
+        n (int): Number of rows to select.
+        lambda_ (float): Weight of the relevance against the diversity.
+
+    Returns:
+        list: Positions of the selected rows, in selection order.
+    """
+    vectors = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    centroid = vectors.mean(axis=0)
+    relevance = vectors @ (centroid / max(np.linalg.norm(centroid), 1e-12))
+    redundancy = np.zeros(len(vectors), dtype="float32")
+    available = np.ones(len(vectors), dtype=bool)
+    selected = []
+    for _ in range(min(n, len(vectors))):
+        scores = np.where(available, lambda_ * relevance - (1 - lambda_) * redundancy, -np.inf)
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, vectors @ vectors[best])
+    return selected
+
+
+class Reservoir:
+    """
+    Uniform sample of the tweet texts of an (author, topic), with their embeddings computed on
+    the first MMR selection.
+    """
+
+    def __init__(self, texts: list):
+        self.texts = texts
+        self.embeddings = None
+
+
+class ContextSelector:
+    """
+    Selects the example tweets of /generate_tweet without loading every tweet of the author:
+    the sample is drawn by Neo4j, or from a bounded per-(author, topic) reservoir, so the memory
+    and time per request don't depend on how many tweets the author has.
+    """
+
+    def __init__(self, connector, mode: str = CONTEXT_SELECTION_MODE, sample_size: int = CONTEXT_SAMPLE_SIZE,
+                 reservoir_size: int = CONTEXT_RESERVOIR_SIZE, mmr_candidates: int = CONTEXT_MMR_CANDIDATES,
+                 mmr_lambda: float = CONTEXT_MMR_LAMBDA, encoder=None):
+        """
+        Args:
+            connector: The AsyncNeo4jConnector.
+            mode (str): "database", "reservoir" or "mmr".
+            sample_size (int): Number of example tweets per request.
+            reservoir_size (int): Tweets kept in memory per (author, topic).
+            mmr_candidates (int): Reservoir tweets considered by MMR per request.
+            mmr_lambda (float): MMR relevance/diversity trade-off.
+            encoder: The sentence encoder for MMR (the shared one if None).
+        """
+        if mode not in CONTEXT_SELECTION_MODES:
+            raise ValueError(f"Unknown context selection mode '{mode}', expected one of {CONTEXT_SELECTION_MODES}")
+        self.connector = connector
+        self.mode = mode
+        self.sample_size = sample_size
+        self.reservoir_size = reservoir_size
+        self.mmr_candidates = mmr_candidates
+        self.mmr_lambda = mmr_lambda
+        self._encoder = encoder
+        self.version = None
+        self.reservoirs = {}  # (author, topic) -> task loading the Reservoir
+        self.selections = 0
+        self.reservoir_loads = 0
+        self.selection_ms = 0.0
+
+    @property
+    def encoder(self):
+        return self._encoder if self._encoder is not None else get_encoder()
+
+    def set_version(self, version):
+        """
+        Record the current data version, dropping the reservoirs if it changed.
+        """
+        if version != self.version:
+            self.version = version
+            self.reservoirs.clear()
+
+    async def reservoir(self, author: str, topic: str) -> Reservoir:
+        """
+        Return the reservoir of an (author, topic), loading it on first use. Concurrent requests
+        share the same load.
+        """
+        key = (author, topic)
+        task = self.reservoirs.get(key)
+        if task is None:
+            task = self.reservoirs[key] = asyncio.ensure_future(self._load(author, topic))
+        try:
+            return await asyncio.shield(task)
+        except Exception:
+            if self.reservoirs.get(key) is task:
+                del self.reservoirs[key]
+            raise
+
+    async def _load(self, author: str, topic: str) -> Reservoir:
+        texts = await self.connector.LLM_sample_tweets_by_author_topic(author, topic, self.reservoir_size)
+        self.reservoir_loads += 1
+        logger.info("Loaded a reservoir of %d tweets for %s / %s", len(texts), author, topic)
+        return Reservoir(texts)
+
+    async def select(self, author: str, topic: str, n: int = None) -> list:
+        """
+        Select example tweets of an author on a topic.
+
+        Args:
+            author (str): The author.
+            topic (str): The topic.
+            n (int): Number of tweets (sample_size if None).
+
+        Returns:
+            list: Up to n tweet texts (empty if the author has no tweet on the topic).
+        """
+        n = n or self.sample_size
+        start = time.perf_counter()
+        if self.mode == "database":
+            texts = await self.connector.LLM_sample_tweets_by_author_topic(author, topic, n)
+        else:
+            reservoir = await self.reservoir(author, topic)
+            if self.mode == "reservoir" or len(reservoir.texts) <= n:
+                texts = random.sample(reservoir.texts, min(n, len(reservoir.texts)))
+            else:
+                texts = await run_in_threadpool(self._mmr, reservoir, n)
+        self.selections += 1
+        self.selection_ms += (time.perf_counter() - start) * 1000
+        return texts
+
+    def _mmr(self, reservoir: Reservoir, n: int) -> list:
+        if reservoir.embeddings is None:
+            reservoir.embeddings = np.asarray(self.encoder.encode(reservoir.texts, convert_to_numpy=True), dtype="float32")
+        # A random subset of candidates keeps the cost bounded and varies the examples between requests
+        candidates = random.sample(range(len(reservoir.texts)), min(self.mmr_candidates, len(reservoir.texts)))
+        selected = mmr_select(reservoir.embeddings[candidates], n, self.mmr_lambda)
+        return [reservoir.texts[candidates[i]] for i in selected]
+
+    def stats(self) -> dict:
+        loaded = [task.result() for task in self.reservoirs.values() if task.done() and not task.cancelled() and task.exception() is None]
+        return {
+            "mode": self.mode,
+            "sample_size": self.sample_size,
+            "data_version": self.version,
+            "reservoirs": len(loaded),
+            "reservoir_tweets": sum(len(r.texts) for r in loaded),
+            "reservoir_loads": self.reservoir_loads,
+            "selections": self.selections,
+            "mean_selection_ms": round(self.selection_ms / self.selections, 3) if self.selections else None,
+        }
@@ -0,0 +1,35 @@
+from services.topic_extraction import text_features, build_topic_input, get_topic_classifier
+from services.sentiment import classify_sentiments
+
+
+def enrich_rows(rows: list, batch_size: int = 32):
+    """
+    Run the offline enrichment (entities, topic and sentiment) on parsed tweet rows, in place.
+
+    Rows that already carry entities keep them; the topic and sentiment columns are always
+    (re)computed. The output matches the columns of `utils/dataset.csv`.
+
+    Args:
+        rows (list): Parsed rows (see dataset.parse_row) with at least "text".
+        batch_size (int): Batch size for spaCy and the transformer models.
+    """
+    if not rows:
+        return
+
+    texts = [row["text"] for row in rows]
+    missing = [i for i, row in enumerate(rows) if not row.get("entities")]
+    for i, features in zip(missing, text_features([texts[i] for i in missing], batch_size)):
+        rows[i]["entities"] = [{"name": name, "type": label} for name, label in features.entities]
+
+    entities = [[(e["name"], e["type"]) for e in row["entities"]] for row in rows]
+
+    topic_inputs = [build_topic_input(text, ents) for text, ents in zip(texts, entities)]
+    topics = get_topic_classifier().classify(topic_inputs, batch_size)
+
+    sentiments = classify_sentiments(texts, entities, batch_size)
+
+    for row, (topic, confidence), (sentiment, sentiment_confidence) in zip(rows, topics, sentiments):
+        row["topic"] = topic
+        row["confidence"] = confidence
+        row["sentiment"] = sentiment
+        row["sentiment_confidence"] = sentiment_confidence
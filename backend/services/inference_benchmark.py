@@ -0,0 +1,113 @@
+import argparse
+import json
+import time
+import pandas as pd
+
+from services.topic_evaluation import DATASET_PATH
+from services.topic_extraction import load_nlp, filter_entities, build_topic_input, get_topic_classifier, SPACY_MODEL
+from services.sentiment import classify_sentiments
+from services.tweet_analysis_generation import get_encoder
+
+
+def measure(fn, n_texts: int) -> dict:
+    """
+    Run a stage and return its CPU time (all threads of the process) and wall time per text.
+    """
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    result = fn()
+    cpu, wall = time.process_time() - cpu_start, time.perf_counter() - wall_start
+    return {"cpu_ms": 1000 * cpu / n_texts, "wall_ms": 1000 * wall / n_texts, "result": result}
+
+
+def spacy_entities(nlp, texts: list, batch_size: int) -> list:
+    return [filter_entities([(ent.text, ent.label_) for ent in doc.ents]) for doc in nlp.pipe(texts, batch_size=batch_size)]
+
+
+def run_benchmark(texts: list, batch_size: int = 32, light_model: str = None) -> dict:
+    """
+    Measure the per-tweet inference cost of the enrichment stages, before and after trimming
+    the spaCy pipeline to NER and sharing its output between the topic and sentiment stages.
+
+    Before: the full spaCy pipeline runs once for the topic input and once more for the
+    sentiment input (the online classify_topic path and the notebook extracted entities per
+    consumer). After: the trimmed pipeline runs once and its entities feed both models.
+
+    Returns:
+        dict: Per-stage CPU/wall ms per tweet, the before/after totals and the entity agreement
+            of the trimmed (and light) pipelines with the full one.
+    """
+    n = len(texts)
+    full_nlp = load_nlp(SPACY_MODEL, exclude=[])
+    trimmed_nlp = load_nlp()
+    print(f"[BENCHMARK] {SPACY_MODEL} full pipeline: {full_nlp.pipe_names}, trimmed: {trimmed_nlp.pipe_names}")
+
+    # Warm up every model so that load time is not measured
+    classifier, encoder = get_topic_classifier(), get_encoder()
+    spacy_entities(full_nlp, texts[:2], batch_size)
+    spacy_entities(trimmed_nlp, texts[:2], batch_size)
+    classifier.classify([build_topic_input(t, []) for t in texts[:2]], batch_size)
+    classify_sentiments(texts[:2], [[], []], batch_size)
+    encoder.encode(texts[:2])
+
+    stages = {
+        "spacy_full": measure(lambda: spacy_entities(full_nlp, texts, batch_size), n),
+        "spacy_trimmed": measure(lambda: spacy_entities(trimmed_nlp, texts, batch_size), n),
+    }
+    if light_model:
+        light_nlp = load_nlp(light_model)
+        spacy_entities(light_nlp, texts[:2], batch_size)
+        stages["spacy_light"] = measure(lambda: spacy_entities(light_nlp, texts, batch_size), n)
+
+    entities = stages["spacy_trimmed"]["result"]
+    inputs = [build_topic_input(text, ents) for text, ents in zip(texts, entities)]
+    stages["topic"] = measure(lambda: classifier.classify(inputs, batch_size), n)
+    stages["sentiment"] = measure(lambda: classify_sentiments(texts, entities, batch_size), n)
+    stages["embedding"] = measure(lambda: encoder.encode(texts, batch_size=batch_size), n)
+
+    reference = stages["spacy_full"]["result"]
+    agreement = {
+        name: sum(a == b for a, b in zip(reference, stages[name]["result"])) / n
+        for name in ("spacy_trimmed", "spacy_light") if name in stages
+    }
+
+    models = ("topic", "sentiment", "embedding")
+    totals = {
+        "before": stages["spacy_full"]["cpu_ms"] + sum(stages[s]["cpu_ms"] for s in models),
+        "after": stages["spacy_trimmed"]["cpu_ms"] + sum(stages[s]["cpu_ms"] for s in models),
+    }
+    if "spacy_light" in stages:
+        totals["after_light"] = stages["spacy_light"]["cpu_ms"] + sum(stages[s]["cpu_ms"] for s in models)
+
+    return {
+        "tweets": n,
+        "stages": {name: {k: v for k, v in stage.items() if k != "result"} for name, stage in stages.items()},
+        "cpu_ms_per_tweet": totals,
+        "entity_agreement_with_full": agreement,
+    }
+
+
+if __name__ == "__main__":
+    # Example: `python -m services.inference_benchmark --limit 300 --light-model en_core_web_sm`
+    parser = argparse.ArgumentParser(description="Per-tweet CPU time of the enrichment stages, before/after trimming the spaCy pipeline.")
+    parser.add_argument("--dataset", default=DATASET_PATH, help="Dataset CSV with a Text column")
+    parser.add_argument("--limit", type=int, default=300, help="Number of tweets sampled from the dataset")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--light-model", help="Also measure a lighter spaCy model (e.g. en_core_web_sm)")
+    parser.add_argument("--json", help="Optional path where the report is written as JSON")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.dataset, dtype=str, keep_default_na=False)
+    texts = df.sample(n=min(args.limit, len(df)), random_state=0)["Text"].tolist()
+    report = run_benchmark(texts, args.batch_size, args.light_model)
+
+    print(f"{'stage':<16}{'cpu ms/tweet':>14}{'wall ms/tweet':>15}")
+    for name, stage in report["stages"].items():
+        print(f"{name:<16}{stage['cpu_ms']:>14.2f}{stage['wall_ms']:>15.2f}")
+    for name, total in report["cpu_ms_per_tweet"].items():
+        print(f"total {name:<10}{total:>14.2f}")
+    for name, agreement in report["entity_agreement_with_full"].items():
+        print(f"{name} entities identical to the full pipeline: {agreement:.2%}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,203 @@
+import logging
+import os
+import queue
+import threading
+import time
+from multiprocessing.connection import Client
+from dotenv import load_dotenv
+
+from services.metrics import metrics
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# "local" (default): every backend process loads spaCy, the topic classifier and the sentence
+# encoder. "remote": the models run once in the inference worker (`python -m services.inference_worker`)
+# and the API workers (`uvicorn main:app --workers N`) call it over a local socket.
+INFERENCE_MODE = os.getenv("INFERENCE_MODE", "local")
+# "host:port" or the path of a Unix socket
+INFERENCE_WORKER_ADDRESS = os.getenv("INFERENCE_WORKER_ADDRESS", "127.0.0.1:7100")
+# Shared secret of the connections, required in remote mode: the messages are pickled, so a process
+# able to connect to the worker could make it run arbitrary code
+INFERENCE_WORKER_AUTHKEY = os.getenv("INFERENCE_WORKER_AUTHKEY", "").encode("utf-8")
+INFERENCE_CLIENT_CONNECTIONS = int(os.getenv("INFERENCE_CLIENT_CONNECTIONS", "4"))  # Concurrent calls per API worker
+INFERENCE_CONNECT_TIMEOUT_S = float(os.getenv("INFERENCE_CONNECT_TIMEOUT_S", "120"))  # Waiting for the worker to start
+INFERENCE_TIMEOUT_S = float(os.getenv("INFERENCE_TIMEOUT_S", "300"))  # Including a model load on first use
+
+
+def remote_inference() -> bool:
+    """
+    Return True when the models run in the inference worker (INFERENCE_MODE=remote).
+    """
+    return INFERENCE_MODE == "remote"
+
+
+def require_authkey(authkey: bytes = INFERENCE_WORKER_AUTHKEY) -> bytes:
+    """
+    Return the shared secret of the inference worker connections.
+
+    Raises:
+        RuntimeError: If INFERENCE_WORKER_AUTHKEY is not set.
+    """
+    if not authkey:
+        raise RuntimeError(
+            "INFERENCE_WORKER_AUTHKEY must be set to the same secret for the inference worker and the API workers, "
+            "e.g. the output of `python -c \"import secrets; print(secrets.token_hex(32))\"`"
+        )
+    return authkey
+
+
+def parse_address(address: str = INFERENCE_WORKER_ADDRESS):
+    """
+    Convert "host:port" into a (host, port) tuple; any other value is a Unix socket path.
+    """
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit():
+        return host, int(port)
+    return address
+
+
+class InferenceError(RuntimeError):
+    """
+    An operation failed in the inference worker.
+    """
+
+
+class InferenceClient:
+    """
+    Thread-safe client of the inference worker. Calls block (they run in the threadpool or in the
+    micro-batcher thread, like the local models) and reuse a small pool of connections.
+    """
+
+    def __init__(self, address: str = INFERENCE_WORKER_ADDRESS, authkey: bytes = INFERENCE_WORKER_AUTHKEY,
+                 connections: int = INFERENCE_CLIENT_CONNECTIONS, connect_timeout_s: float = INFERENCE_CONNECT_TIMEOUT_S,
+                 timeout_s: float = INFERENCE_TIMEOUT_S):
+        """
+        Args:
+            address (str): Address of the worker ("host:port" or a Unix socket path).
+            authkey (bytes): Shared secret of the connections.
+            connections (int): Maximum number of concurrent calls (one connection each).
+            connect_timeout_s (float): How long a new connection waits for the worker to accept.
+            timeout_s (float): Maximum duration of a call.
+        """
+        self.address = parse_address(address)
+        self.authkey = require_authkey(authkey)
+        self.connect_timeout_s = connect_timeout_s
+        self.timeout_s = timeout_s
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(connections)
+
+        # Metrics
+        self.calls = 0
+        self.errors = 0
+        self.reconnects = 0
+
+    def _connect(self):
+        deadline = time.monotonic() + self.connect_timeout_s
+        while True:
+            try:
+                return Client(self.address, authkey=self.authkey)
+            except (ConnectionRefusedError, FileNotFoundError) as e:
+                if time.monotonic() >= deadline:
+                    raise ConnectionError(f"Inference worker unreachable at {self.address}: {e}") from e
+                time.sleep(0.5)
+
+    def _request(self, connection, operation: str, args: tuple):
+        connection.send((operation, args))
+        if not connection.poll(self.timeout_s):
+            raise TimeoutError(f"Inference worker did not answer '{operation}' within {self.timeout_s}s")
+        return connection.recv()
+
+    def call(self, operation: str, *args):
+        """
+        Run an operation in the inference worker and return its result. A broken connection (e.g.
+        the worker restarted) is replaced once: the operations have no side effects.
+        """
+        start = time.perf_counter()
+        with self._slots:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = self._connect()
+            try:
+                try:
+                    ok, result = self._request(connection, operation, args)
+                except (EOFError, OSError):
+                    connection.close()
+                    self.reconnects += 1
+                    connection = self._connect()
+                    ok, result = self._request(connection, operation, args)
+            except Exception:
+                connection.close()
+                self.errors += 1
+                metrics.inc("inference_errors", operation=operation)
+                raise
+            self._idle.put(connection)
+
+        self.calls += 1
+        metrics.observe("inference_call_seconds", time.perf_counter() - start, operation=operation)
+        if not ok:
+            self.errors += 1
+            metrics.inc("inference_errors", operation=operation)
+            raise InferenceError(f"{operation}: {result}")
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "address": str(self.address),
+            "calls": self.calls,
+            "errors": self.errors,
+            "reconnects": self.reconnects,
+            "idle_connections": self._idle.qsize(),
+        }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> InferenceClient:
+    """
+    Return the inference client of this process (created on first use, after the worker processes fork).
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = InferenceClient()
+        return _client
+
+
+class RemoteModel:
+    """
+    Stands for a model loaded in the inference worker: the registry of an API worker only tracks
+    its readiness, the inference runs through the client.
+    """
+
+    def __init__(self, name: str, info: dict):
+        self.name = name
+        self.info = info
+
+
+class RemoteEncoder(RemoteModel):
+    """
+    Sentence encoder of the inference worker, with the `encode` and `get_sentence_embedding_dimension`
+    methods of SentenceTransformer used by the retrieval code.
+    """
+
+    def encode(self, sentences, **kwargs):
+        return get_client().call("encode", sentences, kwargs)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.info["dimension"]
+
+
+def remote_loader(name: str):
+    """
+    Return a model registry loader that waits until the inference worker has loaded the model.
+    """
+    def load():
+        info = get_client().call("load", name)
+        return RemoteEncoder(name, info) if name == "encoder" else RemoteModel(name, info)
+
+    return load
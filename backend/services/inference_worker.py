@@ -0,0 +1,170 @@
+import argparse
+import asyncio
+import logging
+import os
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener
+from dotenv import load_dotenv
+
+import services.inference_client as inference_client
+from services.batching import MicroBatcher
+from services.inference_client import INFERENCE_WORKER_ADDRESS, INFERENCE_WORKER_AUTHKEY, parse_address, require_authkey
+from services.metrics import metrics, setup_logging
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Requests of the API workers classified together (each request is a list of texts)
+INFERENCE_BATCH_MAX_SIZE = int(os.getenv("INFERENCE_BATCH_MAX_SIZE", "16"))
+INFERENCE_BATCH_MAX_WAIT_MS = float(os.getenv("INFERENCE_BATCH_MAX_WAIT_MS", "5"))
+INFERENCE_MODELS = ["nlp", "topic_classifier", "encoder"]
+
+
+class InferenceWorker:
+    """
+    Process holding the heavy models (spaCy, topic classifier, sentence encoder) for every API
+    worker. Each client connection is served by a thread; topic classification requests of all
+    the connections go through a single micro-batcher, the other operations run directly.
+
+    Operations (sent as (name, args) tuples, answered with (ok, result)):
+        load(name)                           load a model, return its info
+        classify_topics(texts, batch_size)   (topic, confidence) for each text
+        entities(texts)                      filtered (text, label) entities of each text
+        encode(sentences, kwargs)            SentenceTransformer.encode
+        build_indexes(topics)                build (or reindex) the FAISS indexes, return the built topics
+        stats()                              batcher, connection and model stats
+    """
+
+    def __init__(self, address: str = INFERENCE_WORKER_ADDRESS, authkey: bytes = INFERENCE_WORKER_AUTHKEY,
+                 max_batch_size: int = INFERENCE_BATCH_MAX_SIZE, max_wait_ms: float = INFERENCE_BATCH_MAX_WAIT_MS):
+        # The models of this process are always local, whatever INFERENCE_MODE says
+        inference_client.INFERENCE_MODE = "local"
+        self.authkey = require_authkey(authkey)
+        from services.model_registry import registry
+        from services.topic_extraction import classify_topics, query_entities
+
+        self.address = parse_address(address)
+        self.registry = registry
+        self.classify_topics = classify_topics
+        self.query_entities = query_entities
+        self.batcher = MicroBatcher(self._classify_requests, max_batch_size, max_wait_ms, name="inference_worker")
+        self.loop = asyncio.new_event_loop()
+        self.build_lock = threading.Lock()
+        self.connections = 0
+        self.operations = {
+            "load": self.load,
+            "classify_topics": self.classify,
+            "entities": self.entities,
+            "encode": self.encode,
+            "build_indexes": self.build_indexes,
+            "stats": self.stats,
+        }
+
+    def _classify_requests(self, requests: list) -> list:
+        texts = [text for texts in requests for text in texts]
+        topics = self.classify_topics(texts, batch_size=max(1, min(len(texts), 64)))
+        results, start = [], 0
+        for texts in requests:
+            results.append(topics[start:start + len(texts)])
+            start += len(texts)
+        return results
+
+    def load(self, name: str) -> dict:
+        model = self.registry.get(name)
+        info = {"name": name, "pid": os.getpid()}
+        if name == "encoder":
+            info["dimension"] = model.get_sentence_embedding_dimension()
+        return info
+
+    def classify(self, texts: list, batch_size: int = 32) -> list:
+        if not texts:
+            return []
+        return asyncio.run_coroutine_threadsafe(self.batcher.submit(list(texts)), self.loop).result()
+
+    def entities(self, texts: list) -> list:
+        return self.query_entities(texts)
+
+    def encode(self, sentences, kwargs: dict):
+        return self.registry.get("encoder").encode(sentences, **kwargs)
+
+    def build_indexes(self, topics: list) -> list:
+        """
+        Build the FAISS indexes missing on disk, and rebuild the ones saved with another index
+        type, once for all the API workers (which only read them).
+        """
+        from neo4j_connector import Neo4jConnector
+        from services.vector_index import TopicIndexStore
+
+        with self.build_lock:
+            store = TopicIndexStore()
+            missing = store.load(topics)
+            if missing:
+                connector = Neo4jConnector()
+                try:
+                    store.build(connector, missing)
+                finally:
+                    connector.close()
+            return missing
+
+    def stats(self) -> dict:
+        return {"connections": self.connections, "batcher": self.batcher.stats(), "models": self.registry.status()}
+
+    def handle(self, connection):
+        """
+        Serve the requests of a client connection until it is closed.
+        """
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    operation, args = connection.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    with metrics.stage(f"worker_{operation}"):
+                        reply = (True, self.operations[operation](*args))
+                except Exception as e:
+                    logger.exception("Operation '%s' failed", operation)
+                    reply = (False, f"{type(e).__name__}: {e}")
+                connection.send(reply)
+        finally:
+            self.connections -= 1
+            connection.close()
+
+    def serve_forever(self, warmup: bool = True):
+        """
+        Accept the connections of the API workers (one thread each) until interrupted.
+        """
+        threading.Thread(target=self.loop.run_forever, name="inference-batcher", daemon=True).start()
+        if warmup:
+            self.registry.warmup(INFERENCE_MODELS)
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)  # Unix socket left by a previous run
+        with Listener(self.address, authkey=self.authkey) as listener:
+            logger.info("Inference worker listening on %s (pid %d)", self.address, os.getpid())
+            while True:
+                try:
+                    connection = listener.accept()
+                except (AuthenticationError, OSError, EOFError) as e:
+                    # Failed handshake (e.g. wrong authkey)
+                    logger.warning("Rejected connection: %s", e)
+                    continue
+                threading.Thread(target=self.handle, args=(connection,), name="inference-connection", daemon=True).start()
+
+
+if __name__ == "__main__":
+    # Start the models once, then the API workers with INFERENCE_MODE=remote:
+    #   `python -m services.inference_worker`
+    #   `INFERENCE_MODE=remote python -m uvicorn main:app --workers 4`
+    parser = argparse.ArgumentParser(description="Inference worker serving the models to the API workers.")
+    parser.add_argument("--address", default=INFERENCE_WORKER_ADDRESS, help='"host:port" or a Unix socket path')
+    parser.add_argument("--no-warmup", action="store_true", help="Load the models on first use instead of at startup")
+    args = parser.parse_args()
+
+    setup_logging()
+    try:
+        InferenceWorker(args.address).serve_forever(warmup=not args.no_warmup)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,252 @@
+import atexit
+import bisect
+import contextlib
+import cProfile
+import logging
+import logging.handlers
+import math
+import os
+import queue
+import random
+import re
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Sampled profiling: fraction of the requests profiled with cProfile, and whether a request can
+# ask for a profile with the X-Profile header. The .prof dumps are written to PROFILE_DIR.
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_ON_REQUEST = os.getenv("PROFILE_ON_REQUEST", "0") == "1"
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "profiles"))
+PROFILE_HEADER = "x-profile"
+
+METRICS_PREFIX = "backend"
+# Buckets of the latency histograms (seconds) and of the batch size histograms
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+logger = logging.getLogger(__name__)
+_listener = None
+
+
+def setup_logging(level: str = LOG_LEVEL):
+    """
+    Send the log records through a queue to a background thread that writes them to stderr, so
+    that logging on the request path never waits on the terminal.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+    records = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.handlers = [logging.handlers.QueueHandler(records)]
+    _listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+class Histogram:
+    """
+    Cumulative histogram with fixed buckets, in the Prometheus format.
+    """
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last one: above the largest bucket
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _name(value: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", value).strip("_").lower()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _value(value) -> str:
+    if isinstance(value, float) and not math.isfinite(value):
+        return "NaN" if math.isnan(value) else "+Inf" if value > 0 else "-Inf"
+    return str(value)
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _flatten(stats: dict, prefix: str = ""):
+    """
+    Yield the numeric values of a (nested) stats dictionary as (name, value) pairs.
+    """
+    for key, value in stats.items():
+        name = f"{prefix}_{_name(str(key))}" if prefix else _name(str(key))
+        if isinstance(value, dict):
+            yield from _flatten(value, name)
+        elif isinstance(value, bool):
+            yield name, int(value)
+        elif isinstance(value, (int, float)):
+            yield name, value
+
+
+class MetricsRegistry:
+    """
+    Thread-safe registry of the backend metrics: latency histograms of the pipeline stages,
+    counters, and the stats dictionaries of the services (caches, queues, batchers) exported as
+    gauges. Rendered in the Prometheus text format by GET /metrics.
+    """
+
+    def __init__(self, prefix: str = METRICS_PREFIX):
+        self.prefix = prefix
+        self.histograms = {}  # name -> {labels: Histogram}
+        self.counters = {}  # name -> {labels: value}
+        self.collectors = {}  # name -> function returning a stats dictionary
+        self.lock = threading.Lock()
+
+    def observe(self, name: str, value: float, buckets: tuple = LATENCY_BUCKETS, **labels):
+        """
+        Record a value in a histogram (seconds for the latencies).
+        """
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """
+        Increment a counter.
+        """
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def register(self, name: str, collect):
+        """
+        Export the numeric values of a stats function (e.g. QueryCache.stats) as gauges named
+        <prefix>_<name>_<key>, read at every scrape.
+        """
+        self.collectors[name] = collect
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """
+        Time a stage of the inference pipeline into the stage_seconds histogram.
+
+        Example:
+            with metrics.stage("embedding"):
+                embedding = await run_in_threadpool(index_store.embed, [tweet])
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - start, stage=name)
+
+    def render(self) -> str:
+        """
+        Return every metric in the Prometheus text exposition format.
+        """
+        lines = []
+        with self.lock:
+            for name, series in sorted(self.histograms.items()):
+                metric = f"{self.prefix}_{name}"
+                lines.append(f"# TYPE {metric} histogram")
+                for labels, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip((*histogram.buckets, "+Inf"), histogram.counts):
+                        cumulative += count
+                        lines.append(f"{metric}_bucket{_labels((*labels, ('le', bound)))} {cumulative}")
+                    lines.append(f"{metric}_sum{_labels(labels)} {histogram.sum}")
+                    lines.append(f"{metric}_count{_labels(labels)} {histogram.count}")
+            for name, series in sorted(self.counters.items()):
+                metric = f"{self.prefix}_{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                for labels, value in series.items():
+                    lines.append(f"{metric}{_labels(labels)} {value}")
+            collectors = list(self.collectors.items())
+
+        for collector, collect in collectors:
+            try:
+                stats = collect()
+            except Exception as e:
+                logger.warning("Metrics collector '%s' failed: %s", collector, e)
+                continue
+            for key, value in _flatten(stats, _name(collector)):
+                metric = f"{self.prefix}_{key}"
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric} {_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+class RequestProfiler:
+    """
+    Profiles sampled requests with cProfile and dumps the stats to PROFILE_DIR (open them with
+    `python -m pstats` or snakeviz). One request is profiled at a time. cProfile follows the
+    event loop thread: a dump also contains the work of the requests running concurrently, but
+    not the work sent to the threadpool.
+    """
+
+    def __init__(self, sample_rate: float = PROFILE_SAMPLE_RATE, on_request: bool = PROFILE_ON_REQUEST, directory: str = PROFILE_DIR):
+        self.sample_rate = sample_rate
+        self.on_request = on_request
+        self.directory = directory
+        self.lock = threading.Lock()
+
+    def start(self, headers) -> cProfile.Profile:
+        """
+        Start profiling a request if it is sampled or asks for it (and no other profile is running).
+
+        Returns:
+            cProfile.Profile: The running profiler, or None.
+        """
+        requested = self.on_request and headers.get(PROFILE_HEADER) == "1"
+        if not requested and (self.sample_rate <= 0 or random.random() >= self.sample_rate):
+            return None
+        if not self.lock.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) is active
+            self.lock.release()
+            return None
+        return profile
+
+    def stop(self, profile: cProfile.Profile, name: str) -> str:
+        """
+        Stop a profile and dump it.
+
+        Returns:
+            str: The path of the .prof file.
+        """
+        try:
+            profile.disable()
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{_name(name) or 'root'}-{os.getpid()}.prof")
+            profile.dump_stats(path)
+        finally:
+            self.lock.release()
+        metrics.inc("profiles")
+        logger.info("Profile of %s written to %s", name, path)
+        return path
@@ -0,0 +1,100 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """
+    Loads models on first use (or in a background warmup thread) instead of at import time,
+    and keeps track of which ones are ready.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._warmups = {}
+        self._models = {}
+        self._errors = {}
+        self._load_times = {}
+        self._loading = set()
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, loader, warmup=None):
+        """
+        Register a model.
+
+        Args:
+            name (str): The model name.
+            loader: Function without arguments returning the loaded model.
+            warmup: Optional function called with the loaded model to run a first inference.
+        """
+        with self._lock:
+            self._loaders[name] = loader
+            self._warmups[name] = warmup
+            self._locks[name] = threading.Lock()
+
+    def get(self, name: str):
+        """
+        Return a model, loading it first if needed. Concurrent callers wait for a single load.
+        """
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        with self._locks[name]:
+            if name not in self._models:
+                self._loading.add(name)
+                start = time.perf_counter()
+                try:
+                    model = self._loaders[name]()
+                    if self._warmups[name] is not None:
+                        self._warmups[name](model)
+                except Exception as e:
+                    self._errors[name] = str(e)
+                    raise
+                finally:
+                    self._loading.discard(name)
+                self._errors.pop(name, None)
+                self._load_times[name] = time.perf_counter() - start
+                self._models[name] = model
+                logger.info("Loaded '%s' in %.1fs", name, self._load_times[name])
+        return self._models[name]
+
+    def is_ready(self, name: str) -> bool:
+        return name in self._models
+
+    def warmup(self, names: list) -> threading.Thread:
+        """
+        Load the given models one after the other in a background thread.
+        """
+        def run():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    logger.error("Warmup of '%s' failed: %s", name, e)
+
+        thread = threading.Thread(target=run, name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def status(self) -> dict:
+        """
+        Return the state ("ready", "loading", "error" or "not_loaded") of every registered model.
+        """
+        status = {}
+        for name in self._loaders:
+            if name in self._models:
+                status[name] = {"state": "ready", "load_time_s": round(self._load_times[name], 3)}
+            elif name in self._loading:
+                status[name] = {"state": "loading"}
+            elif name in self._errors:
+                status[name] = {"state": "error", "error": self._errors[name]}
+            else:
+                status[name] = {"state": "not_loaded"}
+        return status
+
+
+registry = ModelRegistry()
@@ -0,0 +1,211 @@
+import collections
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+QUERY_CACHE_ENABLED = os.getenv("QUERY_CACHE_ENABLED", "1") == "1"
+QUERY_CACHE_MAX_MB = float(os.getenv("QUERY_CACHE_MAX_MB", "64"))
+# Interval at which the backend polls the data version bumped by ingest.py
+DATA_VERSION_POLL_S = float(os.getenv("DATA_VERSION_POLL_S", "10"))
+# Cache-Control max-age of the GET analytics responses (browsers revalidate with the ETag afterwards)
+ANALYTICS_HTTP_MAX_AGE = int(os.getenv("ANALYTICS_HTTP_MAX_AGE", "60"))
+
+# Time to live (seconds) of the cached results, per connector method. Results are also dropped
+# when the data version changes, so the TTLs only bound the staleness of out-of-band writes.
+# Methods not listed here are not cached.
+QUERY_CACHE_TTLS = {
+    "A_get_topics_by_author": 3600,
+    "A_get_years_by_author": 3600,
+    "A1_get_likes_by_year_for_topic_and_author": 600,
+    "A2_get_topic_trend_by_month_year": 600,
+    "A3_get_top_tweets": 600,
+    "A4_get_average_sentiment_by_topic": 600,
+    "A5_get_average_sentiment_per_year": 600,
+    "LLM_get_tweets_by_topic": 300,
+    "LLM_get_tweets_by_author_topic": 300,
+}
+
+
+def parse_ttls(value: str) -> dict:
+    """
+    Parse TTL overrides such as "A3_get_top_tweets=60,LLM_get_tweets_by_topic=0" (0 disables caching).
+    """
+    ttls = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, seconds = item.split("=")
+        ttls[name.strip()] = float(seconds)
+    return ttls
+
+
+QUERY_CACHE_TTLS.update(parse_ttls(os.getenv("QUERY_CACHE_TTLS", "")))
+
+
+class QueryCache:
+    """
+    Thread-safe LRU cache of connector results with per-method TTLs, bounded by an approximate
+    memory budget and invalidated when the data version changes.
+    """
+
+    def __init__(self, max_bytes: int = int(QUERY_CACHE_MAX_MB * 1024 * 1024), ttls: dict = None):
+        """
+        Args:
+            max_bytes (int): Memory budget of the cached results (pickled size), least recently used are evicted.
+            ttls (dict): Time to live per method name (see QUERY_CACHE_TTLS).
+        """
+        self.max_bytes = max_bytes
+        self.ttls = QUERY_CACHE_TTLS if ttls is None else ttls
+        self.version = None
+        self.entries = collections.OrderedDict()  # key -> (expires_at, size, value)
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def ttl(self, method: str) -> float:
+        return self.ttls.get(method, 0)
+
+    def _drop(self, key):
+        _, size, _ = self.entries.pop(key)
+        self.size -= size
+
+    def get(self, method: str, args: tuple):
+        """
+        Return (True, value) for a fresh cached result, (False, None) otherwise.
+        """
+        key = (method, args)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return False, None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[2]
+
+    def put(self, method: str, args: tuple, value, version=None):
+        """
+        Store a result. Results read at an older data version than the current one are not stored.
+
+        Args:
+            method (str): Connector method name.
+            args (tuple): Positional arguments of the call.
+            value: The result, shared between callers: it must not be mutated.
+            version: The data version current when the query started.
+        """
+        size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        if size > self.max_bytes:
+            return
+        key = (method, args)
+        with self.lock:
+            if version != self.version:
+                return
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = (time.monotonic() + self.ttl(method), size, value)
+            self.size += size
+            while self.size > self.max_bytes:
+                self._drop(next(iter(self.entries)))
+                self.evictions += 1
+
+    def set_version(self, version) -> bool:
+        """
+        Record the current data version, dropping every entry if it changed.
+
+        Returns:
+            bool: True if the version changed.
+        """
+        with self.lock:
+            if version == self.version:
+                return False
+            if self.version is not None:
+                self.invalidations += 1
+                logger.info("Data version %s -> %s: %d entries dropped", self.version, version, len(self.entries))
+            self.version = version
+            self.entries.clear()
+            self.size = 0
+            return True
+
+    def etag(self, *parts) -> str:
+        """
+        Build the ETag of a response derived from the data (its path and query string), valid
+        until the next data version.
+        """
+        material = "\x1f".join(map(str, (self.version, *parts)))
+        return '"' + hashlib.sha1(material.encode("utf-8")).hexdigest()[:20] + '"'
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": QUERY_CACHE_ENABLED,
+                "data_version": self.version,
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+class CachedConnector:
+    """
+    Neo4jConnector wrapper serving the methods listed in the cache TTLs from a QueryCache.
+    Other attributes (driver, close, get_data_version, ...) go to the wrapped connector.
+    """
+
+    def __init__(self, connector, cache: QueryCache):
+        self.connector = connector
+        self.cache = cache
+
+    def __getattr__(self, name):
+        method = getattr(self.connector, name)
+        if not QUERY_CACHE_ENABLED or self.cache.ttl(name) <= 0:
+            return method
+
+        def call(*args):
+            found, value = self.cache.get(name, args)
+            if found:
+                return value
+            version = self.cache.version
+            value = method(*args)
+            self.cache.put(name, args, value, version)
+            return value
+
+        return call
+
+
+class AsyncCachedConnector(CachedConnector):
+    """
+    AsyncNeo4jConnector wrapper serving the cached methods from a QueryCache.
+    """
+
+    def __getattr__(self, name):
+        method = getattr(self.connector, name)
+        if not QUERY_CACHE_ENABLED or self.cache.ttl(name) <= 0:
+            return method
+
+        async def call(*args):
+            found, value = self.cache.get(name, args)
+            if found:
+                return value
+            version = self.cache.version
+            value = await method(*args)
+            self.cache.put(name, args, value, version)
+            return value
+
+        return call
@@ -0,0 +1,246 @@
+import collections
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") == "1"
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+RESPONSE_CACHE_TTL_S = float(os.getenv("RESPONSE_CACHE_TTL_S", "86400"))
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH") or None  # SQLite file, in-memory only if unset
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0"))  # 0 = exact matches only
+
+# "bypass": every /generate_tweet call reaches the LLM; "pool": up to GENERATION_POOL_SIZE
+# generations are kept per (author, topic) and replayed at random once the pool is full
+GENERATION_CACHE_MODE = os.getenv("GENERATION_CACHE_MODE", "bypass")
+GENERATION_POOL_SIZE = int(os.getenv("GENERATION_POOL_SIZE", "5"))
+GENERATION_POOL_TTL_S = float(os.getenv("GENERATION_POOL_TTL_S", "3600"))
+
+_UNKNOWN_VERSION = object()  # No data version recorded yet
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize an input text for cache lookups (case and whitespace insensitive).
+    """
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def cache_key(text: str, *versions) -> str:
+    """
+    Build a cache key from the normalized input and the versions it depends on
+    (prompt template, model name, ...).
+    """
+    material = "\x1f".join([normalize_text(text), *map(str, versions)])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    LRU/TTL cache of final LLM results, with an optional SQLite backend and an optional
+    near-duplicate lookup on the (normalized) input embeddings.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, ttl_s: float = RESPONSE_CACHE_TTL_S,
+                 disk_path: str = RESPONSE_CACHE_PATH, similarity_threshold: float = RESPONSE_CACHE_SIMILARITY):
+        """
+        Args:
+            max_entries (int): Maximum number of entries kept in memory (least recently used are evicted).
+            ttl_s (float): Time to live of an entry, in seconds.
+            disk_path (str): Optional SQLite file where the entries are persisted.
+            similarity_threshold (float): Cosine similarity above which a cached input counts as a hit (0 disables it).
+        """
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.similarity_threshold = similarity_threshold
+        self.entries = collections.OrderedDict()  # key -> (value, expires_at, embedding)
+        self.lock = threading.Lock()
+        self.version = _UNKNOWN_VERSION  # Data version the cached answers were computed on
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        self.db = None
+        if disk_path:
+            self.db = sqlite3.connect(disk_path, check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT, expires_at REAL, embedding BLOB)")
+            self.db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+            row = self.db.execute("SELECT value FROM meta WHERE name = 'data_version'").fetchone()
+            if row:
+                self.version = json.loads(row[0])
+            self.db.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+            self.db.commit()
+            rows = self.db.execute("SELECT key, value, expires_at, embedding FROM responses ORDER BY expires_at DESC LIMIT ?", (max_entries,)).fetchall()
+            for key, value, expires_at, embedding in reversed(rows):
+                vector = np.frombuffer(embedding, dtype="float32") if embedding else None
+                self.entries[key] = (json.loads(value), expires_at, vector)
+
+    @staticmethod
+    def _normalize(embedding):
+        if embedding is None:
+            return None
+        vector = np.asarray(embedding, dtype="float32").reshape(-1)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _similar_key(self, embedding: np.ndarray):
+        keys = [key for key, (_, _, vector) in self.entries.items() if vector is not None]
+        if not keys:
+            return None
+        matrix = np.stack([self.entries[key][2] for key in keys])
+        scores = matrix @ embedding
+        best = int(scores.argmax())
+        return keys[best] if scores[best] >= self.similarity_threshold else None
+
+    def get(self, key: str, embedding=None):
+        """
+        Return the cached value of a key, or of the most similar cached input when an embedding
+        is given and the similarity lookup is enabled. Returns None on a miss.
+        """
+        now = time.time()
+        with self.lock:
+            matched = key if key in self.entries else None
+            if matched is None and embedding is not None and self.similarity_threshold > 0:
+                matched = self._similar_key(self._normalize(embedding))
+
+            if matched is not None:
+                value, expires_at, _ = self.entries[matched]
+                if expires_at >= now:
+                    self.entries.move_to_end(matched)
+                    if matched == key:
+                        self.hits += 1
+                    else:
+                        self.similar_hits += 1
+                    return value
+                self._delete(matched)
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: dict, embedding=None):
+        """
+        Store a value (JSON serializable), evicting the least recently used entries if needed.
+        """
+        vector = self._normalize(embedding)
+        expires_at = time.time() + self.ttl_s
+        with self.lock:
+            self.entries[key] = (value, expires_at, vector)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                evicted, _ = self.entries.popitem(last=False)
+                self.evictions += 1
+                if self.db is not None:
+                    self.db.execute("DELETE FROM responses WHERE key = ?", (evicted,))
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, expires_at, embedding) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), expires_at, vector.tobytes() if vector is not None else None)
+                )
+                self.db.commit()
+
+    def set_version(self, version) -> bool:
+        """
+        Record the data version, dropping every entry (in memory and on disk) if it changed: the
+        answers depend on the context tweets retrieved from the data.
+
+        Returns:
+            bool: True if the version changed.
+        """
+        with self.lock:
+            if version == self.version:
+                return False
+            if self.entries:
+                self.invalidations += 1
+            self.version = version
+            self.entries.clear()
+            if self.db is not None:
+                self.db.execute("DELETE FROM responses")
+                self.db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('data_version', ?)", (json.dumps(version),))
+                self.db.commit()
+            return True
+
+    def _delete(self, key: str):
+        self.entries.pop(key, None)
+        if self.db is not None:
+            self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.db.commit()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.similar_hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_ratio": (self.hits + self.similar_hits) / lookups if lookups else 0.0,
+        }
+
+
+class GenerationPool:
+    """
+    Small pool of generated tweets per (author, topic). Generation uses a non-zero temperature,
+    so instead of caching a single answer the pool keeps several and replays one at random.
+    Pooled generations expire after `ttl_s` seconds and the whole pool is cleared when the data
+    (the example tweets of the prompts) changes.
+    """
+
+    def __init__(self, size: int = GENERATION_POOL_SIZE, ttl_s: float = GENERATION_POOL_TTL_S):
+        self.size = size
+        self.ttl_s = ttl_s
+        self.pools = collections.defaultdict(list)  # (author, topic) -> [(value, expires_at)]
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def _live(self, author: str, topic: str) -> list:
+        now = time.time()
+        pool = self.pools[(author, topic)]
+        live = [(value, expires_at) for value, expires_at in pool if expires_at >= now]
+        self.expired += len(pool) - len(live)
+        self.pools[(author, topic)] = live
+        return live
+
+    def get(self, author: str, topic: str):
+        """
+        Return a random pooled generation once the pool is full, None otherwise.
+        """
+        pool = self._live(author, topic)
+        if len(pool) >= self.size:
+            self.hits += 1
+            return random.choice(pool)[0]
+        self.misses += 1
+        return None
+
+    def add(self, author: str, topic: str, value: dict):
+        """
+        Pool a successful generation if the pool of its (author, topic) is not full.
+        """
+        pool = self._live(author, topic)
+        if len(pool) < self.size:
+            pool.append((value, time.time() + self.ttl_s))
+
+    def clear(self):
+        """
+        Drop every pooled generation.
+        """
+        self.pools.clear()
+
+    def stats(self) -> dict:
+        return {
+            "pools": len(self.pools),
+            "size": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+        }
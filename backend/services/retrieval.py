@@ -0,0 +1,493 @@
+import argparse
+import json
+import math
+import os
+import threading
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+from neo4j_connector import NEO4J_DATABASE
+from neo4j_schema import VECTOR_INDEX_NAME, create_vector_index
+from services.inference_client import get_client, remote_inference
+from services.tweet_analysis_generation import get_encoder
+
+load_dotenv()
+
+# Retrieval of the context tweets of /analyze: per-topic FAISS indexes kept in the backend
+# process ("faiss"), the Neo4j vector index on the embedding property of the Tweet nodes ("neo4j"),
+# or the tweets sharing entities with the query re-ranked by embedding distance ("hybrid")
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "faiss")
+RETRIEVAL_BACKENDS = ["faiss", "neo4j", "hybrid"]
+
+# The vector index is not partitioned by topic: each query fetches k * VECTOR_OVERSAMPLE nearest
+# tweets, keeps those of the requested topic and widens the search (up to VECTOR_MAX_CANDIDATES)
+# when fewer than k are left
+VECTOR_OVERSAMPLE = int(os.getenv("VECTOR_OVERSAMPLE", "20"))
+VECTOR_MAX_CANDIDATES = int(os.getenv("VECTOR_MAX_CANDIDATES", "5000"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "1000"))
+
+# Hybrid retrieval: at most ENTITY_MAX_CANDIDATES tweets of the topic, those whose shared entities
+# have the highest summed IDF, are compared with the query embedding
+ENTITY_MAX_CANDIDATES = int(os.getenv("ENTITY_MAX_CANDIDATES", "256"))
+
+TWEETS_WITHOUT_EMBEDDING = """
+MATCH (t:Tweet)
+WHERE t.embedding IS NULL AND t.id IS NOT NULL AND t.text IS NOT NULL
+RETURN t.id AS id, t.text AS text
+LIMIT $limit
+"""
+
+SET_EMBEDDINGS = """
+UNWIND $rows AS row
+MATCH (t:Tweet {id: row.id})
+CALL db.create.setNodeVectorProperty(t, 'embedding', row.embedding)
+"""
+
+
+def embed_texts(encoder, texts: list) -> np.ndarray:
+    """
+    Embed a list of texts with the sentence encoder as a float32 matrix.
+    """
+    return np.asarray(encoder.encode(texts, convert_to_numpy=True), dtype="float32")
+
+
+def backfill_embeddings(driver, encoder=None, batch_size: int = EMBEDDING_BATCH_SIZE) -> int:
+    """
+    Store the sentence embedding of every Tweet node that doesn't have one yet and wait for the
+    vector index to be online. Used for the initial load and, by ingest.py, for the new tweets.
+
+    Args:
+        driver: A sync Neo4j driver.
+        encoder: The sentence encoder (the shared one if None).
+        batch_size (int): Tweets embedded and written per transaction.
+
+    Returns:
+        int: The number of tweets embedded.
+    """
+    encoder = encoder if encoder is not None else get_encoder()
+    total = 0
+    start = time.perf_counter()
+    with driver.session(database=NEO4J_DATABASE) as session:
+        create_vector_index(session)
+        while True:
+            rows = session.run(TWEETS_WITHOUT_EMBEDDING, limit=batch_size).data()
+            if not rows:
+                break
+            embeddings = embed_texts(encoder, [row["text"] for row in rows])
+            session.run(SET_EMBEDDINGS, rows=[
+                {"id": row["id"], "embedding": embedding.tolist()} for row, embedding in zip(rows, embeddings)
+            ]).consume()
+            total += len(rows)
+            print(f"[RETRIEVAL] Embedded {total} tweets ({total / max(time.perf_counter() - start, 1e-9):.1f} tweets/sec)")
+        session.run("CALL db.awaitIndexes(300)").consume()
+    return total
+
+
+class Neo4jVectorRetriever:
+    """
+    Context retrieval through the Neo4j vector index on the Tweet embeddings. It has the
+    interface of TopicIndexStore (embed, search, search_batch): the nearest neighbour search and
+    the topic filter run in the database and only the k (text, author) rows of a query come back.
+    """
+
+    def __init__(self, connector, encoder=None, index_name: str = VECTOR_INDEX_NAME,
+                 oversample: int = VECTOR_OVERSAMPLE, max_candidates: int = VECTOR_MAX_CANDIDATES):
+        """
+        Args:
+            connector: The Neo4jConnector used for the searches.
+            encoder: The sentence encoder (the shared one if None).
+            index_name (str): Name of the vector index.
+            oversample (int): Nearest tweets fetched per query before the topic filter, as a multiple of k.
+            max_candidates (int): Upper bound of the tweets fetched per query when widening the search.
+        """
+        self.connector = connector
+        self._encoder = encoder
+        self.index_name = index_name
+        self.oversample = oversample
+        self.max_candidates = max_candidates
+
+    @property
+    def encoder(self):
+        return self._encoder if self._encoder is not None else get_encoder()
+
+    def embed(self, texts: list) -> np.ndarray:
+        """
+        Embed a list of texts with the sentence encoder as a float32 matrix.
+        """
+        return embed_texts(self.encoder, texts)
+
+    def reload(self, connector, topics: list) -> list:
+        """
+        Nothing to reload: the vector index of the database always includes the ingested tweets.
+        """
+        return []
+
+    @staticmethod
+    def _row(hit: dict) -> dict:
+        # Neo4j scores cosine similarity as (1 + cos) / 2. For the unit-length MiniLM embeddings
+        # the squared L2 distance of the flat FAISS indexes is 2 - 2 cos = 4 * (1 - score).
+        return {"text": hit["text"], "author": hit["author"], "distance": 4.0 * (1.0 - hit["score"])}
+
+    def search(self, topic: str, query_embedding: np.ndarray, k: int = 10, entities: list = None):
+        """
+        Return the k tweets of a topic that are closest to a single query embedding.
+
+        Args:
+            topic (str): The topic of the returned tweets.
+            query_embedding (np.ndarray): Embedding of shape (dimension,) or (1, dimension).
+            k (int): Number of tweets to return.
+            entities (list): Entities of the query (unused, see EntityGraphRetriever).
+
+        Returns:
+            list: Dictionaries with text, author and distance, closest first.
+        """
+        return self.search_batch(topic, np.atleast_2d(query_embedding), k)[0]
+
+    def search_batch(self, topic: str, query_embeddings: np.ndarray, k: int = 10, entities: list = None):
+        """
+        Search the vector index for several queries in one round trip. Queries that found fewer
+        than k tweets of the topic among their candidates are retried with 4 times more candidates.
+
+        Args:
+            topic (str): The topic of the returned tweets.
+            query_embeddings (np.ndarray): Matrix of shape (n_queries, dimension).
+            k (int): Number of tweets to return per query.
+            entities (list): Entities of each query (unused, see EntityGraphRetriever).
+
+        Returns:
+            list: For each query, the dictionaries with text, author and distance, closest first.
+        """
+        query_embeddings = np.asarray(query_embeddings, dtype="float32")
+        results = [[] for _ in range(len(query_embeddings))]
+        pending = list(range(len(query_embeddings)))
+        candidates = min(k * self.oversample, self.max_candidates)
+        while pending and k > 0:
+            hits = self.connector.LLM_search_similar_tweets(
+                topic, [query_embeddings[i].tolist() for i in pending], k, candidates, self.index_name
+            )
+            retry = []
+            for i, rows in zip(pending, hits):
+                results[i] = [self._row(hit) for hit in rows]
+                if len(rows) < k and candidates < self.max_candidates:
+                    retry.append(i)
+            pending, candidates = retry, min(candidates * 4, self.max_candidates)
+        return results
+
+
+def entity_key(name: str, label: str) -> tuple:
+    return name.strip().casefold(), label
+
+
+class EntityIndex:
+    """
+    Inverted index from the entities mentioned by the tweets of a topic to the positions of
+    these tweets in the topic's FAISS index, with the inverse document frequency of each entity.
+    """
+
+    def __init__(self, rows: list, mentions: list, embeddings: np.ndarray):
+        """
+        Args:
+            rows (list): The (text, author) rows of the topic index, in index order.
+            mentions (list): Dictionaries with text, author and entities ([name, type] pairs).
+            embeddings (np.ndarray): The (memory-mapped) embeddings of the rows.
+        """
+        positions = {}
+        for position, row in enumerate(rows):
+            positions.setdefault((row["text"], row["author"]), []).append(position)
+
+        postings = {}
+        for mention in mentions:
+            tweet_positions = positions.get((mention["text"], mention["author"]), ())
+            for name, label in mention["entities"]:
+                postings.setdefault(entity_key(name, label), set()).update(tweet_positions)
+
+        self.rows = rows
+        self.embeddings = embeddings
+        self.postings = {key: np.fromiter(sorted(p), dtype=np.int64, count=len(p)) for key, p in postings.items() if p}
+        # Smoothed IDF: an entity mentioned by every tweet of the topic still counts a little
+        self.idf = {key: math.log(1 + len(rows) / len(p)) for key, p in self.postings.items()}
+
+    def candidates(self, entities: list, limit: int) -> np.ndarray:
+        """
+        Return the positions of the tweets sharing entities with a query, at most `limit` of them:
+        those whose shared entities have the highest summed IDF.
+        """
+        keys = [key for key in {entity_key(name, label) for name, label in entities} if key in self.postings]
+        if not keys:
+            return np.zeros(0, dtype=np.int64)
+        positions = np.concatenate([self.postings[key] for key in keys])
+        weights = np.concatenate([np.full(len(self.postings[key]), self.idf[key]) for key in keys])
+        unique, inverse = np.unique(positions, return_inverse=True)
+        if len(unique) <= limit:
+            return unique
+        scores = np.bincount(inverse, weights=weights)
+        return np.sort(unique[np.argpartition(-scores, limit - 1)[:limit]])
+
+
+class EntityGraphRetriever:
+    """
+    Hybrid context retrieval with the interface of TopicIndexStore (embed, search, search_batch):
+    the tweets of the topic that share entities with the query (MENTIONS relationships, weighted by
+    entity rarity) are the candidates, re-ranked by embedding distance. Queries without entity
+    matches fall back to the topic index, which also completes the lists shorter than k.
+    """
+
+    def __init__(self, index_store, max_candidates: int = ENTITY_MAX_CANDIDATES):
+        """
+        Args:
+            index_store: The loaded TopicIndexStore (embeddings, rows and fallback search).
+            max_candidates (int): Maximum number of tweets compared with a query embedding.
+        """
+        self.index_store = index_store
+        self.max_candidates = max_candidates
+        self.entity_indexes = {}
+
+        # Metrics (searches run concurrently in the threadpool)
+        self.stats_lock = threading.Lock()
+        self.queries = 0
+        self.entity_queries = 0
+        self.fallbacks = 0
+        self.completed = 0
+        self.candidates = 0
+
+    def load(self, connector, topics: list):
+        """
+        Build the entity index of each topic from the MENTIONS relationships stored in Neo4j.
+        """
+        from services.topic_extraction import filter_entities
+
+        for topic in topics:
+            topic_index = self.index_store.indexes.get(topic)
+            if topic_index is None:
+                continue
+            mentions = [
+                {**mention, "entities": filter_entities(mention["entities"])}
+                for mention in connector.LLM_get_entity_mentions_by_topic(topic)
+            ]
+            self.entity_indexes[topic] = EntityIndex(topic_index.rows, mentions, self.index_store.embeddings(topic))
+
+    def reload(self, connector, topics: list) -> list:
+        """
+        Reload the topic indexes rewritten on disk (see TopicIndexStore.reload) and rebuild their
+        entity indexes, which point to positions in the topic indexes.
+
+        Returns:
+            list: The reloaded topics.
+        """
+        changed = self.index_store.reload(connector, topics)
+        self.load(connector, changed)
+        return changed
+
+    def embed(self, texts: list) -> np.ndarray:
+        """
+        Embed a list of texts with the sentence encoder as a float32 matrix.
+        """
+        return self.index_store.embed(texts)
+
+    def search(self, topic: str, query_embedding: np.ndarray, k: int = 10, entities: list = None):
+        """
+        Return k tweets of a topic for a single query: the closest of those sharing its entities,
+        completed by the closest of the topic.
+
+        Args:
+            topic (str): The topic of the returned tweets.
+            query_embedding (np.ndarray): Embedding of shape (dimension,) or (1, dimension).
+            k (int): Number of tweets to return.
+            entities (list): (entity text, label) tuples of the query.
+
+        Returns:
+            list: Dictionaries with text, author and distance, entity matches first.
+        """
+        return self.search_batch(topic, np.atleast_2d(query_embedding), k, [entities or []])[0]
+
+    def search_batch(self, topic: str, query_embeddings: np.ndarray, k: int = 10, entities: list = None):
+        """
+        Search several queries of a topic. The fallback searches run as one matrix query.
+
+        Args:
+            topic (str): The topic of the returned tweets.
+            query_embeddings (np.ndarray): Matrix of shape (n_queries, dimension).
+            k (int): Number of tweets to return per query.
+            entities (list): For each query, its (entity text, label) tuples.
+
+        Returns:
+            list: For each query, the dictionaries with text, author and distance, entity matches first.
+
+        Raises:
+            ValueError: If `entities` does not have one entry per query.
+        """
+        query_embeddings = np.asarray(query_embeddings, dtype="float32")
+        if entities is None:
+            entities = [[] for _ in range(len(query_embeddings))]
+        elif len(entities) != len(query_embeddings):
+            raise ValueError(f"Got entities for {len(entities)} queries, expected {len(query_embeddings)}")
+        entity_index = self.entity_indexes.get(topic)
+        results = [[] for _ in range(len(query_embeddings))]
+        pending = []
+        entity_queries = fallbacks = completed = candidate_count = 0
+
+        for i, (query, query_entities) in enumerate(zip(query_embeddings, entities)):
+            candidates = entity_index.candidates(query_entities, self.max_candidates) if entity_index and query_entities else []
+            if len(candidates) == 0:
+                fallbacks += 1
+                pending.append(i)
+                continue
+
+            entity_queries += 1
+            candidate_count += len(candidates)
+            distances = np.square(np.asarray(entity_index.embeddings[candidates], dtype="float32") - query).sum(axis=1)
+            nearest = np.argsort(distances, kind="stable")[:k]
+            results[i] = [{**entity_index.rows[candidates[j]], "distance": float(distances[j])} for j in nearest]
+            if len(results[i]) < k:
+                completed += 1
+                pending.append(i)
+
+        with self.stats_lock:
+            self.queries += len(query_embeddings)
+            self.entity_queries += entity_queries
+            self.fallbacks += fallbacks
+            self.completed += completed
+            self.candidates += candidate_count
+
+        if pending and k > 0:
+            found = self.index_store.search_batch(topic, query_embeddings[pending], k)
+            for i, hits in zip(pending, found):
+                seen = {(hit["text"], hit["author"]) for hit in results[i]}
+                results[i] += [hit for hit in hits if (hit["text"], hit["author"]) not in seen][:k - len(results[i])]
+        return results
+
+    def stats(self) -> dict:
+        with self.stats_lock:
+            return {
+                "queries": self.queries,
+                "entity_queries": self.entity_queries,
+                "fallbacks": self.fallbacks,
+                "completed": self.completed,
+                "avg_candidates": self.candidates / self.entity_queries if self.entity_queries else 0.0,
+                "max_candidates": self.max_candidates,
+            }
+
+
+def load_retriever(connector, topics: list, backend: str = RETRIEVAL_BACKEND):
+    """
+    Create the retriever of the context tweets for the configured backend.
+
+    Args:
+        connector: The Neo4jConnector (FAISS indexes are built from it when missing).
+        topics (list): The topics to load the FAISS indexes of.
+        backend (str): "faiss", "neo4j" or "hybrid".
+
+    Returns:
+        TopicIndexStore | Neo4jVectorRetriever | EntityGraphRetriever: An object with embed, search and search_batch.
+    """
+    if backend not in RETRIEVAL_BACKENDS:
+        raise ValueError(f"Unknown retrieval backend '{backend}', expected one of {RETRIEVAL_BACKENDS}")
+    if backend == "neo4j":
+        return Neo4jVectorRetriever(connector)
+
+    from services.vector_index import TopicIndexStore, INDEX_READ_ONLY
+
+    # Per-topic tweet embeddings, memory-mapped from disk (built from Neo4j on first start). API
+    # workers sharing the index files only read them.
+    index_store = TopicIndexStore(read_only=INDEX_READ_ONLY or remote_inference())
+    if remote_inference():
+        # The inference worker builds (or reindexes) the indexes once for all the API workers
+        get_client().call("build_indexes", topics)
+        index_store.load(topics)
+    else:
+        index_store.load_or_build(connector, topics)
+
+    if backend == "hybrid":
+        retriever = EntityGraphRetriever(index_store)
+        retriever.load(connector, topics)
+        return retriever
+    return index_store
+
+
+def compare_backends(retrievers: dict, queries: list, k: int = 10) -> dict:
+    """
+    Run the same queries on several retrievers: per-query latency (the /analyze path), batch
+    latency (the /analyze/batch path) and overlap of the returned (text, author) rows with the
+    first retriever.
+
+    Args:
+        retrievers (dict): Retrievers by backend name, the first one is the reference.
+        queries (list): (topic, embedding, entities) tuples.
+        k (int): Number of tweets per query.
+
+    Returns:
+        dict: Per backend, the mean/p95 latency per query, the batch latency per query and the overlap@k.
+    """
+    report = {}
+    reference = None
+    by_topic = {}
+    for position, (topic, _, _) in enumerate(queries):
+        by_topic.setdefault(topic, []).append(position)
+
+    for name, retriever in retrievers.items():
+        results, latencies = [], []
+        for topic, embedding, entities in queries:
+            start = time.perf_counter()
+            results.append(retriever.search(topic, embedding, k, entities))
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        for topic, positions in by_topic.items():
+            retriever.search_batch(topic, np.stack([queries[p][1] for p in positions]), k, [queries[p][2] for p in positions])
+        batch_ms = (time.perf_counter() - start) * 1000
+
+        rows = [{(hit["text"], hit["author"]) for hit in hits} for hits in results]
+        if reference is None:
+            reference = rows
+        report[name] = {
+            "mean_ms": round(float(np.mean(latencies)), 3),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+            "batch_ms_per_query": round(batch_ms / len(queries), 3),
+            f"overlap@{k}": round(sum(len(a & b) for a, b in zip(reference, rows)) / (len(queries) * k), 4),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    # Embed the Tweet nodes and create the vector index:  `python -m services.retrieval backfill`
+    # Compare the FAISS, Neo4j and hybrid backends:      `python -m services.retrieval compare --queries 200`
+    parser = argparse.ArgumentParser(description="Retrieval backends of the context tweets.")
+    parser.add_argument("command", choices=["backfill", "compare"])
+    parser.add_argument("--batch-size", type=int, default=EMBEDDING_BATCH_SIZE, help="Tweets embedded per transaction (backfill)")
+    parser.add_argument("--queries", type=int, default=200, help="Number of dataset tweets used as queries (compare)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--json", help="Optional path where the comparison is written as JSON")
+    args = parser.parse_args()
+
+    from neo4j_connector import Neo4jConnector
+
+    connector = Neo4jConnector()
+    try:
+        if args.command == "backfill":
+            print(f"[RETRIEVAL] {backfill_embeddings(connector.driver, batch_size=args.batch_size)} tweets embedded")
+        else:
+            import pandas as pd
+            from services.topic_evaluation import DATASET_PATH
+            from dataset import parse_entities
+            from services.topic_extraction import candidate_labels, filter_entities
+
+            df = pd.read_csv(DATASET_PATH, dtype=str, keep_default_na=False)
+            df = df[df["topic"].isin(candidate_labels)]
+            sample = df.sample(n=min(args.queries, len(df)), random_state=0)
+            embeddings = embed_texts(get_encoder(), sample["Text"].tolist())
+            entities = [filter_entities([(e["name"], e["type"]) for e in parse_entities(value)]) for value in sample["entities"]]
+            queries = list(zip(sample["topic"], embeddings, entities))
+
+            retrievers = {backend: load_retriever(connector, candidate_labels, backend) for backend in RETRIEVAL_BACKENDS}
+            report = compare_backends(retrievers, queries, args.k)
+
+            print(f"{'backend':<10}{'mean ms':>10}{'p95 ms':>10}{'batch ms/q':>12}{'overlap@' + str(args.k):>12}")
+            for name, result in report.items():
+                print(f"{name:<10}{result['mean_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['batch_ms_per_query']:>12.2f}{result[f'overlap@{args.k}']:>12.3f}")
+            if args.json:
+                with open(args.json, "w") as f:
+                    json.dump(report, f, indent=2)
+    finally:
+        connector.close()
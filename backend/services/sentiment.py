@@ -0,0 +1,47 @@
+from services.model_registry import registry
+from services.topic_extraction import entities_to_string
+
+# Same model and label mapping as the offline preprocessing notebook
+SENTIMENT_MODEL = "cardiffnlp/twitter-roberta-base-sentiment"
+
+
+def load_sentiment_classifier():
+    from transformers import pipeline
+
+    return pipeline("sentiment-analysis", model=SENTIMENT_MODEL, truncation=True, max_length=512)
+
+
+registry.register("sentiment", load_sentiment_classifier)
+
+label_map = {
+    "LABEL_0": "negative",
+    "LABEL_1": "neutral",
+    "LABEL_2": "positive"
+}
+
+
+def build_sentiment_input(text: str, entities) -> str:
+    """
+    Builds the sentiment model input: the text followed by its entities, as in the preprocessing notebook.
+    """
+    ent_str = entities_to_string(entities)
+    return f"{text} [Entities: {ent_str}]" if ent_str else text
+
+
+def classify_sentiments(texts: list, entities: list, batch_size: int = 32) -> list:
+    """
+    Classifies the sentiment of several texts in batches.
+
+    Args:
+        texts (list): The input texts.
+        entities (list): For each text, its list of (entity text, label) tuples.
+        batch_size (int): Batch size for the sentiment model.
+
+    Returns:
+        list: A (sentiment, confidence) tuple for each text, sentiment being "positive", "neutral" or "negative".
+    """
+    if not texts:
+        return []
+    inputs = [build_sentiment_input(text, ents) for text, ents in zip(texts, entities)]
+    results = registry.get("sentiment")(inputs, batch_size=batch_size)
+    return [(label_map.get(r["label"], r["label"]).lower(), float(r["score"])) for r in results]
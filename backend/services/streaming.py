@@ -0,0 +1,158 @@
+import asyncio
+import json
+import time
+
+# Streaming protocols of the NDJSON endpoints:
+# 1: every frame carries the whole text produced so far (used by the current frontend components)
+# 2: frames carry only the new text ("delta") with a sequence number, then a final summary frame
+STREAM_PROTOCOLS = (1, 2)
+
+
+class FullTextStream:
+    """
+    Protocol 1 frames: {"<field>": "<text so far>", "streaming": true}, then the final result.
+    While waiting for the LLM, frames also carry "queue_position".
+    """
+
+    def __init__(self, field: str):
+        self.field = field
+        self.text = ""
+
+    def start(self) -> str:
+        return json.dumps({self.field: "", "streaming": True}) + "\n"
+
+    def queued(self, position: int) -> str:
+        return json.dumps({self.field: self.text, "streaming": True, "queue_position": position}) + "\n"
+
+    def delta(self, chunk: str) -> str:
+        self.text += chunk
+        return json.dumps({self.field: self.text, "streaming": True}) + "\n"
+
+    def final(self, result: dict) -> str:
+        return json.dumps(result) + "\n"
+
+
+class DeltaStream:
+    """
+    Protocol 2 frames:
+        {"v": 2, "seq": 0, "type": "start"}
+        {"v": 2, "seq": n, "type": "queued", "position": <position in the LLM queue>}
+        {"v": 2, "seq": n, "type": "delta", "delta": "<new text>"}
+        {"v": 2, "seq": n, "type": "final", "frames": <delta frames sent>, "chars": <text length>, ...result}
+    The final frame carries the result fields of protocol 1 (e.g. the full text, once).
+    """
+
+    def __init__(self, field: str):
+        self.field = field
+        self.seq = 0
+        self.frames = 0
+        self.chars = 0
+
+    def _frame(self, frame_type: str, **fields) -> str:
+        frame = {"v": 2, "seq": self.seq, "type": frame_type, **fields}
+        self.seq += 1
+        return json.dumps(frame) + "\n"
+
+    def start(self) -> str:
+        return self._frame("start")
+
+    def queued(self, position: int) -> str:
+        return self._frame("queued", position=position)
+
+    def delta(self, chunk: str) -> str:
+        self.frames += 1
+        self.chars += len(chunk)
+        return self._frame("delta", delta=chunk)
+
+    def final(self, result: dict) -> str:
+        return self._frame("final", frames=self.frames, chars=self.chars, **result)
+
+
+def make_stream(protocol: int, field: str):
+    """
+    Return the frame encoder of a streaming protocol.
+
+    Args:
+        protocol (int): 1 (full text frames) or 2 (delta frames).
+        field (str): The name of the streamed text field (e.g. "explanation").
+    """
+    return DeltaStream(field) if protocol == 2 else FullTextStream(field)
+
+
+async def coalesce(chunks, max_delay_ms: float = 0, max_chars: int = 0):
+    """
+    Merge the chunks of an async text stream into bigger frames. A frame is flushed when it
+    reaches `max_chars` characters or when `max_delay_ms` has passed since its first chunk.
+    With both limits at 0 the chunks are forwarded unchanged.
+
+    Args:
+        chunks: An async iterator of text chunks.
+        max_delay_ms (float): Maximum time a chunk is held back.
+        max_chars (int): Frame size that triggers a flush.
+    """
+    if max_delay_ms <= 0 and max_chars <= 0:
+        async for chunk in chunks:
+            yield chunk
+        return
+
+    iterator = chunks.__aiter__()
+    buffer = ""
+    first_at = None
+    pending = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+
+            timeout = None
+            if buffer and max_delay_ms > 0:
+                timeout = max(0.0, first_at + max_delay_ms / 1000 - time.perf_counter())
+
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if pending in done:
+                task, pending = pending, None
+                try:
+                    chunk = task.result()
+                except StopAsyncIteration:
+                    break
+                if not buffer:
+                    first_at = time.perf_counter()
+                buffer += chunk
+                if max_chars <= 0 or len(buffer) < max_chars:
+                    if max_delay_ms <= 0 or time.perf_counter() - first_at < max_delay_ms / 1000:
+                        continue
+
+            # Size or time limit reached
+            if buffer:
+                yield buffer
+                buffer = ""
+    finally:
+        # The consumer stopped early (e.g. client disconnect): don't leave a read of the source
+        # pending, and close the source so that it releases its resources (e.g. the LLM stream)
+        if pending is not None:
+            pending.cancel()
+            try:
+                await pending
+            except (asyncio.CancelledError, StopAsyncIteration):
+                pass
+        if hasattr(iterator, "aclose"):
+            await iterator.aclose()
+
+    if buffer:
+        yield buffer
+
+
+async def replay(protocol: int, field: str, result: dict):
+    """
+    Stream a stored final result (e.g. a cache hit) with the same frames as a live answer.
+
+    Args:
+        protocol (int): The streaming protocol (1 or 2).
+        field (str): The name of the streamed text field (e.g. "explanation").
+        result (dict): The final result, containing the full text in `field`.
+    """
+    stream = make_stream(protocol, field)
+    yield stream.start()
+    if result.get(field):
+        yield stream.delta(result[field])
+    yield stream.final(result)
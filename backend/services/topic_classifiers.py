@@ -0,0 +1,117 @@
+import os
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ZERO_SHOT_MODEL = "facebook/bart-large-mnli"
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "bart-large-mnli-onnx-int8"))
+LABEL_TEMPLATE = "This tweet is about {}."
+EMBEDDING_TEMPERATURE = float(os.getenv("EMBEDDING_CLASSIFIER_TEMPERATURE", "0.05"))
+
+
+class ZeroShotTopicClassifier:
+    """
+    Zero-shot NLI classifier (BART-large-MNLI, in PyTorch or ONNX Runtime).
+    """
+
+    def __init__(self, zero_shot_pipeline, labels: list):
+        self.pipeline = zero_shot_pipeline
+        self.labels = labels
+
+    def classify(self, inputs: list, batch_size: int = 1) -> list:
+        """
+        Classify several inputs.
+
+        Args:
+            inputs (list): The classifier input texts.
+            batch_size (int): Number of texts per forward pass.
+
+        Returns:
+            list: A (label, score) tuple for each input.
+        """
+        # The zero-shot pipeline scores one (text, label) pair per sequence
+        results = self.pipeline(inputs, self.labels, multi_label=False, batch_size=batch_size * len(self.labels))
+        if isinstance(results, dict):
+            results = [results]
+        return [(r["labels"][0], float(r["scores"][0])) for r in results]
+
+
+class EmbeddingTopicClassifier:
+    """
+    Cheap classifier scoring the input embedding against precomputed label embeddings
+    (cosine similarity, turned into a confidence with a softmax).
+    """
+
+    def __init__(self, encoder, labels: list, template: str = LABEL_TEMPLATE, temperature: float = EMBEDDING_TEMPERATURE):
+        self.encoder = encoder
+        self.labels = labels
+        self.temperature = temperature
+        self.label_embeddings = encoder.encode([template.format(label) for label in labels], convert_to_numpy=True, normalize_embeddings=True)
+
+    def classify(self, inputs: list, batch_size: int = 32) -> list:
+        """
+        Classify several inputs.
+
+        Args:
+            inputs (list): The classifier input texts.
+            batch_size (int): Encoder batch size.
+
+        Returns:
+            list: A (label, score) tuple for each input.
+        """
+        embeddings = self.encoder.encode(inputs, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True)
+        logits = embeddings @ self.label_embeddings.T / self.temperature
+        probabilities = np.exp(logits - logits.max(axis=1, keepdims=True))
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        best = probabilities.argmax(axis=1)
+        return [(self.labels[i], float(p[i])) for i, p in zip(best, probabilities)]
+
+
+def load_bart_classifier(labels: list):
+    from transformers import pipeline
+
+    return ZeroShotTopicClassifier(pipeline("zero-shot-classification", model=ZERO_SHOT_MODEL), labels)
+
+
+def export_onnx_model(model_dir: str = ONNX_MODEL_DIR):
+    """
+    Export BART-large-MNLI to ONNX and quantize its weights to int8 (dynamic quantization).
+    """
+    from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    export_dir = model_dir + "-fp32"
+    ORTModelForSequenceClassification.from_pretrained(ZERO_SHOT_MODEL, export=True).save_pretrained(export_dir)
+    AutoTokenizer.from_pretrained(ZERO_SHOT_MODEL).save_pretrained(model_dir)
+
+    quantizer = ORTQuantizer.from_pretrained(export_dir)
+    quantizer.quantize(save_dir=model_dir, quantization_config=AutoQuantizationConfig.avx2(is_static=False, per_channel=False))
+    print(f"[TOPIC] Exported int8 ONNX model to {model_dir}")
+
+
+def load_onnx_classifier(labels: list):
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+    from transformers import AutoTokenizer, pipeline
+
+    if not os.path.exists(ONNX_MODEL_DIR):
+        export_onnx_model(ONNX_MODEL_DIR)
+
+    model = ORTModelForSequenceClassification.from_pretrained(ONNX_MODEL_DIR, file_name="model_quantized.onnx")
+    tokenizer = AutoTokenizer.from_pretrained(ONNX_MODEL_DIR)
+    return ZeroShotTopicClassifier(pipeline("zero-shot-classification", model=model, tokenizer=tokenizer), labels)
+
+
+def load_embedding_classifier(labels: list):
+    from services.tweet_analysis_generation import get_encoder
+
+    return EmbeddingTopicClassifier(get_encoder(), labels)
+
+
+# Topic classifier backends, selected with TOPIC_CLASSIFIER_BACKEND
+TOPIC_CLASSIFIERS = {
+    "bart": load_bart_classifier,
+    "onnx": load_onnx_classifier,
+    "embedding": load_embedding_classifier,
+}
@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import time
+import pandas as pd
+
+from dataset import parse_entities
+from services.topic_classifiers import TOPIC_CLASSIFIERS
+from services.topic_extraction import candidate_labels, build_topic_input
+
+DATASET_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "utils", "dataset.csv")
+
+
+def evaluate_backend(name: str, df: pd.DataFrame, batch_size: int = 16) -> dict:
+    """
+    Classify the dataset tweets with a classifier backend and compare with the stored topics.
+
+    The dataset topics were produced offline by BART-large-MNLI on the tweet text and its
+    entities, so the agreement measures how close a backend stays to the reference labels.
+    Part of the dataset is labelled with topics that are no longer candidate labels (e.g.
+    technology, space): no backend can predict them, so these rows are left out and counted.
+
+    Args:
+        name (str): The backend name (see TOPIC_CLASSIFIERS).
+        df (pd.DataFrame): Dataset rows with Text, entities and topic columns.
+        batch_size (int): Number of tweets classified per call.
+
+    Returns:
+        dict: Agreement, per-label recall, load time, mean CPU time per tweet and the number of
+            rows skipped for their topic.
+    """
+    skipped = int((~df["topic"].isin(candidate_labels)).sum())
+    df = df[df["topic"].isin(candidate_labels)]
+
+    start = time.perf_counter()
+    classifier = TOPIC_CLASSIFIERS[name](candidate_labels)
+    load_time = time.perf_counter() - start
+
+    inputs = [
+        build_topic_input(text, [(e["name"], e["type"]) for e in parse_entities(entities)])
+        for text, entities in zip(df["Text"], df["entities"])
+    ]
+
+    start = time.perf_counter()
+    predictions = []
+    for batch_start in range(0, len(inputs), batch_size):
+        predictions.extend(label for label, _ in classifier.classify(inputs[batch_start:batch_start + batch_size], batch_size))
+    elapsed = time.perf_counter() - start
+
+    expected = df["topic"].tolist()
+    per_label = {}
+    for label in candidate_labels:
+        indices = [i for i, topic in enumerate(expected) if topic == label]
+        if indices:
+            per_label[label] = sum(predictions[i] == label for i in indices) / len(indices)
+
+    return {
+        "backend": name,
+        "tweets": len(inputs),
+        "skipped_tweets": skipped,
+        "agreement": sum(p == e for p, e in zip(predictions, expected)) / len(inputs),
+        "per_label_recall": per_label,
+        "load_time_s": load_time,
+        "ms_per_tweet": 1000 * elapsed / len(inputs),
+    }
+
+
+if __name__ == "__main__":
+    # Example: `python -m services.topic_evaluation --backends bart,onnx,embedding --limit 500`
+    parser = argparse.ArgumentParser(description="Compare the topic classifier backends against the labels in dataset.csv.")
+    parser.add_argument("--backends", default=",".join(TOPIC_CLASSIFIERS), help="Comma separated backends to evaluate")
+    parser.add_argument("--dataset", default=DATASET_PATH, help="Dataset CSV with Text, entities and topic columns")
+    parser.add_argument("--limit", type=int, default=500, help="Number of tweets sampled from the dataset")
+    parser.add_argument("--batch-size", type=int, default=16, help="Tweets classified per call")
+    parser.add_argument("--json", help="Optional path where the report is written as JSON")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.dataset, dtype=str, keep_default_na=False)
+    df = df.sample(n=min(args.limit, len(df)), random_state=0)
+
+    reports = [evaluate_backend(name, df, args.batch_size) for name in args.backends.split(",")]
+
+    print(f"{'backend':<12}{'agreement':>11}{'ms/tweet':>11}{'load (s)':>10}")
+    print(f"{reports[0]['skipped_tweets']} sampled tweets have a topic outside the candidate labels and were skipped")
+    for report in reports:
+        print(f"{report['backend']:<12}{report['agreement']:>11.2%}{report['ms_per_tweet']:>11.1f}{report['load_time_s']:>10.1f}")
+        for label, recall in report["per_label_recall"].items():
+            print(f"    {label:<16}{recall:>8.2%}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
@@ -1,14 +1,52 @@
-from transformers import pipeline
 import pandas as pd
-from collections import Counter
-import spacy
+from collections import Counter, OrderedDict
+import os
+import threading
+from dotenv import load_dotenv
 
+from services.batching import MicroBatcher
+from services.inference_client import get_client, remote_inference, remote_loader
+from services.metrics import metrics
+from services.model_registry import registry
+from services.topic_classifiers import TOPIC_CLASSIFIERS
 
-nlp = spacy.load("en_core_web_trf")
-classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
+load_dotenv()
 
 candidate_labels = ["politics", "climate change", "USA", "health", "family", "business", "finance"]
 
+# "bart" (default), "onnx" (int8 quantized BART) or "embedding" (MiniLM label similarity)
+TOPIC_CLASSIFIER_BACKEND = os.getenv("TOPIC_CLASSIFIER_BACKEND", "bart")
+
+# spaCy pipeline used for NER only: the components the entity recognizer doesn't need are not
+# loaded. SPACY_MODEL=en_core_web_sm is a much lighter (less accurate) option on CPU.
+SPACY_MODEL = os.getenv("SPACY_MODEL", "en_core_web_trf")
+SPACY_EXCLUDE = [name for name in os.getenv("SPACY_EXCLUDE", "tagger,parser,attribute_ruler,lemmatizer,senter,morphologizer").split(",") if name]
+TEXT_FEATURES_CACHE_SIZE = int(os.getenv("TEXT_FEATURES_CACHE_SIZE", "4096"))
+
+
+def load_nlp(model: str = SPACY_MODEL, exclude: list = SPACY_EXCLUDE):
+    import spacy
+
+    return spacy.load(model, exclude=exclude)
+
+
+# spaCy pipeline and topic classifier, loaded on first use or by the warmup task (in the
+# inference worker with INFERENCE_MODE=remote: the registry then only tracks their readiness)
+if remote_inference():
+    registry.register("nlp", remote_loader("nlp"))
+    registry.register("topic_classifier", remote_loader("topic_classifier"))
+else:
+    registry.register("nlp", load_nlp, warmup=lambda nlp: nlp("Warmup sentence from Washington."))
+    registry.register("topic_classifier", lambda: TOPIC_CLASSIFIERS[TOPIC_CLASSIFIER_BACKEND](candidate_labels), warmup=lambda c: c.classify(["warmup"]))
+
+
+def get_nlp():
+    return registry.get("nlp")
+
+
+def get_topic_classifier():
+    return registry.get("topic_classifier")
+
 
 def extract_entities(text: str):
     """
@@ -20,7 +58,7 @@ def extract_entities(text: str):
     Returns:
         list: A list of tuples, each containing the entity text and its label.
     """
-    return [(ent.text, ent.label_) for ent in nlp(text).ents]
+    return [(ent.text, ent.label_) for ent in get_nlp()(text).ents]
 
 
 def filter_entities(entities):
@@ -30,13 +68,139 @@ def filter_entities(entities):
 def entities_to_string(entities):
     return " ".join(ent for ent, _ in entities)
 
-def classify_topic(text: str) -> tuple[str, float]:
+def extract_entities_batch(texts: list, batch_size: int = 32, n_process: int = 1):
+    """
+    Extracts named entities from several texts with a single `nlp.pipe` pass.
+
+    Args:
+        texts (list): The input texts.
+        batch_size (int): Number of texts processed together by spaCy.
+        n_process (int): Number of worker processes used by spaCy (offline enrichment).
+
+    Returns:
+        list: For each text, a list of (entity text, label) tuples.
+    """
+    docs = get_nlp().pipe(texts, batch_size=batch_size, n_process=n_process)
+    return [[(ent.text, ent.label_) for ent in doc.ents] for doc in docs]
+
+
+class TextFeatures:
+    """
+    NLP output of a text computed once and shared by the topic and sentiment stages: its
+    filtered entities and their string form.
+    """
+
+    __slots__ = ("text", "entities", "entity_string")
+
+    def __init__(self, text: str, entities: list):
+        self.text = text
+        self.entities = entities
+        self.entity_string = entities_to_string(entities)
+
+    @property
+    def topic_input(self) -> str:
+        return build_topic_input(self.text, self.entities)
+
+
+_features_cache = OrderedDict()
+_features_lock = threading.Lock()
+
+
+def text_features(texts: list, batch_size: int = 32) -> list:
+    """
+    Return the TextFeatures of several texts. Texts seen recently (repeated or retried requests)
+    come from an LRU cache; the others go through a single `nlp.pipe` pass.
+
+    Args:
+        texts (list): The input texts.
+        batch_size (int): Number of texts processed together by spaCy.
+
+    Returns:
+        list: A TextFeatures for each text, in input order.
+    """
+    with _features_lock:
+        known = {text: _features_cache[text] for text in texts if text in _features_cache}
+        for text in known:
+            _features_cache.move_to_end(text)
+    missing = list(dict.fromkeys(text for text in texts if text not in known))
+    metrics.inc("text_features_cache", len(known), result="hit")
+    metrics.inc("text_features_cache", len(missing), result="miss")
+
+    if missing:
+        with metrics.stage("ner"):
+            entities = extract_entities_batch(missing, batch_size)
+        computed = [TextFeatures(text, filter_entities(ents)) for text, ents in zip(missing, entities)]
+        with _features_lock:
+            for features in computed:
+                known[features.text] = _features_cache[features.text] = features
+            while len(_features_cache) > TEXT_FEATURES_CACHE_SIZE:
+                _features_cache.popitem(last=False)
+    return [known[text] for text in texts]
+
+
+def query_entities(texts: list) -> list:
+    """
+    Return the filtered entities of several texts (for the entity-graph retrieval). Texts that were
+    just classified come from the text features cache.
+
+    Args:
+        texts (list): The input texts.
+
+    Returns:
+        list: For each text, a list of (entity text, label) tuples.
     """
-    Classifies the topic of a given text using zero-shot classification.
+    if remote_inference():
+        return get_client().call("entities", list(texts))
+    return [features.entities for features in text_features(texts)]
+
+
+def build_topic_input(text: str, entities) -> str:
+    """
+    Builds the zero-shot classifier input: the text followed by its (filtered) entities.
     """
-    entities = filter_entities(extract_entities(text))
     ent_str = entities_to_string(entities)
-    input_text = f"{text} - {ent_str}" if ent_str else text
+    return f"{text} - {ent_str}" if ent_str else text
+
+
+def classify_topic(text: str) -> tuple[str, float]:
+    """
+    Classifies the topic of a given text with the configured classifier backend.
+    """
+    if remote_inference():
+        return get_client().call("classify_topics", [text])[0]
+    topic_input = text_features([text])[0].topic_input
+    with metrics.stage("topic_classification"):
+        return get_topic_classifier().classify([topic_input])[0]
+
+
+def classify_topics(texts: list, batch_size: int = 32) -> list:
+    """
+    Classifies the topics of several texts, running spaCy and the zero-shot classifier in batches.
+
+    Args:
+        texts (list): The input texts.
+        batch_size (int): Batch size for spaCy and the classifier.
+
+    Returns:
+        list: A (topic, confidence) tuple for each text, in input order.
+    """
+    if not texts:
+        return []
+    if remote_inference():
+        return get_client().call("classify_topics", list(texts), batch_size)
+    inputs = [features.topic_input for features in text_features(texts, batch_size)]
+
+    with metrics.stage("topic_classification"):
+        return get_topic_classifier().classify(inputs, batch_size)
+
+
+# Dynamic batching of the online requests (see classify_topics)
+TOPIC_BATCH_MAX_SIZE = int(os.getenv("TOPIC_BATCH_MAX_SIZE", "16"))
+TOPIC_BATCH_MAX_WAIT_MS = float(os.getenv("TOPIC_BATCH_MAX_WAIT_MS", "10"))
 
-    result = classifier(input_text, candidate_labels, multi_label=False)
-    return result["labels"][0], float(result["scores"][0])
+topic_batcher = MicroBatcher(
+    lambda texts: classify_topics(texts, batch_size=len(texts)),
+    max_batch_size=TOPIC_BATCH_MAX_SIZE,
+    max_wait_ms=TOPIC_BATCH_MAX_WAIT_MS,
+    name="topic_classifier",
+)
@@ -1,13 +1,165 @@
-from sentence_transformers import SentenceTransformer
-import faiss
-import pandas as pd
+import httpx
+import logging
 import openai
+import os
+import time
 import collections.abc 
+from dotenv import load_dotenv
+
+from services.inference_client import remote_inference, remote_loader
+from services.metrics import metrics
+from services.model_registry import registry
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+ENCODER_MODEL = "all-MiniLM-L6-v2"
+
+
+def load_encoder():
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(ENCODER_MODEL)
+
+
+# Sentence encoder, loaded on first use or by the warmup task (in the inference worker with INFERENCE_MODE=remote)
+registry.register("encoder", remote_loader("encoder") if remote_inference() else load_encoder, warmup=lambda model: model.encode(["warmup"]))
+
+
+def get_encoder():
+    """
+    Return the sentence encoder used for retrieval (loaded on first use).
+    """
+    return registry.get("encoder")
+
+# LM Studio client initialization: one asynchronous client shared by all the requests, with a
+# bounded pool of keep-alive connections so concurrent streams don't block the event loop
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "http://localhost:1234/v1")
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "8"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+LLM_MODEL = os.getenv("LLM_MODEL", "local-model")  # Model name sent to LM Studio (using meta-llama-3.1-8b-instruct)
+
+http_client = httpx.AsyncClient(
+    limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS),
+    timeout=httpx.Timeout(LLM_TIMEOUT, connect=5.0),
+)
+client = openai.AsyncOpenAI(base_url=LLM_BASE_URL, api_key="lm-studio", http_client=http_client)
+
+
+def build_attribution_prompt(tweet: str, context_tweets: list) -> str:
+    """
+    Build the author attribution prompt of a tweet from its retrieved context tweets.
+
+    Args:
+        tweet (str): The tweet to attribute.
+        context_tweets (list): Dictionaries with the "text" and "author" of similar tweets.
+
+    Returns:
+        str: The user prompt sent to the LLM.
+    """
+    # Prepare context tweets with authors
+    context_tweets_with_authors = []
+    for context_tweet in context_tweets:
+        context_tweets_with_authors.append(f'- "{context_tweet["text"]}" (Author: {context_tweet["author"]})')
+    
+    context_str = "\n".join(context_tweets_with_authors)
+    logger.debug("Context tweets for LLM:\n%s", context_str)
+    
+    return f"""I will provide you with a list of tweets.
+
+Tweets:
+{context_str}
+
+Now, consider this new tweet:
+
+"{tweet}"
+Question: Could this tweet have been written by Obama, Musk or neither?
+Answer and give a brief explanation."""
+
+
+def attribution_result(explanation: str, topic: str, confidence: float) -> dict:
+    """
+    Build the final attribution result from the full LLM explanation.
+
+    Args:
+        explanation (str): The LLM answer.
+        topic (str): The topic of the tweet.
+        confidence (float): The topic classifier confidence (0-1).
+
+    Returns:
+        dict: The final result sent to the client.
+    """
+    response_lower = explanation.lower()
+    if "obama" in response_lower:
+        final_predicted_author = "Obama"
+    elif "musk" in response_lower or "elon" in response_lower:
+        final_predicted_author = "Musk"
+    else:
+        final_predicted_author = "neither" # Default if no author found
+
+    return {
+        "predicted_author": final_predicted_author,
+        "explanation": explanation,
+        "confidence": 100.0, 
+        "topic": topic,
+        "topic_confidence": round(confidence * 100, 2),
+        "streaming": False # States that streaming is done
+    }
+
+
+def attribution_error(message: str, topic: str, confidence: float) -> dict:
+    """
+    Build the final result of an attribution that failed.
+    """
+    return {
+        "predicted_author": "ERROR",
+        "explanation": message,
+        "confidence": 0.0,
+        "topic": topic,
+        "topic_confidence": round(confidence * 100, 2),
+        "streaming": False # End streaming
+    }
+
+
+async def close_llm_client():
+    """
+    Close the shared LM Studio client and its connection pool.
+    """
+    await client.close()
+
+class LLMError(RuntimeError):
+    """
+    The LLM call failed (LM Studio unreachable or an unexpected error). The message is the one
+    shown to the user.
+    """
+
+
+async def stream_completion(**params):
+    """
+    Stream the text chunks of a chat completion, recording the time to the first token
+    (llm_ttft stage) and the duration of the whole stream (llm_stream stage).
+
+    Args:
+        **params: Arguments of `chat.completions.create` (model, messages, temperature, ...).
+    """
+    start = time.perf_counter()
+    first = True
+    completion = None
+    try:
+        completion = await client.chat.completions.create(**params, stream=True)
+        async for chunk in completion:
+            if chunk.choices and chunk.choices[0].delta.content:
+                if first:
+                    metrics.observe("stage_seconds", time.perf_counter() - start, stage="llm_ttft")
+                    first = False
+                yield chunk.choices[0].delta.content
+    finally:
+        # Release the HTTP response when the consumer stops early (client disconnect, stream cancelled)
+        if completion is not None:
+            await completion.close()
+        metrics.observe("stage_seconds", time.perf_counter() - start, stage="llm_stream")
 
-# Zero-shot classification and encoder initialization
-encoder = SentenceTransformer("all-MiniLM-L6-v2")
-# LM Studio client initialization
-client = openai.OpenAI(base_url="http://localhost:1234/v1", api_key="lm-studio")
 
 async def stream_llm_response(prompt: str):
     """
@@ -17,29 +169,30 @@ async def stream_llm_response(prompt: str):
         prompt (str): The prompt to send to the LLM for generating a response.
 
     Returns:
-        collections.abc.Generator[str, None, None]: A generator yielding chunks of the LLM's response.
+        collections.abc.AsyncGenerator[str, None]: An async generator yielding chunks of the LLM's response.
+
+    Raises:
+        LLMError: If the LLM call fails.
     """
     try:
-        completion = client.chat.completions.create(
-            model="local-model", # Local model name (using meta-llama-3.1-8b-instruct)
+        async for text in stream_completion(
+            model=LLM_MODEL,
             messages=[
                 {"role": "system", "content": "You are an expert in tweet author attribution. Provide concise and accurate explanations based on the context."},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.1, # Making the model more deterministic
             max_tokens=200,
-            stream=True, # Enable streaming
-        )
-
-        for chunk in completion:
-            if chunk.choices and chunk.choices[0].delta.content:
-                yield chunk.choices[0].delta.content
+        ):
+            yield text
     except openai.APIConnectionError as e:
-        print(f"ERROR: Could not connect to LM Studio API. Is LM Studio running and the server started? {e}")
-        yield "ERROR: LLM API connection failed."
+        metrics.inc("llm_errors", error="connection")
+        logger.error("Could not connect to LM Studio API. Is LM Studio running and the server started? %s", e)
+        raise LLMError("ERROR: LLM API connection failed.") from e
     except Exception as e:
-        print(f"An unexpected error occurred during LLM inference: {e}")
-        yield f"ERROR: An unexpected error occurred: {e}"
+        metrics.inc("llm_errors", error="unexpected")
+        logger.exception("An unexpected error occurred during LLM inference: %s", e)
+        raise LLMError(f"ERROR: An unexpected error occurred: {e}") from e
         
         
 async def stream_llm_generation(system_prompt: str, user_prompt: str):
@@ -51,26 +204,27 @@ async def stream_llm_generation(system_prompt: str, user_prompt: str):
         user_prompt (str): The user-level prompt for the LLM.
 
     Returns:
-        collections.abc.Generator[str, None, None]: A generator yielding chunks of the LLM's response.
+        collections.abc.AsyncGenerator[str, None]: An async generator yielding chunks of the LLM's response.
+
+    Raises:
+        LLMError: If the LLM call fails.
     """
     try:
-        completion = client.chat.completions.create(
-            model="local-model", # Local model name (using meta-llama-3.1-8b-instruct)
+        async for text in stream_completion(
+            model=LLM_MODEL,
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
             temperature=0.7, # Making the model less deterministic
             max_tokens=200, 
-            stream=True, # Enable streaming
-        )
-
-        for chunk in completion:
-            if chunk.choices and chunk.choices[0].delta.content:
-                yield chunk.choices[0].delta.content
+        ):
+            yield text
     except openai.APIConnectionError as e:
-        print(f"ERROR: Could not connect to LM Studio API for generation. Is LM Studio running and the server started? {e}")
-        yield "ERROR: LLM API connection failed."
+        metrics.inc("llm_errors", error="connection")
+        logger.error("Could not connect to LM Studio API for generation. Is LM Studio running and the server started? %s", e)
+        raise LLMError("ERROR: LLM API connection failed.") from e
     except Exception as e:
-        print(f"An unexpected error occurred during LLM generation: {e}")
-        yield f"ERROR: An unexpected error occurred: {e}"
\ No newline at end of file
+        metrics.inc("llm_errors", error="unexpected")
+        logger.exception("An unexpected error occurred during LLM generation: %s", e)
+        raise LLMError(f"ERROR: An unexpected error occurred: {e}") from e
\ No newline at end of file
@@ -0,0 +1,524 @@
+import argparse
+import json
+import logging
+import os
+import re
+import time
+
+import faiss
+import numpy as np
+from dotenv import load_dotenv
+
+from services.tweet_analysis_generation import get_encoder
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "indexes"))
+
+# Index type ("flat", "hnsw" or "ivfpq") and its build/search parameters
+INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "flat")
+INDEX_PARAMS = {
+    "hnsw_m": int(os.getenv("HNSW_M", "32")),
+    "hnsw_ef_construction": int(os.getenv("HNSW_EF_CONSTRUCTION", "200")),
+    "hnsw_ef_search": int(os.getenv("HNSW_EF_SEARCH", "64")),
+    "ivf_nlist": int(os.getenv("IVF_NLIST", "0")),  # 0 = derived from the number of vectors
+    "ivf_nprobe": int(os.getenv("IVF_NPROBE", "8")),
+    "pq_m": int(os.getenv("PQ_M", "48")),
+    "pq_nbits": int(os.getenv("PQ_NBITS", "8")),
+}
+INDEX_TYPES = ["flat", "hnsw", "ivfpq"]
+# Flat indexes are searched directly on the memory-mapped embeddings file: the backend processes
+# share its pages instead of each holding a copy (FAISS reads flat indexes fully into memory)
+INDEX_MMAP_FLAT = os.getenv("VECTOR_INDEX_MMAP_FLAT", "1") == "1"
+FLAT_FOURCC = b"IxF2"  # Header of a serialized IndexFlatL2
+# Backend workers started together (uvicorn --workers N) only read the saved indexes, built
+# beforehand with `python -m services.vector_index build` (or by the inference worker)
+INDEX_READ_ONLY = os.getenv("VECTOR_INDEX_READ_ONLY", "0") == "1"
+
+
+def ivf_nlist(n: int, params: dict = INDEX_PARAMS) -> int:
+    """
+    Return the number of IVF lists for n vectors (IVF_NLIST, or derived from n when it is 0).
+    """
+    return params["ivf_nlist"] or max(1, int(4 * np.sqrt(n)))
+
+
+def effective_index_type(index_type: str, n: int, dimension: int, params: dict = INDEX_PARAMS) -> str:
+    """
+    Return the type of the index that `create_index` builds for n vectors: IVF-PQ falls back to
+    flat when there are too few vectors to train it or when PQ_M does not divide the dimension.
+    """
+    if index_type == "ivfpq" and (dimension % params["pq_m"] != 0 or n < max(39 * ivf_nlist(n, params), 2 ** params["pq_nbits"])):
+        return "flat"
+    return index_type
+
+
+def create_index(index_type: str, embeddings: np.ndarray, params: dict = INDEX_PARAMS):
+    """
+    Create and fill a FAISS index of the requested type.
+
+    IVF-PQ needs enough vectors to train its coarse quantizer and codebooks: topics that are
+    too small for it fall back to an exact flat index.
+
+    Args:
+        index_type (str): "flat", "hnsw" or "ivfpq".
+        embeddings (np.ndarray): float32 matrix of shape (n, dimension).
+        params (dict): Build and search parameters (see INDEX_PARAMS).
+
+    Returns:
+        faiss.Index: The populated index, configured for search.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}")
+
+    n, dimension = embeddings.shape
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, params["hnsw_m"])
+        index.hnsw.efConstruction = params["hnsw_ef_construction"]
+    elif index_type == "ivfpq":
+        if effective_index_type(index_type, n, dimension, params) == "flat":
+            logger.warning("Not enough vectors (%d) to train IVF-PQ, using a flat index", n)
+            index = faiss.IndexFlatL2(dimension)
+        else:
+            quantizer = faiss.IndexFlatL2(dimension)
+            index = faiss.IndexIVFPQ(quantizer, dimension, ivf_nlist(n, params), params["pq_m"], params["pq_nbits"])
+            index.train(embeddings)
+    else:
+        index = faiss.IndexFlatL2(dimension)
+
+    index.add(embeddings)
+    configure_search(index, params)
+    return index
+
+
+def configure_search(index, params: dict = INDEX_PARAMS):
+    """
+    Apply the search-time parameters (efSearch for HNSW, nprobe for IVF) to an index.
+    """
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = params["hnsw_ef_search"]
+    elif isinstance(index, faiss.IndexIVF):
+        index.nprobe = params["ivf_nprobe"]
+
+
+def index_kind(index) -> str:
+    """
+    Return the index type name ("flat", "hnsw" or "ivfpq") of a FAISS index.
+    """
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivfpq"
+    return "flat"
+
+
+def read_index_mmap(path: str):
+    """
+    Read a FAISS index memory-mapped from disk, falling back to a regular read for the
+    index types that the installed FAISS version cannot map.
+    """
+    try:
+        return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        return faiss.read_index(path)
+
+
+def is_flat_index_file(path: str) -> bool:
+    """
+    Return True if a saved FAISS index is an IndexFlatL2, without reading it.
+    """
+    with open(path, "rb") as f:
+        return f.read(4) == FLAT_FOURCC
+
+
+class MappedFlatIndex:
+    """
+    Exact L2 search over a read-only, memory-mapped embeddings matrix, with the `ntotal` and
+    `search` interface of a FAISS flat index. Only the squared norms of the vectors (4 bytes per
+    tweet) are private to the process.
+    """
+
+    def __init__(self, embeddings: np.ndarray):
+        self.embeddings = embeddings
+        self.ntotal, self.d = embeddings.shape
+        self.norms = np.einsum("ij,ij->i", embeddings, embeddings)
+
+    def search(self, queries: np.ndarray, k: int):
+        """
+        Return the (distances, indices) matrices of the k nearest vectors of each query, closest first.
+        """
+        distances = self.norms[None, :] - 2 * (queries @ self.embeddings.T) + np.einsum("ij,ij->i", queries, queries)[:, None]
+        np.maximum(distances, 0, out=distances)
+        nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        nearest_distances = np.take_along_axis(distances, nearest, axis=1)
+        order = np.argsort(nearest_distances, axis=1, kind="stable")
+        return np.take_along_axis(nearest_distances, order, axis=1), np.take_along_axis(nearest, order, axis=1)
+
+
+def topic_slug(topic: str) -> str:
+    """
+    Convert a topic label into a file-system friendly name (e.g. "climate change" -> "climate_change").
+    """
+    return re.sub(r"[^a-z0-9]+", "_", topic.lower()).strip("_")
+
+
+class TopicIndex:
+    """
+    FAISS index over the tweets of a single topic, together with the (text, author) rows it points to.
+    """
+
+    def __init__(self, topic: str, index, rows: list):
+        self.topic = topic
+        self.index = index
+        self.rows = rows
+
+    def search(self, query_embeddings: np.ndarray, k: int):
+        """
+        Run a k-NN search on the index.
+
+        Args:
+            query_embeddings (np.ndarray): Matrix of shape (n_queries, dimension).
+            k (int): Number of neighbours to return for each query.
+
+        Returns:
+            list: For each query, a list of dictionaries with text, author and distance.
+        """
+        k = min(k, self.index.ntotal)
+        if k == 0:
+            return [[] for _ in range(len(query_embeddings))]
+
+        distances, indices = self.index.search(np.ascontiguousarray(query_embeddings, dtype="float32"), k)
+        results = []
+        for row_distances, row_indices in zip(distances, indices):
+            results.append([
+                {**self.rows[idx], "distance": float(dist)}
+                for dist, idx in zip(row_distances, row_indices)
+                if idx != -1
+            ])
+        return results
+
+
+class TopicIndexStore:
+    """
+    Keeps one persistent FAISS index per topic. Tweets are embedded once (at build time or
+    incrementally through `add`), written to disk and memory-mapped when the backend starts.
+    """
+
+    def __init__(self, encoder=None, index_dir: str = INDEX_DIR, index_type: str = INDEX_TYPE, params: dict = INDEX_PARAMS,
+                 mmap_flat: bool = INDEX_MMAP_FLAT, read_only: bool = False):
+        self._encoder = encoder
+        self.index_dir = index_dir
+        self.index_type = index_type
+        self.params = params
+        self.mmap_flat = mmap_flat
+        self.read_only = read_only  # Never write the index files (no build or reindex)
+        self.indexes = {}
+        self.file_versions = {}  # topic -> modification times of the loaded files
+
+    @property
+    def encoder(self):
+        # Shared sentence encoder from the model registry unless a specific one was given
+        return self._encoder if self._encoder is not None else get_encoder()
+
+    def _paths(self, topic: str):
+        slug = topic_slug(topic)
+        return (
+            os.path.join(self.index_dir, f"{slug}.faiss"),
+            os.path.join(self.index_dir, f"{slug}.json"),
+            os.path.join(self.index_dir, f"{slug}.npy"),
+        )
+
+    def _file_version(self, topic: str) -> tuple:
+        return tuple(os.stat(path).st_mtime_ns for path in self._paths(topic))
+
+    def exists(self, topic: str) -> bool:
+        """
+        Return True if the index of a topic is saved on disk.
+        """
+        return all(os.path.exists(path) for path in self._paths(topic))
+
+    def embeddings(self, topic: str) -> np.ndarray:
+        """
+        Return the saved (memory-mapped) embeddings of a topic, in the same order as its rows.
+        """
+        embeddings_path = self._paths(topic)[2]
+        return np.load(embeddings_path, mmap_mode="r")
+
+    def embed(self, texts: list) -> np.ndarray:
+        """
+        Embed a list of texts with the sentence encoder as a float32 matrix.
+        """
+        return np.asarray(self.encoder.encode(texts, convert_to_numpy=True), dtype="float32")
+
+    def build_topic(self, topic: str, tweets: list):
+        """
+        Embed all the tweets of a topic and (re)write its index to disk.
+
+        Args:
+            topic (str): The topic the tweets belong to.
+            tweets (list): Dictionaries with at least the "text" and "author" keys.
+        """
+        rows = [{"text": t["text"], "author": t["author"]} for t in tweets]
+        embeddings = self.embed([r["text"] for r in rows]) if rows else np.zeros((0, self.encoder.get_sentence_embedding_dimension()), dtype="float32")
+
+        self.indexes[topic] = TopicIndex(topic, create_index(self.index_type, embeddings, self.params), rows)
+        self.save(topic, embeddings)
+        logger.info("Built index for topic '%s' (%d tweets)", topic, len(rows))
+
+    def build(self, connector, topics: list):
+        """
+        Build the indexes of all the given topics from the tweets stored in Neo4j.
+        """
+        for topic in topics:
+            self.build_topic(topic, connector.LLM_get_tweets_by_topic(topic))
+
+    def add(self, topic: str, tweets: list):
+        """
+        Incrementally embed new tweets and append them to the index of their topic.
+
+        Args:
+            topic (str): The topic the tweets belong to.
+            tweets (list): Dictionaries with at least the "text" and "author" keys.
+        """
+        if not tweets:
+            return
+        if topic not in self.indexes:
+            self.build_topic(topic, tweets)
+            return
+
+        topic_index = self.indexes[topic]
+        rows = [{"text": t["text"], "author": t["author"]} for t in tweets]
+        new_embeddings = self.embed([r["text"] for r in rows])
+        # Memory-mapped indexes are read-only: load a writable copy before appending
+        index = faiss.read_index(self._paths(topic)[0])
+        configure_search(index, self.params)
+        index.add(new_embeddings)
+        topic_index.index = index
+        topic_index.rows.extend(rows)
+        self.save(topic, np.concatenate([self.embeddings(topic), new_embeddings]))
+
+    def reindex(self, topic: str):
+        """
+        Rebuild the index of a topic with the configured index type from its saved embeddings,
+        without re-embedding the tweets.
+        """
+        embeddings = np.ascontiguousarray(self.embeddings(topic), dtype="float32")
+        self.indexes[topic].index = create_index(self.index_type, embeddings, self.params)
+        self.save(topic, embeddings)
+        logger.info("Rebuilt '%s' as %s (%d vectors)", topic, index_kind(self.indexes[topic].index), len(embeddings))
+
+    def save(self, topic: str, embeddings: np.ndarray):
+        """
+        Persist the index, its rows and the raw embeddings for a topic.
+        """
+        os.makedirs(self.index_dir, exist_ok=True)
+        index_path, rows_path, embeddings_path = self._paths(topic)
+        topic_index = self.indexes[topic]
+
+        # Temporary files are per process: backend workers reindexing the same topic at startup
+        # must not write into each other's files
+        suffix = f".{os.getpid()}.tmp"
+        faiss.write_index(topic_index.index, index_path + suffix)
+        with open(rows_path + suffix, "w", encoding="utf-8") as f:
+            json.dump(topic_index.rows, f, ensure_ascii=False)
+        with open(embeddings_path + suffix, "wb") as f:
+            np.save(f, np.asarray(embeddings, dtype="float32"))
+        os.replace(index_path + suffix, index_path)
+        os.replace(rows_path + suffix, rows_path)
+        os.replace(embeddings_path + suffix, embeddings_path)
+        self.file_versions[topic] = self._file_version(topic)
+
+    def load(self, topics: list) -> list:
+        """
+        Memory-map the saved indexes of the given topics. Indexes saved with a different type than
+        the one the configured type builds for their size are rebuilt from their saved embeddings,
+        unless the store is read-only.
+
+        Returns:
+            list: The topics for which no index was found on disk.
+        """
+        missing = []
+        for topic in topics:
+            index_path, rows_path, embeddings_path = self._paths(topic)
+            if not self.exists(topic):
+                missing.append(topic)
+                continue
+
+            if self.mmap_flat and is_flat_index_file(index_path):
+                index = MappedFlatIndex(self.embeddings(topic))
+            else:
+                index = read_index_mmap(index_path)
+                configure_search(index, self.params)
+            with open(rows_path, encoding="utf-8") as f:
+                rows = json.load(f)
+            self.indexes[topic] = TopicIndex(topic, index, rows)
+            self.file_versions[topic] = self._file_version(topic)
+
+            expected = effective_index_type(self.index_type, len(rows), index.d, self.params)
+            if index_kind(index) != expected and len(rows) > 0:
+                if self.read_only:
+                    logger.warning("Index '%s' is %s instead of %s, run the reindex command", topic, index_kind(index), expected)
+                else:
+                    self.reindex(topic)
+        return missing
+
+    def reload(self, connector, topics: list) -> list:
+        """
+        Load again the indexes rewritten on disk since they were loaded (e.g. by an incremental
+        ingestion), so that a running backend searches the new tweets. Searches in progress keep
+        using the previous index of their topic.
+
+        Args:
+            connector: Unused, the indexes are read from disk (same interface as the other retrievers).
+            topics (list): The topics to check.
+
+        Returns:
+            list: The reloaded topics.
+        """
+        changed = [
+            topic for topic in topics
+            if self.exists(topic) and self.file_versions.get(topic) != self._file_version(topic)
+        ]
+        self.load(changed)
+        if changed:
+            logger.info("Reloaded the indexes of %s", ", ".join(changed))
+        return changed
+
+    def load_or_build(self, connector, topics: list):
+        """
+        Load the saved indexes and build the missing ones from Neo4j (read-only stores leave them missing).
+        """
+        missing = self.load(topics)
+        if missing and self.read_only:
+            logger.warning("No saved index for %s, run the build command", ", ".join(missing))
+        elif missing:
+            self.build(connector, missing)
+
+    def search(self, topic: str, query_embedding: np.ndarray, k: int = 10, entities: list = None):
+        """
+        Return the k tweets of a topic that are closest to a single query embedding.
+
+        Args:
+            topic (str): The topic index to search.
+            query_embedding (np.ndarray): Embedding of shape (dimension,) or (1, dimension).
+            k (int): Number of tweets to return.
+            entities (list): Entities of the query (unused, see retrieval.EntityGraphRetriever).
+
+        Returns:
+            list: Dictionaries with text, author and distance, closest first.
+        """
+        topic_index = self.indexes.get(topic)
+        if topic_index is None:
+            return []
+        return topic_index.search(np.atleast_2d(query_embedding), k)[0]
+
+    def search_batch(self, topic: str, query_embeddings: np.ndarray, k: int = 10, entities: list = None):
+        """
+        Search the index of a topic once for several queries (matrix query).
+
+        Args:
+            topic (str): The topic index to search.
+            query_embeddings (np.ndarray): Matrix of shape (n_queries, dimension).
+            k (int): Number of tweets to return per query.
+            entities (list): Entities of each query (unused, see retrieval.EntityGraphRetriever).
+
+        Returns:
+            list: For each query, the dictionaries with text, author and distance, closest first.
+        """
+        topic_index = self.indexes.get(topic)
+        if topic_index is None:
+            return [[] for _ in range(len(query_embeddings))]
+        return topic_index.search(query_embeddings, k)
+
+
+def measure_recall(embeddings: np.ndarray, index_type: str, params: dict, k: int = 10, n_queries: int = 200, seed: int = 0):
+    """
+    Measure recall@k and query latency of an index type against exact flat search.
+
+    Queries are sampled from the indexed vectors themselves, which mirrors /analyze where
+    the query tweet is usually close to tweets already in the corpus.
+
+    Args:
+        embeddings (np.ndarray): float32 matrix of the corpus vectors.
+        index_type (str): The index type to evaluate.
+        params (dict): Build and search parameters.
+        k (int): Number of neighbours.
+        n_queries (int): Number of sampled queries.
+        seed (int): Random seed for the query sample.
+
+    Returns:
+        dict: recall, mean latency per query (ms), index size (bytes) and effective index type.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+    rng = np.random.default_rng(seed)
+    queries = embeddings[rng.choice(len(embeddings), size=min(n_queries, len(embeddings)), replace=False)]
+    k = min(k, len(embeddings))
+
+    exact = faiss.IndexFlatL2(embeddings.shape[1])
+    exact.add(embeddings)
+    _, truth = exact.search(queries, k)
+
+    index = create_index(index_type, embeddings, params)
+    start = time.perf_counter()
+    _, found = index.search(queries, k)
+    elapsed = time.perf_counter() - start
+
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+    return {
+        "index_type": index_kind(index),
+        "recall": hits / (len(queries) * k),
+        "latency_ms": 1000 * elapsed / len(queries),
+        "size_bytes": int(faiss.serialize_index(index).size),
+    }
+
+
+def _int_list(value: str) -> list:
+    return [int(v) for v in value.split(",")]
+
+
+if __name__ == "__main__":
+    # Build the indexes from Neo4j:            `python -m services.vector_index build`
+    # Convert them to the configured type:     `python -m services.vector_index reindex`
+    # Compare recall/latency against flat:     `python -m services.vector_index recall --type hnsw --ef-search 16,32,64`
+    parser = argparse.ArgumentParser(description="Manage the per-topic tweet embedding indexes.")
+    parser.add_argument("command", choices=["build", "reindex", "recall"], nargs="?", default="build")
+    parser.add_argument("--type", default=INDEX_TYPE, choices=INDEX_TYPES, help="Index type to build or evaluate")
+    parser.add_argument("--k", type=int, default=10, help="Number of neighbours for the recall measurement")
+    parser.add_argument("--queries", type=int, default=200, help="Number of sampled queries per topic")
+    parser.add_argument("--ef-search", type=_int_list, default=[INDEX_PARAMS["hnsw_ef_search"]], help="Comma separated efSearch values (HNSW)")
+    parser.add_argument("--nprobe", type=_int_list, default=[INDEX_PARAMS["ivf_nprobe"]], help="Comma separated nprobe values (IVF-PQ)")
+    args = parser.parse_args()
+
+    from services.metrics import setup_logging
+    from services.topic_extraction import candidate_labels
+
+    setup_logging()
+
+    store = TopicIndexStore(index_type=args.type)
+
+    if args.command == "build":
+        from neo4j_connector import Neo4jConnector
+
+        connector = Neo4jConnector()
+        try:
+            store.build(connector, candidate_labels)
+        finally:
+            connector.close()
+    elif args.command == "reindex":
+        for missing_topic in store.load(candidate_labels):
+            print(f"[INDEX] No saved index for '{missing_topic}', run the build command first")
+    else:
+        sweep = args.ef_search if args.type == "hnsw" else args.nprobe if args.type == "ivfpq" else [None]
+        corpus = np.concatenate([store.embeddings(t) for t in candidate_labels if os.path.exists(store._paths(t)[2])])
+        print(f"{'type':<8}{'param':>8}{'recall@' + str(args.k):>12}{'ms/query':>12}{'MB':>10}")
+        for value in sweep:
+            params = dict(INDEX_PARAMS)
+            if args.type == "hnsw":
+                params["hnsw_ef_search"] = value
+            elif args.type == "ivfpq":
+                params["ivf_nprobe"] = value
+            result = measure_recall(corpus, args.type, params, k=args.k, n_queries=args.queries)
+            print(f"{result['index_type']:<8}{str(value or '-'):>8}{result['recall']:>12.3f}{result['latency_ms']:>12.3f}{result['size_bytes'] / 1e6:>10.2f}")